@@ -317,9 +317,9 @@ const AdminPage = () => {
                     }}
                   >
                     💳 {res.stripe_session_id ? "Paid" : "Unpaid"}
-                    {res.stripe_session_id && (
+                    {res.pdf_receipt && (
                       <a
-                        href={`http://localhost:8000/media/receipts/receipt_${res.stripe_session_id}.pdf`}
+                        href={res.pdf_receipt}
                         target="_blank"
                         rel="noopener noreferrer"
                         style={{
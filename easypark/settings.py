@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -9,6 +10,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY') 
 DEBUG = os.environ.get('DEBUG', 'False') == 'True' 
 ALLOWED_HOSTS = []
+TESTING = sys.argv[1:2] == ['test']
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -27,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers every other middleware.
+    'parking.middleware.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -49,11 +53,20 @@ REST_FRAMEWORK = {
 STRIPE_PUBLIC_KEY = 'pk_test_51RFKkTHCLZGaf24la36b7pHrIJM3CPHk03ZmaZCl7dXNMK95BJDEhfLdjIh4vsMKkGeKLtfhENU0DRuoVQ5CcOSu00ql10BLYq'
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Stripe calls go through one pooled async client per process (parking.utils.payments).
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')  # None: api.stripe.com
+STRIPE_MAX_CONNECTIONS = int(os.environ.get('STRIPE_MAX_CONNECTIONS', 100))
+STRIPE_TIMEOUT = 30
 
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
 
+# parking.utils.sms.TwilioBackend, LocMemBackend (tests) or FileBackend (writes to SMS_FILE_PATH)
+SMS_BACKEND = os.environ.get('SMS_BACKEND', 'parking.utils.sms.TwilioBackend')
+SMS_MAX_CONCURRENCY = int(os.environ.get('SMS_MAX_CONCURRENCY', 8))
+SMS_FILE_PATH = BASE_DIR / 'sms-messages'
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -62,6 +75,62 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 DEFAULT_FROM_EMAIL = f"EasyPark <{os.environ.get('EMAIL_USER')}>"
 
+# Tesseract OCR executable path.
+# IMPORTANT: Ensure this path is correct for your system.
+# For Linux/macOS, it might just be 'tesseract' or its full path like '/usr/bin/tesseract'.
+TESSERACT_CMD = os.environ.get('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+# Plate OCR runs in a pool of worker processes; requests beyond workers + queue get a "busy" reply.
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 2))
+OCR_QUEUE_SIZE = int(os.environ.get('OCR_QUEUE_SIZE', 2 * OCR_WORKERS))
+OCR_TIMEOUT = float(os.environ.get('OCR_TIMEOUT', 10))
+# Start the OCR workers when a web process boots (not for tests, management commands or Celery).
+OCR_WARM_ON_STARTUP = os.environ.get('OCR_WARM_ON_STARTUP', 'True') == 'True'
+# Near-identical gate frames (dHash within PLATE_CACHE_MAX_DISTANCE bits, and at most PLATE_CACHE_MAX_CHANGED
+# of each plate region's pixels changed) reuse the last OCR text for this long; access is always checked anew.
+PLATE_CACHE_TTL = float(os.environ.get('PLATE_CACHE_TTL', 5))
+PLATE_CACHE_SIZE = 256
+PLATE_CACHE_MAX_DISTANCE = 4
+PLATE_CACHE_MAX_CHANGED = 0.005
+# Limits for plate-recognition/batch/.
+PLATE_BATCH_MAX_IMAGES = 32
+PLATE_BATCH_MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# Seconds the admin dashboard summary is cached; any reservation or spot write drops it sooner.
+DASHBOARD_CACHE_TTL = 30
+# Limits for nearby/.
+NEARBY_MAX_RADIUS_M = 20000
+NEARBY_MAX_RESULTS = 100
+
+# Seconds a zone/spot list or detail response is kept; a write to its zone makes it unreachable sooner.
+CATALOG_CACHE_TTL = 300
+# Seconds a read token's account status is trusted without a query; saving or deleting the user drops it sooner.
+ACTIVE_USER_CACHE_TTL = 60
+
+# Per-request timings (parking.middleware.RequestTimingMiddleware): a Server-Timing header on every
+# response, and a log warning with the breakdown for requests slower than SLOW_REQUEST_SECONDS.
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True') == 'True'
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))
+
+# Reload a stale gate hot set on a background thread; tests reload inline, where their data is visible.
+GATE_RELOAD_IN_BACKGROUND = not TESTING
+
+# Version stamps (catalog, pricing, availability, gate) must be shared by every worker process:
+# set CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache when running several on one host.
+# The availability and gate counters rely on an atomic cache.incr, which the file cache lacks; prefer
+# django.core.cache.backends.redis.RedisCache (or Memcached) in production.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
+# Inline tasks are for the test suite, or local development with CELERY_TASK_ALWAYS_EAGER=True.
+# Elsewhere tasks go to the broker, so slow email/SMS providers and their retries never run in a request.
+CELERY_TASK_ALWAYS_EAGER = TESTING or os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_TASK_ACKS_LATE = True
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 ROOT_URLCONF = 'easypark.urls'
 
@@ -85,7 +154,19 @@ WSGI_APPLICATION = 'easypark.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Point SQLITE_PATH elsewhere to keep a generated city apart from the dev database.
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # IMMEDIATE makes SQLite take the write lock when a transaction starts,
+        # so concurrent bookings queue up instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file-backed test database, because shared-cache in-memory SQLite
+        # raises "table is locked" instead of waiting when threads contend.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -106,4 +187,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Receipts are rendered on first download and cached here, least recently used evicted first.
+RECEIPT_CACHE_DIR = MEDIA_ROOT / 'receipts'
+RECEIPT_CACHE_MAX_BYTES = int(os.environ.get('RECEIPT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'parking': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')},
+    },
+}
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django import forms
-from .models import Zone, ParkingSpot, Reservation
+from .models import Zone, ParkingSpot, Reservation, StripeEvent, ReminderLog, Tariff
+from .utils.occupancy import rebuild_zone_occupancy
+from .utils.spots import provision_spots
 
 # Custom Admin Form for Zone with Leaflet Picker
 class ZoneAdminForm(forms.ModelForm):
@@ -20,7 +22,9 @@ class ZoneAdminForm(forms.ModelForm):
 # Admin action to mark spots as available
 @admin.action(description="Mark selected spots as available")
 def mark_spots_available(modeladmin, request, queryset):
+    zone_ids = set(queryset.values_list("zone_id", flat=True))
     updated = queryset.update(is_reserved=False)
+    rebuild_zone_occupancy(zone_ids)
     modeladmin.message_user(request, f"{updated} spot(s) marked as available.")
 
 # Register Zone with map form and auto spot generation
@@ -33,13 +37,8 @@ class ZoneAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
         # Generate spots if creating new zone and no spots exist
-        if not change and obj.spots.count() == 0:
-            for i in range(1, obj.capacity + 1):
-                ParkingSpot.objects.create(
-                    zone=obj,
-                    spot_number=str(i),  
-                    is_reserved=False
-                )
+        if not change and not obj.spots.exists():
+            provision_spots(obj, obj.capacity)
 
 # Register ParkingSpot with list display and action
 @admin.register(ParkingSpot)
@@ -51,3 +50,25 @@ class ParkingSpotAdmin(admin.ModelAdmin):
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     list_display = ("user", "spot", "start_time", "end_time", "is_active")
+
+# Register processed Stripe webhook events (read-mostly audit trail)
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "processed_at")
+    search_fields = ("event_id",)
+
+# Register sent reminders (dedupe record for the reminder scheduler)
+@admin.register(ReminderLog)
+class ReminderLogAdmin(admin.ModelAdmin):
+    list_display = ("reservation", "kind", "sent_at")
+    list_select_related = ("reservation__user", "reservation__spot")
+    list_filter = ("kind",)
+
+
+# Register price tiers (zone-less tiers are the default for every zone)
+@admin.register(Tariff)
+class TariffAdmin(admin.ModelAdmin):
+    list_display = ("zone", "max_hours", "price", "updated_at")
+    list_editable = ("max_hours", "price")
+    list_filter = ("zone",)
+    list_select_related = ("zone",)
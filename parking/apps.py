@@ -1,6 +1,41 @@
+import logging
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def serving_requests():
+    """Whether this process serves HTTP: a WSGI/ASGI worker or runserver, not tests, other commands or Celery."""
+    if getattr(settings, 'TESTING', False) or not sys.argv:
+        return False
+    program = os.path.basename(sys.argv[0])
+    if program in ('manage.py', 'django-admin'):
+        # Under the autoreloader only the child (RUN_MAIN) serves requests.
+        return sys.argv[1:2] == ['runserver'] and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv)
+    return program != 'celery'
+
+
+def warm_ocr_pool():
+    from .utils.ocr import get_ocr_engine
+
+    try:
+        get_ocr_engine().warm()
+    except Exception:
+        logger.exception("Could not start the OCR worker pool; it will start on the first plate request.")
 
 
 class ParkingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parking'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Spawning the OCR workers takes seconds; do it now, in the background, not for the first car at the gate.
+        if getattr(settings, 'OCR_WARM_ON_STARTUP', False) and serving_requests():
+            threading.Thread(target=warm_ocr_pool, name="ocr-warm", daemon=True).start()
@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_date
+from django.utils.timezone import make_aware, now
+
+from parking.models import Reservation, RollupWatermark
+from parking.utils.rollups import WATERMARK, floor_hour, rollup_range
+
+
+class Command(BaseCommand):
+    help = 'Rolls reservations up into hourly per-zone occupancy for a date range (default: all history).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day, YYYY-MM-DD.')
+        parser.add_argument('--to', dest='date_to', help='Last day (inclusive), YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        bounds = Reservation.objects.aggregate(first=Min('start_time'), last=Max('end_time'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.WARNING("No reservations to roll up."))
+            return
+
+        start = self._day(options['date_from']) if options['date_from'] else bounds['first']
+        if options['date_to']:
+            end = self._day(options['date_to']) + timedelta(days=1)
+        else:
+            # Up to the last closed hour; the hourly task takes it from there.
+            end = floor_hour(now())
+        if start >= end:
+            raise CommandError("Give a valid --from/--to date range.")
+
+        started = time.perf_counter()
+        written = rollup_range(start, end)
+        elapsed = time.perf_counter() - started
+
+        if not options['date_to']:
+            RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': end})
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {written} hourly row(s) written for {floor_hour(start):%Y-%m-%d %H:00} → {end:%Y-%m-%d %H:00} "
+            f"in {elapsed:.1f}s."
+        ))
+
+    def _day(self, value):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a date: {value}")
+        return make_aware(datetime.combine(day, dt_time.min))
@@ -0,0 +1,94 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from parking.models import Zone, ParkingSpot, Reservation
+from parking.utils.availability import availability_index
+from parking.views import available_spots_queryset
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the availability index against the SQL query on a synthetic dataset (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=10)
+        parser.add_argument('--spots', type=int, default=200, help='Spots per zone.')
+        parser.add_argument('--reservations', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+        with transaction.atomic():
+            zone_ids = self._build_dataset(rng, opts)
+            self._run(rng, zone_ids, opts['queries'])
+            transaction.set_rollback(True)
+        availability_index.clear()
+
+    def _build_dataset(self, rng, opts):
+        self.stdout.write("🏗️  Building synthetic dataset...")
+        user = User.objects.create_user(username='bench_availability', email='bench_availability@example.com')
+        zones = Zone.objects.bulk_create(
+            Zone(name=f"Bench Zone {i}", capacity=opts['spots']) for i in range(opts['zones'])
+        )
+        spots = ParkingSpot.objects.bulk_create(
+            ParkingSpot(zone=zone, spot_number=str(n))
+            for zone in zones
+            for n in range(1, opts['spots'] + 1)
+        )
+
+        # Two years of history plus a couple of weeks of upcoming bookings.
+        base = now() - timedelta(days=730)
+        span_minutes = 744 * 24 * 60
+        batch = []
+        for _ in range(opts['reservations']):
+            start = base + timedelta(minutes=rng.randrange(span_minutes))
+            batch.append(Reservation(
+                user=user,
+                spot=rng.choice(spots),
+                start_time=start,
+                end_time=start + timedelta(minutes=rng.choice([30, 60, 120, 180, 240])),
+            ))
+        Reservation.objects.bulk_create(batch, batch_size=5000)
+        return [zone.id for zone in zones]
+
+    def _run(self, rng, zone_ids, queries):
+        windows = []
+        for _ in range(queries):
+            start = now() + timedelta(minutes=rng.randrange(14 * 24 * 60))
+            windows.append((rng.choice(zone_ids), start, start + timedelta(hours=rng.choice([1, 2, 3]))))
+
+        started = time.perf_counter()
+        sql_results = [
+            set(available_spots_queryset(zone_id, start, end).values_list('id', flat=True))
+            for zone_id, start, end in windows
+        ]
+        sql_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for zone_id in zone_ids:
+            availability_index.warm(zone_id)
+        warm_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index_results = [
+            set(availability_index.free_spot_ids(zone_id, start, end))
+            for zone_id, start, end in windows
+        ]
+        index_elapsed = time.perf_counter() - started
+
+        mismatches = sum(1 for a, b in zip(sql_results, index_results) if a != b)
+        self.stdout.write(f"SQL path:   {sql_elapsed / queries * 1000:.3f} ms/query")
+        self.stdout.write(f"Index warm: {warm_elapsed * 1000:.1f} ms for {len(zone_ids)} zones")
+        self.stdout.write(f"Index path: {index_elapsed / queries * 1000:.3f} ms/query")
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"❌ {mismatches}/{queries} windows differ from the SQL result."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ All {queries} windows match the SQL result."))
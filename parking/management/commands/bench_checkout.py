@@ -0,0 +1,178 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from aiohttp import web
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+from django.test import RequestFactory, override_settings
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import AccessToken
+
+from parking.models import Zone, ParkingSpot
+
+User = get_user_model()
+PATH = "/api/parking/reserve-and-pay/"
+
+
+class FakeStripe:
+    """Answers Checkout session creation after `latency` seconds, on a loop thread of its own."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.url = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1/checkout/sessions", self.create_session)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def create_session(self, request):
+        await request.post()
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        return web.json_response({
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.com/c/pay/{session_id}",
+        })
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent reserve-and-pay checkouts under WSGI threads and one ASGI event loop, against a local fake Stripe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--latency', type=float, default=250, help='Fake Stripe response time, ms.')
+        parser.add_argument('--wsgi-threads', type=int, default=8, help='Sync workers x threads of the WSGI deployment.')
+        parser.add_argument('--concurrency', type=int, default=100, help='Requests in flight on the ASGI loop.')
+
+    def handle(self, *args, **opts):
+        fake = FakeStripe(opts['latency'] / 1000)
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(
+            username=f'bench_checkout_{suffix}', email=f'bench_checkout_{suffix}@example.com', plate_number='34ABC123',
+        )
+        zone = Zone.objects.create(name=f"Bench Checkout {suffix}", capacity=1)
+        spot = ParkingSpot.objects.create(zone=zone, spot_number="1")
+        token = str(AccessToken.for_user(user))
+
+        start = now() + timedelta(days=1)
+        bodies = [
+            json.dumps({
+                "spot": spot.id,
+                "start_time": (start + timedelta(hours=n)).isoformat(),
+                "end_time": (start + timedelta(hours=n, minutes=90)).isoformat(),
+            }).encode()
+            for n in range(opts['requests'])
+        ]
+        try:
+            with override_settings(STRIPE_API_BASE=fake.url, STRIPE_SECRET_KEY='sk_test_bench', ALLOWED_HOSTS=['localhost']):
+                wsgi = self._wsgi(bodies, token, opts['wsgi_threads'])
+                asgi = asyncio.run(self._asgi(bodies, token, opts['concurrency']))
+        finally:
+            fake.stop()
+            user.delete()
+            zone.delete()
+
+        self._report(f"WSGI, {opts['wsgi_threads']} threads", *wsgi)
+        self._report(f"ASGI, 1 loop x {opts['concurrency']}", *asgi)
+        expected = 2 * len(bodies)
+        ok = wsgi[1].count(200) + asgi[1].count(200)
+        if ok == expected and fake.received == expected:
+            self.stdout.write(self.style.SUCCESS(f"✅ All {expected} checkouts got a session from the fake Stripe."))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ {ok}/{expected} checkouts succeeded; fake Stripe saw {fake.received}."))
+
+    def _wsgi(self, bodies, token, threads):
+        application = get_wsgi_application()
+        factory = RequestFactory()
+
+        def checkout(body):
+            environ = factory.post(
+                PATH, body, content_type="application/json",
+                HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}",
+            ).environ
+            statuses = []
+            started = time.perf_counter()
+            b"".join(application(environ, lambda status, headers: statuses.append(int(status[:3]))))
+            return time.perf_counter() - started, statuses[0]
+
+        def worker(body):
+            try:
+                return checkout(body)
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(worker, bodies))
+        return time.perf_counter() - started, [status for _, status in results], [t for t, _ in results]
+
+    async def _asgi(self, bodies, token, concurrency):
+        application = get_asgi_application()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def checkout(body):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "POST", "scheme": "http", "path": PATH, "raw_path": PATH.encode(),
+                "query_string": b"", "root_path": "",
+                "headers": [
+                    (b"host", b"localhost"),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"authorization", f"Bearer {token}".encode()),
+                ],
+                "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+            }
+            messages = iter([{"type": "http.request", "body": body, "more_body": False}])
+            statuses = []
+
+            async def receive():
+                message = next(messages, None)
+                if message is None:
+                    # The client stays connected until the response is sent.
+                    await asyncio.Event().wait()
+                return message
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            async with slots:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return time.perf_counter() - started, statuses[0]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(checkout(body) for body in bodies))
+        return time.perf_counter() - started, [status for _, status in results], [t for t, _ in results]
+
+    def _report(self, label, elapsed, statuses, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<22} {len(statuses) / elapsed:8.1f} checkouts/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.0f} ms   p95 {p95 * 1000:7.0f} ms"
+        )
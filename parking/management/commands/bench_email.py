@@ -0,0 +1,85 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from parking.utils.email import send_bulk_emails
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail; `latency` simulates the TLS/auth handshake per connection."""
+
+    def handle(self):
+        time.sleep(self.server.latency)
+        self.wfile.write(b"220 stub ESMTP\r\n")
+        in_data = False
+        for raw in self.rfile:
+            line = raw.rstrip(b"\r\n")
+            if in_data:
+                if line == b".":
+                    in_data = False
+                    self.server.received += 1
+                    self.wfile.write(b"250 OK queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.wfile.write(b"250 stub\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class SMTPStubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), SMTPStubHandler)
+        self.latency = latency
+        self.received = 0
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-message send_mail against send_bulk_emails using a local SMTP stub.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=20, help='Simulated handshake cost per connection, ms.')
+
+    def handle(self, *args, **opts):
+        server = SMTPStubServer(opts['latency'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        count = opts['messages']
+        messages = [(f"Reminder {n}", "Your reservation ends soon.", f"driver{n}@example.com") for n in range(count)]
+
+        smtp = dict(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=host, EMAIL_PORT=port, EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        try:
+            with override_settings(**smtp):
+                started = time.perf_counter()
+                for subject, body, recipient in messages:
+                    send_mail(subject, body, None, [recipient])
+                before = time.perf_counter() - started
+
+                started = time.perf_counter()
+                send_bulk_emails(messages)
+                after = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"send_mail per message: {count / before:8.0f} msg/s")
+        self.stdout.write(f"send_bulk_emails:      {count / after:8.0f} msg/s")
+        self.stdout.write(self.style.SUCCESS(f"✅ Stub received {server.received}/{count * 2} messages."))
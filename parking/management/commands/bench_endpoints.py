@@ -0,0 +1,221 @@
+import json
+import random
+import subprocess
+import time
+from datetime import timedelta
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import AccessToken
+
+from parking.models import Zone, ParkingSpot, Reservation
+from parking.utils.catalog import ALL_ZONES, ZONE_KEY
+from parking.utils.dashboard import invalidate_dashboard
+from parking.utils.plate_cache import get_gate_cache
+
+User = get_user_model()
+
+# Roughly the Istanbul metropolitan area, as generate_city lays it out.
+LAT_RANGE = (40.95, 41.15)
+LON_RANGE = (28.75, 29.25)
+
+
+def plate_image(rng):
+    """A white plate with a random Turkish plate number on it, as PNG bytes."""
+    text = f"{rng.randrange(1, 82):02d} {''.join(rng.choice('ABCDEFGHJKLMNPRSTUVYZ') for _ in range(3))} {rng.randrange(100, 1000)}"
+    image = np.full((110, 520, 3), 255, np.uint8)
+    cv2.rectangle(image, (2, 2), (517, 107), (0, 0, 0), 3)
+    cv2.putText(image, text, (40, 80), cv2.FONT_HERSHEY_SIMPLEX, 2.2, (0, 0, 0), 5)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the key API endpoints in-process against the current database (e.g. one from generate_city) '
+        'and report p50/p95/p99 latency and query counts as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint first.')
+        parser.add_argument('--only', nargs='+', help='Endpoint names to run (default: all).')
+        parser.add_argument('--prefix', default='city', help='generate_city prefix whose users drive the requests.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare p95 latencies against.')
+        parser.add_argument('--tolerance', type=float, default=1.25, help='p95 ratio to the baseline counted as a regression.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+        admin = User.objects.filter(username=f"{opts['prefix']}_admin").first()
+        if admin is None:
+            raise CommandError(f"No user {opts['prefix']}_admin; run generate_city first.")
+        drivers = list(User.objects.filter(username__startswith=f"{opts['prefix']}_user").values_list('id', flat=True)[:1000])
+        self.tokens = {
+            'admin': f"Bearer {AccessToken.for_user(admin)}",
+            'drivers': [f"Bearer {AccessToken.for_user(User(id=user_id))}" for user_id in drivers],
+        }
+        self.zone_ids = list(Zone.objects.values_list('id', flat=True))
+        self.rng = rng
+        self.etag = None
+
+        scenarios = self.scenarios()
+        names = opts['only'] or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}. Choose from {', '.join(scenarios)}.")
+
+        client = Client()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name in names:
+                self.stderr.write(f"⏱️  {name}...")
+                for _ in range(opts['warmup']):
+                    scenarios[name](client)
+                results[name] = self._measure(client, scenarios[name], opts['requests'])
+
+        report = {
+            'commit': self._commit(),
+            'created': now().isoformat(),
+            'database': {
+                'zones': len(self.zone_ids),
+                'spots': ParkingSpot.objects.count(),
+                'users': User.objects.count(),
+                'reservations': Reservation.objects.count(),
+            },
+            'endpoints': results,
+        }
+        text = json.dumps(report, indent=2)
+        if opts['output']:
+            with open(opts['output'], 'w') as f:
+                f.write(text + "\n")
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<22} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+                    f"   {result['queries_p50']:4} queries   {result['statuses']}"
+                )
+        else:
+            self.stdout.write(text)
+        if opts['baseline']:
+            self._compare(results, opts['baseline'], opts['tolerance'])
+
+    # --- Endpoints ---
+    def scenarios(self):
+        """name -> function(client) issuing one request and returning the response."""
+        rng = self.rng
+
+        def driver():
+            return rng.choice(self.tokens['drivers'])
+
+        def window():
+            start = now() + timedelta(minutes=rng.randrange(14 * 24 * 60))
+            return start.isoformat(), (start + timedelta(hours=rng.choice([1, 2, 3]))).isoformat()
+
+        def zones_list(client):
+            cache.delete(ALL_ZONES)  # a write happened since the last poll
+            return client.get("/api/parking/zones/", HTTP_AUTHORIZATION=driver())
+
+        def zones_list_not_modified(client):
+            response = client.get("/api/parking/zones/", HTTP_AUTHORIZATION=driver(), HTTP_IF_NONE_MATCH=self.etag or '""')
+            self.etag = response.get("ETag", self.etag)
+            return response
+
+        def zone_spots(client):
+            zone_id = rng.choice(self.zone_ids)
+            cache.delete(ZONE_KEY.format(zone_id))
+            return client.get(f"/api/parking/spots/?zone_id={zone_id}&compact=1", HTTP_AUTHORIZATION=driver())
+
+        def available_spots(client):
+            start, end = window()
+            return client.get("/api/parking/spots/available/", {
+                "zone_id": rng.choice(self.zone_ids), "start": start, "end": end,
+            }, HTTP_AUTHORIZATION=driver())
+
+        def nearby(client):
+            start, end = window()
+            return client.get("/api/parking/nearby/", {
+                "lat": rng.uniform(*LAT_RANGE), "lon": rng.uniform(*LON_RANGE), "radius": 1500,
+                "kind": rng.choice(["zones", "spots"]), "start": start, "end": end,
+            }, HTTP_AUTHORIZATION=driver())
+
+        def reservations_list(client):
+            return client.get("/api/parking/reservations/", HTTP_AUTHORIZATION=driver())
+
+        def dashboard(client):
+            invalidate_dashboard()
+            return client.get("/api/parking/dashboard/summary/", HTTP_AUTHORIZATION=self.tokens['admin'])
+
+        def plate_recognition(client):
+            get_gate_cache().clear()
+            return client.post("/api/parking/plate-recognition/", {
+                "image": ("plate.png", plate_image(rng)),
+            }, HTTP_AUTHORIZATION=self.tokens['admin'])
+
+        return {
+            'zones_list': zones_list,
+            'zones_list_304': zones_list_not_modified,
+            'zone_spots': zone_spots,
+            'available_spots': available_spots,
+            'nearby': nearby,
+            'reservations_list': reservations_list,
+            'dashboard': dashboard,
+            'plate_recognition': plate_recognition,
+        }
+
+    # --- Measuring and reporting ---
+    def _measure(self, client, scenario, count):
+        latencies, queries, statuses = [], [], {}
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = scenario(client)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            'requests': count,
+            'statuses': statuses,
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'mean_ms': round(float(np.mean(latencies)), 3),
+            'queries_p50': int(np.median(queries)),
+            'queries_max': int(max(queries)),
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _compare(self, results, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            ratio = result['p95_ms'] / before['p95_ms'] if before['p95_ms'] else float('inf')
+            line = f"{name:<22} p95 {before['p95_ms']:8.2f} -> {result['p95_ms']:8.2f} ms ({ratio:5.2f}x)"
+            if ratio > tolerance or result['queries_p50'] > before['queries_p50']:
+                regressions.append(name)
+                self.stderr.write(self.style.ERROR(f"❌ {line}, queries {before['queries_p50']} -> {result['queries_p50']}"))
+            else:
+                self.stderr.write(f"   {line}")
+        if regressions:
+            raise CommandError(f"Slower than {path} (commit {baseline.get('commit')}): {', '.join(regressions)}")
+        self.stderr.write(self.style.SUCCESS(f"✅ No regressions against {path} (commit {baseline.get('commit')})."))
@@ -0,0 +1,77 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from parking.models import Zone, ParkingSpot, Reservation
+from parking.utils.expiry import expire_ended
+from parking.utils.spots import provision_spots
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk expiry against the per-row save() loop on an expired backlog (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--spots', type=int, default=2000)
+        parser.add_argument('--legacy-sample', type=int, default=5000,
+                            help='Rows to time the per-row loop on; it is extrapolated to the full backlog.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            zone = self._build_dataset(opts)
+            legacy_rate = self._legacy(opts['legacy_sample'])
+            # The loop released every spot it touched; start the engine from the same state.
+            ParkingSpot.objects.filter(zone=zone).update(is_reserved=True)
+
+            started = time.perf_counter()
+            result = expire_ended(chunk_size=opts['chunk_size'])
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        backlog = opts['reservations'] - opts['legacy_sample']
+        self.stdout.write(f"per-row save():  {legacy_rate:10.0f} rows/s  (~{backlog / legacy_rate:.0f} s for the backlog)")
+        self.stdout.write(f"expiry engine:   {result.reservations / elapsed:10.0f} rows/s  ({elapsed:.1f} s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result.reservations:,} reservation(s) expired, {result.spots:,} spot(s) released."
+        ))
+
+    def _build_dataset(self, opts):
+        self.stdout.write(f"🏗️  Building {opts['reservations']:,} expired reservations...")
+        user = User.objects.create_user(username='bench_expiry', email='bench_expiry@example.com')
+        zone = Zone.objects.create(name="Bench Expiry Zone", capacity=opts['spots'])
+        provision_spots(zone, opts['spots'])
+        spot_ids = list(ParkingSpot.objects.filter(zone=zone).values_list('id', flat=True))
+        ParkingSpot.objects.filter(zone=zone).update(is_reserved=True)
+
+        ended = now() - timedelta(hours=2)
+        batch = []
+        for n in range(opts['reservations']):
+            batch.append(Reservation(
+                user=user,
+                spot_id=spot_ids[n % len(spot_ids)],
+                start_time=ended - timedelta(minutes=n % 600),
+                end_time=ended,
+            ))
+            if len(batch) == 20000:
+                Reservation.objects.bulk_create(batch)
+                batch = []
+        Reservation.objects.bulk_create(batch)
+        return zone
+
+    def _legacy(self, sample):
+        """The old expire_reservations loop, on the first `sample` rows."""
+        started = time.perf_counter()
+        for reservation in Reservation.objects.filter(is_active=True, end_time__lt=now()).order_by('id')[:sample]:
+            reservation.is_active = False
+            reservation.save()
+
+            reservation.spot.is_reserved = False
+            reservation.spot.save()
+        return sample / (time.perf_counter() - started)
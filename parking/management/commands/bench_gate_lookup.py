@@ -0,0 +1,107 @@
+import random
+import string
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from parking.models import Zone, ParkingSpot, Reservation, normalize_plate
+from parking.utils.gate import active_plates, find_gate_reservation
+
+User = get_user_model()
+
+
+def random_plate(rng):
+    letters = ''.join(rng.choice(string.ascii_uppercase) for _ in range(3))
+    plate = f"{rng.randrange(1, 82):02d} {letters} {rng.randrange(100, 1000)}"
+    # Stored the way users type them: mixed case, spaces or dashes.
+    return rng.choice([plate, plate.lower(), plate.replace(' ', '-'), plate.replace(' ', '')])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark gate plate lookups (iexact scan, indexed query, hot set) over a large synthetic history (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--active', type=int, default=2000, help='Reservations running right now.')
+        parser.add_argument('--plates', type=int, default=50000, help='Distinct plates in the history.')
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+        with transaction.atomic():
+            plates = self._build_dataset(rng, opts)
+            self._run(rng, plates, opts['queries'])
+            transaction.set_rollback(True)
+        active_plates.invalidate()
+
+    def _build_dataset(self, rng, opts):
+        self.stdout.write(f"🏗️  Building {opts['reservations']:,} reservations...")
+        user = User.objects.create_user(username='bench_gate', email='bench_gate@example.com')
+        zone = Zone.objects.create(name="Bench Gate Zone", capacity=500)
+        spots = ParkingSpot.objects.bulk_create(ParkingSpot(zone=zone, spot_number=str(n)) for n in range(1, 501))
+        plates = [random_plate(rng) for _ in range(opts['plates'])]
+
+        current = now()
+        history_minutes = 3 * 365 * 24 * 60
+        batch = []
+        for n in range(opts['reservations']):
+            if n < opts['active']:
+                start = current - timedelta(minutes=rng.randrange(1, 120))
+                active = True
+            else:
+                start = current - timedelta(minutes=rng.randrange(180, history_minutes))
+                active = False
+            batch.append(Reservation(
+                user=user,
+                spot=rng.choice(spots),
+                plate_number=rng.choice(plates),
+                start_time=start,
+                end_time=start + timedelta(hours=4) if active else start + timedelta(minutes=rng.choice([30, 60, 120])),
+                is_active=active,
+            ))
+            if len(batch) == 20000:
+                Reservation.objects.bulk_create(batch)
+                batch = []
+        Reservation.objects.bulk_create(batch)
+        return plates
+
+    def _time(self, label, fn, plates):
+        started = time.perf_counter()
+        results = [fn(plate) for plate in plates]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<28} {elapsed / len(plates) * 1e6:10.1f} µs/lookup")
+        return results
+
+    def _run(self, rng, plates, queries):
+        # What OCR hands the gate: uppercase, no separators.
+        sample = [normalize_plate(rng.choice(plates)) for _ in range(queries)]
+
+        started = time.perf_counter()
+        active_plates.warm()
+        self.stdout.write(f"{'hot set load':<28} {(time.perf_counter() - started) * 1000:10.1f} ms")
+        # The hot set only answers for times after it was loaded.
+        at = now()
+
+        legacy = self._time("iexact, no time window", lambda plate: Reservation.objects.filter(
+            plate_number__iexact=plate, is_active=True,
+        ).values_list('id', flat=True).first(), sample)
+
+        indexed = self._time("normalized + index", lambda plate: Reservation.objects.filter(
+            plate_normalized=plate, is_active=True, start_time__lte=at, end_time__gt=at,
+        ).order_by('start_time').values_list('id', flat=True).first(), sample)
+
+        hot = self._time("hot set", lambda plate: getattr(find_gate_reservation(plate, at), 'reservation_id', None), sample)
+
+        granted = sum(1 for r in indexed if r)
+        self.stdout.write(f"{granted}/{queries} sampled plates have a running reservation; "
+                          f"the iexact lookup found {sum(1 for r in legacy if r)} (it misses spaced or dashed plates).")
+        mismatches = sum(1 for a, b in zip(indexed, hot) if a != b)
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"❌ {mismatches}/{queries} hot set answers differ from SQL."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Hot set matches SQL for all {queries} plates."))
@@ -0,0 +1,142 @@
+import math
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from parking.models import Zone, ParkingSpot, Reservation
+from parking.utils.availability import availability_index
+from parking.utils.geo import GeoIndex, haversine_m
+from parking.utils.spots import grid_positions
+
+User = get_user_model()
+
+# Roughly the Istanbul metropolitan area.
+LAT_RANGE = (40.95, 41.15)
+LON_RANGE = (28.75, 29.25)
+
+
+def python_haversine_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark nearest-spot search (SQL + Python sort, NumPy brute force, grid buckets) on a synthetic city (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=500)
+        parser.add_argument('--spots', type=int, default=100, help='Spots per zone.')
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--radius', type=float, default=1500, help='Metres.')
+        parser.add_argument('-k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+        with transaction.atomic():
+            zone_ids = self._build_dataset(rng, opts)
+            self._run(rng, zone_ids, opts)
+            transaction.set_rollback(True)
+        availability_index.clear()
+
+    def _build_dataset(self, rng, opts):
+        count = opts['zones'] * opts['spots']
+        self.stdout.write(f"🏗️  Building {opts['zones']:,} zones with {count:,} spots...")
+        user = User.objects.create_user(username='bench_nearby', email='bench_nearby@example.com')
+        zones = Zone.objects.bulk_create(
+            Zone(name=f"Bench Zone {i}", capacity=opts['spots'], latitude=rng.uniform(*LAT_RANGE), longitude=rng.uniform(*LON_RANGE))
+            for i in range(opts['zones'])
+        )
+        spots = ParkingSpot.objects.bulk_create(
+            (
+                ParkingSpot(zone=zone, spot_number=str(n + 1), latitude=lat, longitude=lon)
+                for zone in zones
+                for n, (lat, lon) in enumerate(grid_positions(zone.latitude, zone.longitude, opts['spots'], 5))
+            ),
+            batch_size=5000,
+        )
+        # Upcoming bookings over the next two days.
+        current = now()
+        Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    user=user,
+                    spot=rng.choice(spots),
+                    start_time=(start := current + timedelta(minutes=rng.randrange(48 * 60))),
+                    end_time=start + timedelta(minutes=rng.choice([60, 120, 180, 240])),
+                )
+                for _ in range(opts['reservations'])
+            ),
+            batch_size=5000,
+        )
+        return [zone.id for zone in zones]
+
+    def _time(self, label, fn, points):
+        started = time.perf_counter()
+        results = [fn(lat, lon) for lat, lon in points]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<34} {elapsed / len(points) * 1e6:12.1f} µs/query")
+        return results
+
+    def _run(self, rng, zone_ids, opts):
+        radius, k = opts['radius'], opts['k']
+        points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(opts['queries'])]
+
+        started = time.perf_counter()
+        index = GeoIndex(
+            Zone.objects.values_list('id', 'name', 'district', 'latitude', 'longitude'),
+            ParkingSpot.objects.values_list('id', 'zone_id', 'spot_number', 'is_accessible', 'latitude', 'longitude'),
+        )
+        self.stdout.write(f"{'index build':<34} {(time.perf_counter() - started) * 1000:12.1f} ms")
+
+        def download_and_sort(lat, lon):
+            # What the frontend does today: fetch every spot, then sort by distance.
+            rows = ParkingSpot.objects.values_list('id', 'latitude', 'longitude')
+            near = sorted(
+                (d, spot_id) for spot_id, spot_lat, spot_lon in rows
+                if (d := python_haversine_m(lat, lon, spot_lat, spot_lon)) <= radius
+            )
+            return [spot_id for _, spot_id in near[:k]]
+
+        all_lats, all_lons = index.spot_points.lats, index.spot_points.lons
+        all_ids = index.spot_ids[index.spot_points.order]
+
+        def brute_force(lat, lon):
+            distances = haversine_m(lat, lon, all_lats, all_lons)
+            inside = np.flatnonzero(distances <= radius)
+            nearest = inside[np.argsort(distances[inside], kind='stable')[:k]]
+            return all_ids[nearest].tolist()
+
+        def buckets(lat, lon):
+            rows, _ = index.spots_within(lat, lon, radius)
+            return index.spot_ids[rows[:k]].tolist()
+
+        slow_points = points[:max(1, len(points) // 25)]
+        legacy = self._time("SQL + Python sort", download_and_sort, slow_points)
+        numpy_all = self._time("NumPy over every spot", brute_force, points)
+        bucketed = self._time("grid buckets", buckets, points)
+
+        start = now() + timedelta(hours=rng.randrange(1, 24))
+        end = start + timedelta(hours=2)
+        started = time.perf_counter()
+        for zone_id in zone_ids:
+            availability_index.warm(zone_id)
+        self.stdout.write(f"{'availability index warm-up':<34} {(time.perf_counter() - started) * 1000:12.1f} ms")
+        free_for = lambda zone_id: availability_index.free_spot_ids(zone_id, start, end)
+        self._time("nearest free spots (k, window)", lambda lat, lon: index.nearest_spots(lat, lon, radius, k, free_for), points)
+        self._time("nearest zones with a free spot", lambda lat, lon: index.nearest_zones(lat, lon, radius, k, free_for), points)
+
+        mismatches = sum(1 for a, b in zip(numpy_all, bucketed) if a != b)
+        mismatches += sum(1 for a, b in zip(legacy, bucketed) if a != b)
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"❌ Grid buckets disagree with brute force on {mismatches}/{len(points)} queries."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Grid buckets return the same {k} nearest spots as brute force for all {len(points)} queries."))
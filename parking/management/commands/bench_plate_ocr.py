@@ -0,0 +1,79 @@
+import statistics
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from parking.utils import ocr
+
+# Sample images in the repository root and the plate each one shows ("" = no plate).
+SAMPLES = {
+    "mycarplate.jpg": "34ENY487",
+    "debug_plate.jpg": "14AAC630",
+    "debug_plate_processed.jpg": "14AAC630",
+    "debug_plate_processed_for_ocr.jpg": "",
+    "test_english.png.png": "",
+}
+
+
+def legacy_recognize(image_bytes, timings):
+    """The pre-localization pipeline: whole frame, Otsu, stretched to 800x800."""
+    started = time.perf_counter()
+    image = ocr.decode_image(image_bytes)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    resized = cv2.resize(closed, (800, 800), interpolation=cv2.INTER_AREA)
+    timings['decode'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plate = ocr.match_plate(ocr.ocr_text(resized))
+    timings['ocr'] = time.perf_counter() - started
+    return plate
+
+
+class Command(BaseCommand):
+    help = 'Per-stage latency and accuracy of plate OCR, whole-frame vs. localized, on the sample images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--dir', default=str(settings.BASE_DIR), help='Directory holding the sample images.')
+
+    def handle(self, *args, **opts):
+        ocr._init_worker(settings.TESSERACT_CMD)
+
+        for name, pipeline in (("whole-frame", legacy_recognize), ("localized", ocr.recognize_plate)):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} pipeline"))
+            correct = 0
+            for filename, expected in SAMPLES.items():
+                path = Path(opts['dir']) / filename
+                if not path.exists():
+                    self.stdout.write(f"  {filename:<36} missing")
+                    continue
+                image_bytes = path.read_bytes()
+
+                stages = {}
+                plate = None
+                for _ in range(opts['repeat']):
+                    timings = {}
+                    try:
+                        plate = pipeline(image_bytes, timings)
+                    except RuntimeError as e:
+                        plate = f"error: {e}".splitlines()[0][:40]
+                    for stage, value in timings.items():
+                        stages.setdefault(stage, []).append(value)
+
+                ok = plate == expected
+                correct += ok
+                summary = ", ".join(
+                    f"{stage} {statistics.median(values) * 1000:.1f}ms"
+                    if stage != 'candidates' else f"{int(max(values))} candidate(s)"
+                    for stage, values in stages.items()
+                )
+                mark = "✅" if ok else "❌"
+                self.stdout.write(f"  {mark} {filename:<36} got {plate!r:<12} want {expected!r:<12} {summary}")
+            self.stdout.write(f"  accuracy: {correct}/{len(SAMPLES)}")
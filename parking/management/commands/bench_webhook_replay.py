@@ -0,0 +1,106 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.utils.timezone import now
+
+from parking.models import Zone, Reservation
+from parking.utils.spots import provision_spots
+from parking.views import StripeWebhookView
+
+User = get_user_model()
+
+WEBHOOK_SECRET = "whsec_bench"
+
+
+def signed_request(factory, event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return factory.post(
+        "/api/parking/stripe/webhook/",
+        data=payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark first delivery vs. redelivery of Stripe checkout events (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        with override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET), transaction.atomic():
+            self._run(opts['events'])
+            transaction.set_rollback(True)
+
+    def _run(self, count):
+        user = User.objects.create_user(username='bench_webhook', email='bench_webhook@example.com')
+        zone = Zone.objects.create(name='Bench Webhook Zone', capacity=count)
+        spots = provision_spots(zone, count)
+
+        start = now() + timedelta(days=1)
+        events = [
+            {
+                "id": f"evt_bench_{n}",
+                "object": "event",
+                "type": "checkout.session.completed",
+                "data": {"object": {
+                    "id": f"cs_bench_{n}",
+                    "object": "checkout.session",
+                    "amount_total": 25000,
+                    "payment_intent": f"pi_bench_{n}",
+                    "metadata": {
+                        "user_id": str(user.id),
+                        "spot_id": str(spot.id),
+                        "start_time": start.isoformat(),
+                        "end_time": (start + timedelta(hours=1)).isoformat(),
+                        "plate_number": "34ABC123",
+                    },
+                }},
+            }
+            for n, spot in enumerate(spots)
+        ]
+        factory = RequestFactory()
+        view = StripeWebhookView.as_view()
+
+        first = self._deliver(view, factory, events)
+        booked = Reservation.objects.filter(stripe_session_id__startswith="cs_bench_").count()
+        replay = self._deliver(view, factory, events)
+        after = Reservation.objects.filter(stripe_session_id__startswith="cs_bench_").count()
+
+        for label, (elapsed, queries) in (("First delivery", first), ("Redelivery", replay)):
+            self.stdout.write(
+                f"{label:<15} {elapsed / count * 1000:.3f} ms/event, "
+                f"{queries / count:.2f} queries/event, {count / elapsed:.0f} events/s"
+            )
+        if booked == after == count:
+            self.stdout.write(self.style.SUCCESS(f"✅ {count} reservations, none duplicated by replay."))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ Expected {count} reservations, got {booked} then {after}."))
+
+    def _deliver(self, view, factory, events):
+        requests = [signed_request(factory, event) for event in events]
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            for request in requests:
+                view(request)
+            elapsed = time.perf_counter() - started
+        return elapsed, queries
@@ -1,29 +1,21 @@
 from django.core.management.base import BaseCommand
-from django.utils.timezone import now
-from parking.models import Reservation
+
+from parking.utils.expiry import expire_ended
+
 
 class Command(BaseCommand):
     help = 'Auto-releases parking spots by marking expired reservations as inactive.'
 
-    def handle(self, *args, **kwargs):
-        expired_reservations = Reservation.objects.filter(
-            is_active=True,
-            end_time__lt=now()
-        )
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        result = expire_ended(chunk_size=opts['chunk_size'])
 
-        if not expired_reservations.exists():
+        if not result.reservations:
             self.stdout.write(self.style.WARNING("✅ No expired reservations found."))
             return
 
-        count = 0
-        for reservation in expired_reservations:
-            reservation.is_active = False
-            reservation.save()
-
-            reservation.spot.is_reserved = False
-            reservation.spot.save()
-            count += 1
-
         self.stdout.write(self.style.SUCCESS(
-            f"✅ {count} reservation(s) expired and their spots released."
+            f"✅ {result.reservations} reservation(s) expired and {result.spots} spot(s) released."
         ))
@@ -0,0 +1,159 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.timezone import now
+
+from parking.models import Zone, ParkingSpot, Reservation
+from parking.utils.availability import availability_index
+from parking.utils.gate import active_plates
+from parking.utils.geo import invalidate_geo
+from parking.utils.occupancy import rebuild_zone_occupancy
+from parking.utils.pricing import get_price_table, UNPRICED
+from parking.utils.spots import grid_positions
+
+User = get_user_model()
+
+DISTRICTS = [
+    "Beyoğlu", "Kadıköy", "Beşiktaş", "Üsküdar", "Şişli", "Fatih", "Bakırköy",
+    "Sarıyer", "Kartal", "Ataşehir", "Maltepe", "Başakşehir", "Eyüpsultan", "Beylikdüzü",
+]
+# Roughly the Istanbul metropolitan area.
+LAT_RANGE = (40.95, 41.15)
+LON_RANGE = (28.75, 29.25)
+DURATIONS = np.array([30, 60, 90, 120, 180, 240, 480])
+LETTERS = np.array(list("ABCDEFGHIJKLMNOPRSTUVYZ"))
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic city (zones, spots, users, years of reservations) with bulk inserts, for load tests and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=500)
+        parser.add_argument('--spots', type=int, default=100, help='Spots per zone.')
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--years', type=float, default=3, help='History before today.')
+        parser.add_argument('--upcoming-days', type=int, default=14, help='Bookings after today.')
+        parser.add_argument('--prefix', default='city', help='Prefixes generated names, so a second city can sit next to the first.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        prefix = opts['prefix']
+        if Zone.objects.filter(name__startswith=f"{prefix} Zone ").exists():
+            raise CommandError(f"A city with prefix '{prefix}' already exists; pick another --prefix or a fresh database.")
+        rng = np.random.default_rng(opts['seed'])
+        self.batch_size = opts['batch_size']
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self._users(rng, prefix, opts['users'])
+            zones, spots = self._zones_and_spots(rng, prefix, opts['zones'], opts['spots'])
+            reservations = self._reservations(rng, users, spots, opts)
+            # A spot is reserved while it has a booking that hasn't ended.
+            ParkingSpot.objects.filter(
+                id__in=Reservation.objects.filter(is_active=True, spot__zone__in=zones).values('spot_id'),
+            ).update(is_reserved=True)
+
+            # Bulk inserts skip the signals; refresh everything they would have.
+            zone_ids = [zone.id for zone in zones]
+            rebuild_zone_occupancy(zone_ids)
+            invalidate_geo()
+            transaction.on_commit(active_plates.invalidate)
+            transaction.on_commit(lambda: [availability_index.invalidate(zone_id) for zone_id in zone_ids])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(zones):,} zones, {len(spots):,} spots, {len(users):,} users and "
+            f"{reservations:,} reservations in {elapsed:.1f} s ({reservations / elapsed:,.0f} reservations/s)."
+        ))
+        self.stdout.write(f"Admin user: {prefix}_admin. Run backfill_occupancy_rollups for the analytics tables.")
+
+    def _users(self, rng, prefix, count):
+        self.stdout.write(f"👤 {count:,} users...")
+        # One unusable password for all; hashing a real one per user would dominate the run.
+        password = make_password(None)
+        numbers = rng.integers(1, 82, count)
+        letters = rng.choice(LETTERS, (count, 3))
+        tails = rng.integers(100, 1000, count)
+        users = [
+            User(
+                username=f"{prefix}_user{n}", email=f"{prefix}_user{n}@example.com", password=password,
+                plate_number=f"{numbers[n]:02d} {''.join(letters[n])} {tails[n]}",
+            )
+            for n in range(count)
+        ]
+        users.append(User(username=f"{prefix}_admin", email=f"{prefix}_admin@example.com", password=password, is_staff=True))
+        return User.objects.bulk_create(users, batch_size=self.batch_size)[:-1]
+
+    def _zones_and_spots(self, rng, prefix, zone_count, spots_per_zone):
+        self.stdout.write(f"🅿️  {zone_count:,} zones, {zone_count * spots_per_zone:,} spots...")
+        lats, lons = rng.uniform(*LAT_RANGE, zone_count), rng.uniform(*LON_RANGE, zone_count)
+        zones = Zone.objects.bulk_create(
+            Zone(
+                name=f"{prefix} Zone {i}", district=DISTRICTS[i % len(DISTRICTS)], capacity=spots_per_zone,
+                latitude=float(lats[i]), longitude=float(lons[i]),
+            )
+            for i in range(zone_count)
+        )
+        spots = ParkingSpot.objects.bulk_create(
+            (
+                ParkingSpot(zone=zone, spot_number=str(n + 1), latitude=lat, longitude=lon, is_accessible=n % 20 == 0)
+                for zone in zones
+                for n, (lat, lon) in enumerate(grid_positions(zone.latitude, zone.longitude, spots_per_zone, 5))
+            ),
+            batch_size=self.batch_size,
+        )
+        return zones, spots
+
+    def _reservations(self, rng, users, spots, opts):
+        """Non-overlapping bookings per spot, spread over the history and the coming days. Returns the count."""
+        per_spot = max(1, opts['reservations'] // len(spots))
+        self.stdout.write(f"📅 ~{per_spot * len(spots):,} reservations over {opts['years']:g} years...")
+        current = now()
+        origin = current - timedelta(days=365 * opts['years'])
+        span = int((current + timedelta(days=opts['upcoming_days']) - origin).total_seconds() // 60)
+        spot_ids = np.array([spot.id for spot in spots])
+        spot_zones = np.array([spot.zone_id for spot in spots])
+        user_plates = [user.plate_number for user in users]
+        now_minute = (current - origin).total_seconds() / 60
+        prices = get_price_table()
+
+        count = 0
+        # A slice of spots at a time keeps the arrays and model instances small.
+        step = max(1, self.batch_size * 4 // per_spot)
+        for first in range(0, len(spots), step):
+            rows = slice(first, first + step)
+            starts = np.sort(rng.integers(0, span, (len(spot_ids[rows]), per_spot)), axis=1)
+            # Cut a booking short rather than let it run into the spot's next one.
+            room = np.diff(starts, axis=1, append=span + DURATIONS.max())
+            minutes = np.minimum(rng.choice(DURATIONS, starts.shape), room)
+            keep = minutes > 0
+            spot_index = np.broadcast_to(np.arange(len(spot_ids))[rows, None], starts.shape)[keep]
+            starts, minutes = starts[keep], minutes[keep]
+            owners = rng.integers(0, len(users), len(starts))
+            cents = prices.quote(spot_zones[spot_index], minutes / 60)
+
+            batch = [
+                Reservation(
+                    user_id=users[owner].pk,
+                    spot_id=int(spot_ids[spot]),
+                    start_time=origin + timedelta(minutes=int(start)),
+                    end_time=origin + timedelta(minutes=int(start + length)),
+                    is_active=bool(start + length > now_minute),
+                    plate_number=user_plates[owner],
+                    price=None if cent == UNPRICED else Decimal(int(cent)) / 100,
+                )
+                for spot, start, length, owner, cent in zip(
+                    spot_index.tolist(), starts.tolist(), minutes.tolist(), owners.tolist(), cents.tolist(),
+                )
+            ]
+            Reservation.objects.bulk_create(batch, batch_size=self.batch_size)
+            count += len(batch)
+        return count
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from parking.models import Zone, ParkingSpot
+from parking.models import Zone
+from parking.utils.spots import provision_spots
 
 IST_ZONES = [
     {"name": "Taksim Square", "district": "Beyoğlu", "capacity": 25},
@@ -30,8 +31,7 @@ class Command(BaseCommand):
             )
             if created:
                 self.stdout.write(self.style.SUCCESS(f"Created zone: {zone.name}"))
-                for i in range(1, zone.capacity + 1):
-                    ParkingSpot.objects.create(zone=zone, spot_number=str(i))
+                provision_spots(zone, zone.capacity)
                 self.stdout.write(self.style.SUCCESS(f"→ Generated {zone.capacity} spots for {zone.name}"))
                 created_count += 1
             else:
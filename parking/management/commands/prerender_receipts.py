@@ -0,0 +1,35 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from django.utils.timezone import make_aware
+
+from parking.models import Reservation
+from parking.utils.pdf import get_receipt_pdf
+
+class Command(BaseCommand):
+    help = 'Renders PDF receipts for paid reservations starting in a date range (e.g. for accounting exports).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='First day, YYYY-MM-DD.')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last day (inclusive), YYYY-MM-DD.')
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options['date_from'])
+        date_to = parse_date(options['date_to'])
+        if not date_from or not date_to or date_from > date_to:
+            raise CommandError("Give a valid --from/--to date range.")
+
+        reservations = Reservation.objects.for_api().filter(
+            stripe_session_id__isnull=False,
+            start_time__gte=make_aware(datetime.combine(date_from, time.min)),
+            start_time__lt=make_aware(datetime.combine(date_to + timedelta(days=1), time.min)),
+        ).order_by('start_time')
+
+        count = 0
+        for reservation in reservations.iterator():
+            path, _ = get_receipt_pdf(reservation)
+            self.stdout.write(f"📄 {reservation.pk} → {path.name}")
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {count} receipt(s) ready."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from parking.utils.occupancy import rebuild_zone_occupancy
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-zone occupancy counters from the spots and reservations tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('zone_ids', nargs='*', type=int, help='Only rebuild these zones.')
+
+    def handle(self, *args, **options):
+        count = rebuild_zone_occupancy(options['zone_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"✅ Occupancy counters rebuilt for {count} zone(s)."))
@@ -1,51 +1,28 @@
 from django.core.management.base import BaseCommand
-from django.utils.timezone import now, timedelta
-from parking.models import Reservation
-from parking.utils.sms import send_sms
+from django.utils.timezone import now
+from parking.utils.expiry import expire_ended
+from parking.utils.reminders import send_due_reminders
 
 class Command(BaseCommand):
-    help = 'Send SMS reminders for upcoming reservation expirations and release expired spots.'
+    help = 'Send SMS and email reminders for upcoming reservation expirations and release expired spots.'
 
     def handle(self, *args, **kwargs):
         current_time = now()
-        reminder_window = current_time + timedelta(minutes=10)
 
-        # 🔔 Send reminders for reservations ending soon
-        ending_soon = Reservation.objects.filter(
-            end_time__range=(current_time, reminder_window),
-            spot__is_reserved=True
-        )
+        # 🔔 Reminders are scheduled per booking; this sweep sends any that were missed.
+        reminded = send_due_reminders(current_time)
 
-        if not ending_soon.exists():
+        if not reminded:
             self.stdout.write(self.style.SUCCESS("No upcoming reservations to notify."))
         else:
-            for reservation in ending_soon:
+            for reservation in reminded:
                 user = reservation.user
-                if not user.phone_number:
-                    continue
-
-                end_time_str = reservation.end_time.strftime('%H:%M')
-                zone_name = reservation.spot.zone.name
-                spot_number = reservation.spot.spot_number
-
-                message = (
-                    f"⏰ EasyPark Reminder:\n"
-                    f"Your reservation for Spot #{spot_number} in Zone {zone_name} ends at {end_time_str}.\n"
-                    f"Please vacate the spot on time."
-                )
-
-                send_sms(user.phone_number, message)
-                self.stdout.write(f"🔔 Reminder sent to {user.username} ({user.phone_number})")
+                self.stdout.write(f"🔔 Reminder sent to {user.username} ({user.phone_number or user.email})")
 
         # 🔓 Auto-release expired spots
-        expired_reservations = Reservation.objects.filter(
-            end_time__lt=current_time,
-            spot__is_reserved=True
+        result = expire_ended(current_time)
+        self.stdout.write(
+            f"✅ {result.reservations} expired reservation(s) closed, {result.spots} spot(s) released."
         )
 
-        for reservation in expired_reservations:
-            reservation.spot.is_reserved = False
-            reservation.spot.save()
-            self.stdout.write(f"✅ Released Spot #{reservation.spot.spot_number} (Zone: {reservation.spot.zone.name})")
-
         self.stdout.write(self.style.SUCCESS("✅ Reservation reminders sent and expired spots released."))
@@ -0,0 +1,129 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .utils.instrumentation import (
+    clock, current_timings, end_request, request_queries, request_seconds, stage_seconds, start_request,
+)
+
+logger = logging.getLogger(__name__)
+
+# Stages other than these are external calls wrapped in timed() (stripe, twilio, smtp, ocr).
+OWN_STAGES = ("db", "view", "render")
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection (see signals.time_queries).
+
+    Connections are per thread, and under ASGI the queries run in sync_to_async
+    threads, so the middleware can't wrap them itself; the context variable
+    holding the timings does follow the request into those threads.
+    """
+    timings = current_timings()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = clock()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", clock() - started)
+
+
+class RequestTimingMiddleware:
+    """
+    Times every request: SQL queries (count and time, on every database), the
+    view, DRF/template rendering, and external calls wrapped in ``timed()``.
+
+    The breakdown goes out as a ``Server-Timing`` header (unless
+    ``SERVER_TIMING_HEADER`` is off), into the histograms behind ``metrics/``,
+    and to the log when a request takes over ``SLOW_REQUEST_SECONDS``. Stages
+    overlap: "view" includes the queries and external calls it made.
+
+    Works under WSGI and ASGI alike; under ASGI it stays on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.slow_seconds = getattr(settings, 'SLOW_REQUEST_SECONDS', None)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Django runs plain hooks of an async stack in a thread; these only read the clock.
+            self.process_view = self._aprocess_view
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+            self._finish(request, response, timings)
+            return response
+        finally:
+            end_request(token)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+            self._finish(request, response, timings)
+            return response
+        finally:
+            end_request(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = clock()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the two apart.
+        timings = current_timings()
+        if timings is not None and hasattr(request, '_view_started'):
+            timings.add("view", clock() - request._view_started)
+            request._view_started = None
+            render_started = clock()
+            response.add_post_render_callback(lambda r: timings.add("render", clock() - render_started))
+        return response
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return RequestTimingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def _aprocess_template_response(self, request, response):
+        return RequestTimingMiddleware.process_template_response(self, request, response)
+
+    def _finish(self, request, response, timings):
+        total = clock() - timings.started
+        if getattr(request, '_view_started', None) is not None:
+            # Not a template response: everything up to now was the view.
+            timings.add("view", clock() - request._view_started)
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        request_seconds.observe((view, request.method, str(response.status_code)), total)
+        request_queries.observe((view,), timings.calls("db"))
+        for stage, (_, seconds) in timings.stages.items():
+            stage_seconds.observe((view, stage), seconds)
+
+        if self.header:
+            response["Server-Timing"] = self._server_timing(timings, total)
+        if self.slow_seconds is not None and total >= self.slow_seconds:
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms; %s", request.method, request.path, view, total * 1000,
+                ", ".join(f"{stage} {seconds * 1000:.0f} ms/{calls}" for stage, (calls, seconds) in timings.stages.items()),
+            )
+
+    def _server_timing(self, timings, total):
+        entries = [f'db;dur={timings.seconds("db") * 1000:.1f};desc="{timings.calls("db")} queries"']
+        for stage in ("view", "render"):
+            if stage in timings.stages:
+                entries.append(f"{stage};dur={timings.seconds(stage) * 1000:.1f}")
+        for stage, (calls, seconds) in timings.stages.items():
+            if stage not in OWN_STAGES:
+                entries.append(f'{stage};dur={seconds * 1000:.1f};desc="{calls} calls"')
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
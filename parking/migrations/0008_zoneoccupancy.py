@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_occupancy(apps, schema_editor):
+    Zone = apps.get_model('parking', 'Zone')
+    ZoneOccupancy = apps.get_model('parking', 'ZoneOccupancy')
+    zones = Zone.objects.annotate(
+        total=Count('spots'),
+        available=Count('spots', filter=Q(spots__is_reserved=False)),
+    )
+    ZoneOccupancy.objects.bulk_create(
+        ZoneOccupancy(zone_id=zone.id, total_spots=zone.total, available_spots=zone.available)
+        for zone in zones
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_reservation_stripe_session_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneOccupancy',
+            fields=[
+                ('zone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='parking.zone')),
+                ('total_spots', models.IntegerField(default=0)),
+                ('available_spots', models.IntegerField(default=0)),
+                ('reserved_now', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
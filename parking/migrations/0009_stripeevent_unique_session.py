@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_session_reservations(apps, schema_editor):
+    # Webhook redeliveries used to book the same paid session more than once;
+    # keep the first reservation of each session so the unique index can be built.
+    Reservation = apps.get_model('parking', 'Reservation')
+    duplicated = (
+        Reservation.objects.exclude(stripe_session_id=None)
+        .values('stripe_session_id')
+        .annotate(n=Count('id'), first_id=Min('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicated:
+        Reservation.objects.filter(stripe_session_id=row['stripe_session_id']).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_zoneoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('event_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=100)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(drop_duplicate_session_reservations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_plates(apps, schema_editor):
+    Reservation = apps.get_model('parking', 'Reservation')
+    rows = Reservation.objects.exclude(plate_number__isnull=True).exclude(plate_number='')
+    batch = []
+    for pk, plate in rows.values_list('id', 'plate_number').iterator(chunk_size=5000):
+        batch.append(Reservation(id=pk, plate_normalized=''.join(ch for ch in plate if ch.isalnum()).upper()))
+        if len(batch) == 5000:
+            Reservation.objects.bulk_update(batch, ['plate_normalized'])
+            batch = []
+    Reservation.objects.bulk_update(batch, ['plate_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_reservation_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='plate_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(normalize_plates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['plate_normalized', 'is_active', 'start_time', 'end_time'], name='reservation_gate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['is_active', 'end_time'], name='reservation_active_end_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_reservation_plate_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('expiry', 'Reservation ending soon')], default='expiry', max_length=20)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='parking.reservation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('reservation', 'kind'), name='unique_reminder_per_reservation')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0013_reservation_spot_start_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ZoneHourlyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('reserved_spot_minutes', models.FloatField(default=0)),
+                ('reservations_started', models.IntegerField(default=0)),
+                ('total_spots', models.IntegerField(default=0)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_occupancy', to='parking.zone')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zone', 'hour'), name='unique_zone_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def seed_default_tariff(apps, schema_editor):
+    # The tiers ReserveAndPayView used to hard-code.
+    Tariff = apps.get_model('parking', 'Tariff')
+    Tariff.objects.bulk_create([
+        Tariff(zone=None, max_hours=Decimal('1'), price=Decimal('250')),
+        Tariff(zone=None, max_hours=Decimal('2'), price=Decimal('400')),
+        Tariff(zone=None, max_hours=Decimal('3'), price=Decimal('500')),
+        Tariff(zone=None, max_hours=None, price=Decimal('600')),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0014_hourly_occupancy_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_hours', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tariffs', to='parking.zone')),
+            ],
+            options={
+                'ordering': ['zone_id', 'max_hours'],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'max_hours'), name='unique_tariff_tier')],
+            },
+        ),
+        migrations.RunPython(seed_default_tariff, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0015_tariff'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='tariff',
+            name='unique_tariff_tier',
+        ),
+        migrations.AddConstraint(
+            model_name='tariff',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('zone', 0), django.db.models.functions.comparison.Coalesce('max_hours', -1, output_field=models.DecimalField()), name='unique_tariff_tier', violation_error_message='This zone already has a tier with that limit.'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+# What checkout charged before 0010 added Reservation.price: the tiers it used to hard-code.
+LEGACY_TIERS = ((1, Decimal('250')), (2, Decimal('400')), (3, Decimal('500')), (None, Decimal('600')))
+
+
+def legacy_price(reservation):
+    hours = (reservation.end_time - reservation.start_time).total_seconds() / 3600
+    return next(price for max_hours, price in LEGACY_TIERS if max_hours is None or hours <= max_hours)
+
+
+def backfill_price(apps, schema_editor):
+    # Only paid reservations have receipts; the rest never had a price.
+    Reservation = apps.get_model('parking', 'Reservation')
+    batch = []
+    for reservation in Reservation.objects.filter(price__isnull=True, stripe_session_id__isnull=False).iterator():
+        reservation.price = legacy_price(reservation)
+        batch.append(reservation)
+        if len(batch) == 500:
+            Reservation.objects.bulk_update(batch, ['price'])
+            batch = []
+    Reservation.objects.bulk_update(batch, ['price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0016_tariff_tier_null_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_price, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 User = settings.AUTH_USER_MODEL
@@ -15,6 +16,24 @@ class Zone(models.Model):
         return self.name
 
 
+class ZoneOccupancy(models.Model):
+    """Spot counters for a zone, maintained incrementally so zone listings never scan spots."""
+    zone = models.OneToOneField(Zone, on_delete=models.CASCADE, primary_key=True, related_name='occupancy')
+    total_spots = models.IntegerField(default=0)
+    available_spots = models.IntegerField(default=0)  # spots with is_reserved=False
+    reserved_now = models.IntegerField(default=0)  # spots with an active reservation covering now
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.zone.name}: {self.available_spots}/{self.total_spots} available"
+
+
+class ParkingSpotQuerySet(models.QuerySet):
+    def for_api(self):
+        """Joins everything ParkingSpotSerializer reads."""
+        return self.select_related('zone__occupancy')
+
+
 class ParkingSpot(models.Model):
     zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='spots')
     spot_number = models.CharField(max_length=10)
@@ -25,11 +44,43 @@ class ParkingSpot(models.Model):
     longitude = models.FloatField(null=True, blank=True)
     landmark_hint = models.CharField(max_length=255, blank=True)  # <-- optional
 
+    objects = ParkingSpotQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values as loaded so signal handlers can tell what changed.
+        instance._loaded_zone_id = instance.__dict__.get('zone_id')
+        instance._loaded_is_reserved = instance.__dict__.get('is_reserved')
+        instance._loaded_place = instance.place()
+        return instance
+
+    def place(self):
+        """What the nearby search shows of a spot besides its zone."""
+        return tuple(self.__dict__.get(name) for name in ('spot_number', 'is_accessible', 'latitude', 'longitude'))
 
     def __str__(self):
         return f"{self.zone.name} - Spot #{self.spot_number}"
 
 
+def normalize_plate(plate_number):
+    """'34 eny-487' -> '34ENY487': uppercase, without spaces, dashes or other separators."""
+    return ''.join(ch for ch in plate_number or '' if ch.isalnum()).upper()
+
+
+class ReservationQuerySet(models.QuerySet):
+    def for_api(self):
+        """Joins everything ReservationSerializer reads."""
+        return self.select_related('user', 'spot__zone__occupancy')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create doesn't call save(), so fill in the normalized plate here.
+        objs = list(objs)
+        for obj in objs:
+            obj.plate_normalized = normalize_plate(obj.plate_number)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Reservation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     spot = models.ForeignKey(ParkingSpot, on_delete=models.CASCADE)
@@ -37,9 +88,117 @@ class Reservation(models.Model):
     end_time = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     plate_number = models.CharField(max_length=20, blank=True, null=True)
+    # Gate checks match on this rather than plate_number__iexact; see normalize_plate().
+    plate_normalized = models.CharField(max_length=20, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    stripe_session_id = models.CharField(max_length=255, null=True, blank=True)
+    stripe_session_id = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # amount paid, TRY
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['plate_normalized', 'is_active', 'start_time', 'end_time'],
+                name='reservation_gate_idx',
+            ),
+            # Loading the reservations that are still running or upcoming.
+            models.Index(fields=['is_active', 'end_time'], name='reservation_active_end_idx'),
+            # Per-spot start-time ranges, e.g. the dashboard's "starting today" count.
+            models.Index(fields=['spot', 'start_time'], name='reservation_spot_start_idx'),
+        ]
 
+    def save(self, *args, **kwargs):
+        self.plate_normalized = normalize_plate(self.plate_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'plate_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'plate_normalized'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user} reserved {self.spot} from {self.start_time} to {self.end_time}"
+
+
+class StripeEvent(models.Model):
+    """Stripe webhook events already handled, so redeliveries are acknowledged without redoing work."""
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
+
+
+class ReminderLog(models.Model):
+    """Reminders already sent, so the scheduler and the periodic sweep never send one twice."""
+    EXPIRY = 'expiry'
+    KIND_CHOICES = [(EXPIRY, 'Reservation ending soon')]
+
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=EXPIRY)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reservation', 'kind'], name='unique_reminder_per_reservation'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} reminder for reservation {self.reservation_id}"
+
+
+class ZoneHourlyOccupancy(models.Model):
+    """Per-zone, per-hour rollup of reservations, so analytics never scan Reservation."""
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name='hourly_occupancy')
+    hour = models.DateTimeField()  # start of the hour, UTC
+    reserved_spot_minutes = models.FloatField(default=0)  # sum over spots of minutes reserved in the hour
+    reservations_started = models.IntegerField(default=0)
+    total_spots = models.IntegerField(default=0)  # zone size when the hour was rolled up
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'hour'], name='unique_zone_hour'),
+        ]
+
+    @property
+    def occupancy(self):
+        return self.reserved_spot_minutes / (self.total_spots * 60) if self.total_spots else 0.0
+
+    def __str__(self):
+        return f"{self.zone_id} @ {self.hour:%Y-%m-%d %H:00}: {self.occupancy:.0%}"
+
+
+class RollupWatermark(models.Model):
+    """How far an incremental rollup has got; everything before `value` is rolled up."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class Tariff(models.Model):
+    """
+    A price tier: stays of up to `max_hours` cost `price`. A zone with tiers of
+    its own uses only those; every other zone uses the tiers with no zone.
+    The tier with no `max_hours` prices every longer stay.
+    """
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, null=True, blank=True, related_name='tariffs')
+    max_hours = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # TRY
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['zone_id', 'max_hours']
+        constraints = [
+            # NULLs never collide in a unique index, so compare with stand-ins for "no zone" and "no limit".
+            models.UniqueConstraint(
+                Coalesce('zone', 0), Coalesce('max_hours', -1, output_field=models.DecimalField()),
+                name='unique_tariff_tier', violation_error_message="This zone already has a tier with that limit.",
+            ),
+        ]
+
+    def __str__(self):
+        scope = self.zone.name if self.zone_id else "Default"
+        upto = f"≤ {self.max_hours}h" if self.max_hours is not None else "longer"
+        return f"{scope}: {upto} → {self.price} TRY"
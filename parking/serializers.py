@@ -1,12 +1,32 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core import signing
+from django.urls import reverse
 from .models import Reservation, ParkingSpot, Zone
 
 User = get_user_model()
 
+RECEIPT_TOKEN_SALT = "parking.receipt"
+RECEIPT_TOKEN_MAX_AGE = 7 * 24 * 3600
+
+
+def receipt_token(reservation_id):
+    return signing.dumps(reservation_id, salt=RECEIPT_TOKEN_SALT)
+
+
+def valid_receipt_token(token, reservation_id):
+    if not token:
+        return False
+    try:
+        return signing.loads(token, salt=RECEIPT_TOKEN_SALT, max_age=RECEIPT_TOKEN_MAX_AGE) == reservation_id
+    except signing.BadSignature:
+        return False
+
 class ZoneSerializer(serializers.ModelSerializer):
-    spot_count = serializers.IntegerField(read_only=True)
-    available = serializers.IntegerField(read_only=True)
+    # Read from the maintained ZoneOccupancy row; select_related('occupancy') to avoid a query per zone.
+    spot_count = serializers.IntegerField(source="occupancy.total_spots", read_only=True)
+    available = serializers.IntegerField(source="occupancy.available_spots", read_only=True)
+    reserved_now = serializers.IntegerField(source="occupancy.reserved_now", read_only=True)
 
     class Meta:
         model = Zone
@@ -18,7 +38,8 @@ class ZoneSerializer(serializers.ModelSerializer):
             "latitude",
             "longitude",
             "spot_count",
-            "available"
+            "available",
+            "reserved_now"
         ]
 
 
@@ -39,6 +60,22 @@ class ParkingSpotSerializer(serializers.ModelSerializer):
             "longitude"
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # In compact mode the zone is sent once alongside the results and referenced by id here.
+        if self.context.get("compact_zones"):
+            fields["zone"] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+
+def with_zone_table(data, zones, context=None):
+    """Wraps compact results together with each referenced zone, serialized once."""
+    unique = {zone.id: zone for zone in zones}
+    return {
+        "zones": ZoneSerializer(unique.values(), many=True, context=context).data,
+        "results": data,
+    }
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -57,9 +94,12 @@ class ReservationSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
     def get_pdf_receipt(self, obj):
-        if obj.stripe_session_id:
-            return f"http://localhost:8000/media/receipts/receipt_{obj.stripe_session_id}.pdf"
-        return None
+        if not obj.stripe_session_id:
+            return None
+        # Signed so the link works when opened directly in the browser, without the JWT header.
+        path = f"{reverse('reservation-receipt', args=[obj.pk])}?token={receipt_token(obj.pk)}"
+        request = self.context.get("request")
+        return request.build_absolute_uri(path) if request else path
     
     def get_payment_status(self, obj):
         return "✅ Paid" if obj.stripe_session_id else "❌ Unpaid"
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .middleware import record_query
+from .models import Zone, ZoneOccupancy, ParkingSpot, Reservation, Tariff
+from .utils.accounts import forget_user
+from .utils.availability import availability_index
+from .utils.catalog import touch_zones
+from .utils.dashboard import invalidate_dashboard
+from .utils.gate import active_plates
+from .utils.geo import invalidate_geo
+from .utils.occupancy import adjust_zone_occupancy, rebuild_zone_occupancy, refresh_reserved_now
+from .utils.pricing import invalidate_prices
+
+
+def _zone_id_for(reservation):
+    if Reservation.spot.is_cached(reservation):
+        return reservation.spot.zone_id
+    return ParkingSpot.objects.filter(pk=reservation.spot_id).values_list('zone_id', flat=True).first()
+
+
+def _covers_now(reservation):
+    current = now()
+    return reservation.start_time <= current < reservation.end_time
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    # The wrapper outlives reconnects of the same connection object; add it once.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(post_save, sender=Zone)
+def zone_saved(sender, instance, created, **kwargs):
+    if created:
+        ZoneOccupancy.objects.get_or_create(zone=instance)
+    touch_zones([instance.pk])
+    invalidate_geo()
+
+
+@receiver(post_delete, sender=Zone)
+def zone_deleted(sender, instance, **kwargs):
+    touch_zones([instance.pk])
+    invalidate_geo()
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    invalidate_dashboard()
+    zone_id = _zone_id_for(instance)
+    touch_zones([zone_id])
+    # After commit, so a rolled-back booking never opens the gate or takes a spot,
+    # and no process warms an index from rows it can't see yet under a stamp it can.
+    transaction.on_commit(lambda: availability_index.reservation_saved(instance, zone_id))
+    transaction.on_commit(lambda: active_plates.reservation_saved(instance))
+    if _covers_now(instance):
+        refresh_reserved_now([zone_id])
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    invalidate_dashboard()
+    transaction.on_commit(lambda: active_plates.reservation_deleted(instance))
+    zone_id = _zone_id_for(instance)
+    touch_zones([zone_id])
+    if zone_id is not None:
+        transaction.on_commit(lambda: availability_index.reservation_deleted(instance, zone_id))
+        if _covers_now(instance):
+            refresh_reserved_now([zone_id])
+
+
+@receiver(post_save, sender=ParkingSpot)
+def spot_saved(sender, instance, created, **kwargs):
+    invalidate_dashboard()
+    old_zone_id = getattr(instance, '_loaded_zone_id', None)
+    old_is_reserved = getattr(instance, '_loaded_is_reserved', None)
+    touch_zones([old_zone_id, instance.zone_id])
+    if created or old_zone_id != instance.zone_id or getattr(instance, '_loaded_place', None) != instance.place():
+        invalidate_geo()
+
+    if created:
+        transaction.on_commit(lambda: availability_index.spot_added(instance.pk, instance.zone_id))
+        adjust_zone_occupancy(instance.zone_id, total=1, available=0 if instance.is_reserved else 1)
+    elif old_zone_id is not None and old_zone_id != instance.zone_id:
+        zone_ids = (old_zone_id, instance.zone_id)
+        transaction.on_commit(lambda: [availability_index.invalidate(zone_id) for zone_id in zone_ids])
+        active_plates.invalidate()
+        rebuild_zone_occupancy([old_zone_id, instance.zone_id])
+    elif old_is_reserved is not None and old_is_reserved != instance.is_reserved:
+        adjust_zone_occupancy(instance.zone_id, available=-1 if instance.is_reserved else 1)
+
+    instance._loaded_zone_id = instance.zone_id
+    instance._loaded_is_reserved = instance.is_reserved
+    instance._loaded_place = instance.place()
+
+
+@receiver(post_delete, sender=ParkingSpot)
+def spot_deleted(sender, instance, **kwargs):
+    invalidate_dashboard()
+    invalidate_geo()
+    transaction.on_commit(lambda: availability_index.spot_removed(instance.pk, instance.zone_id))
+    # While a zone is being deleted its counter row may already be gone; don't recreate it.
+    adjust_zone_occupancy(
+        instance.zone_id,
+        total=-1,
+        available=0 if instance.is_reserved else -1,
+        rebuild_missing=False,
+    )
+
+
+@receiver(post_save, sender=Tariff)
+@receiver(post_delete, sender=Tariff)
+def tariff_changed(sender, instance, **kwargs):
+    # After commit, so no process compiles prices from a rolled-back edit.
+    transaction.on_commit(invalidate_prices)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # Read tokens check a cached is_active flag; see parking.utils.accounts.
+    forget_user(instance.pk)
@@ -1,19 +1,128 @@
+import logging
 from datetime import timedelta
 from django.utils.timezone import now
 from .models import Reservation
 from celery import shared_task
 
+logger = logging.getLogger(__name__)
+
+# Notification tasks talk to flaky external providers: retry with exponential backoff.
+NOTIFICATION_RETRY = dict(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=5,
+)
+
 
 @shared_task
 def expire_no_shows():
-    from datetime import timedelta
-    from django.utils.timezone import now
-    from .models import Reservation
+    """Deactivates reservations that started over 30 minutes ago; safe to run from several workers at once."""
+    from .utils.expiry import expire_started_before
+
+    result = expire_started_before(now() - timedelta(minutes=30))
+    if result.reservations:
+        logger.info("%s reservation(s) auto-expired, %s spot(s) released.", result.reservations, result.spots)
+    return result._asdict()
+
+
+@shared_task
+def refresh_zone_occupancy():
+    """Keeps ZoneOccupancy.reserved_now current as reservations start and end; schedule every minute."""
+    from .utils.occupancy import refresh_reserved_now
+
+    return refresh_reserved_now()
+
+
+@shared_task
+def rollup_occupancy():
+    """Rolls reservations up into ZoneHourlyOccupancy for the hours closed since the last run; schedule hourly."""
+    from .utils.rollups import rollup_pending
+
+    start, end, written = rollup_pending()
+    return {"from": start.isoformat(), "to": end.isoformat(), "rows": written}
+
+
+@shared_task(**NOTIFICATION_RETRY)
+def refund_checkout_session(session_id, payment_intent):
+    """Refunds a paid checkout that couldn't be booked; keyed on the session so retries refund once."""
+    from asgiref.sync import async_to_sync
+    from .utils.payments import get_stripe_gateway
+
+    refund = async_to_sync(get_stripe_gateway().create_refund)(
+        {'payment_intent': payment_intent}, idempotency_key=f"refund-{session_id}",
+    )
+    return refund.id
+
+
+def enqueue_reservation_notifications(reservation_id):
+    """Queues the follow-up work for a paid reservation as independent tasks."""
+    send_reservation_confirmation_email.delay(reservation_id)
+    send_reservation_confirmation_sms.delay(reservation_id)
+
+
+def schedule_expiry_reminder(reservation):
+    """
+    Queues the "ending soon" reminder to run REMINDER_LEAD before the reservation ends.
+
+    Runs after the booking has committed, so a broker failure must not fail
+    the request that booked; the send_expiration_reminders sweep covers it.
+    """
+    from .utils.reminders import REMINDER_LEAD
+
+    try:
+        send_expiry_reminder.apply_async((reservation.id,), eta=reservation.end_time - REMINDER_LEAD)
+    except Exception:
+        logger.exception("Could not schedule the reminder for reservation %s; the sweep will send it.", reservation.id)
+
+
+@shared_task
+def send_expiry_reminder(reservation_id):
+    """
+    Sends one reservation's reminder if it is due and hasn't gone out yet.
+
+    A no-op when run early (eager mode runs it at booking time), or for a
+    reservation cancelled, moved or already reminded since it was scheduled.
+    """
+    from .utils.reminders import send_due_reminders
+
+    return len(send_due_reminders(reservation_ids=[reservation_id]))
+
+
+@shared_task(**NOTIFICATION_RETRY)
+def send_reservation_confirmation_email(reservation_id):
+    from .utils.email import send_reservation_email
+
+    reservation = Reservation.objects.for_api().get(id=reservation_id)
+    if not reservation.user.email:
+        return
+
+    send_reservation_email(
+        reservation.user.email,
+        "✅ EasyPark Reservation Confirmed",
+        f"Zone: {reservation.spot.zone.name}\nSpot: #{reservation.spot.spot_number}\n"
+        f"Plate: {reservation.plate_number}\n"
+        f"From: {reservation.start_time.strftime('%Y-%m-%d %H:%M')}\n"
+        f"To: {reservation.end_time.strftime('%Y-%m-%d %H:%M')}\n"
+        f"Price: {reservation.price} TRY"
+    )
+
+
+@shared_task(**NOTIFICATION_RETRY)
+def send_reservation_confirmation_sms(reservation_id):
+    from .utils.sms import send_sms
 
-    threshold = now() - timedelta(minutes=30)
-    no_shows = Reservation.objects.filter(is_active=True, start_time__lt=threshold)
+    reservation = Reservation.objects.for_api().get(id=reservation_id)
+    if not reservation.user.phone_number:
+        return
 
-    for res in no_shows:
-        res.is_active = False
-        res.save()
-        print(f"⛔ Reservation {res.id} auto-expired.")
\ No newline at end of file
+    sid = send_sms(
+        reservation.user.phone_number,
+        f"✅ EasyPark: Reservation confirmed\nZone: {reservation.spot.zone.name}\nSpot: #{reservation.spot.spot_number}\n"
+        f"{reservation.start_time.strftime('%H:%M')} → {reservation.end_time.strftime('%H:%M')}"
+    )
+    if sid is None:
+        # send_sms swallows provider errors; surface them so the task retries.
+        raise RuntimeError(f"SMS to {reservation.user.phone_number} failed")
+    return sid
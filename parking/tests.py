@@ -1,3 +1,1186 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import logging
+import random
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+from asgiref.sync import iscoroutinefunction
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.core import mail
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.timezone import localtime, now
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from easypark.celery import app as celery_app
+
+from .apps import serving_requests, warm_ocr_pool
+from .middleware import RequestTimingMiddleware
+from .models import Zone, ZoneOccupancy, ZoneHourlyOccupancy, ParkingSpot, Reservation, ReminderLog, StripeEvent, Tariff
+from .utils.availability import SpotIntervals, availability_index
+from .utils.booking import book_spot, SpotUnavailable
+from .utils.dashboard import invalidate_dashboard
+from .utils.email import send_bulk_emails, send_reservation_email
+from .utils.expiry import expire_ended, expire_started_before
+from .utils.rollups import hourly_buckets, rollup_range
+from .utils.gate import active_plates, find_gate_reservation
+from .utils.geo import PointSet, haversine_m
+from .utils.instrumentation import clear_histograms, end_request, start_request, timed
+from .utils.ocr import FrameRead, OCRBusy, OCREngine, OCRTimeout, read_frame
+from .utils.plate_cache import dhash, get_gate_cache
+from .utils.pdf import get_receipt_pdf, open_receipt_pdf, render_receipt_html
+from .utils.pricing import invalidate_prices
+from .utils import sms, versions
+from .utils.reminders import MAX_CLAIM_CONFLICTS, dispatch, send_due_reminders
+from .tasks import enqueue_reservation_notifications, refund_checkout_session, send_expiry_reminder
+from .views import available_spots_queryset, free_spot_ids
+
+User = get_user_model()
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    SPOTS = 3
+    ATTEMPTS = 300
+    WORKERS = 32
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        zone = Zone.objects.create(name="Stadium", capacity=self.SPOTS)
+        self.spots = [
+            ParkingSpot.objects.create(zone=zone, spot_number=str(n))
+            for n in range(1, self.SPOTS + 1)
+        ]
+
+    def _attempt(self, n):
+        # Every attempt targets one of a few spots with windows that mostly overlap.
+        spot = self.spots[n % self.SPOTS]
+        start = now().replace(microsecond=0) + timedelta(hours=1, minutes=15 * (n % 8))
+        try:
+            book_spot(self.user, spot.id, start, start + timedelta(hours=1))
+            return True
+        except SpotUnavailable:
+            return False
+        finally:
+            connection.close()
+
+    def test_no_double_booking_under_load(self):
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            results = list(pool.map(self._attempt, range(self.ATTEMPTS)))
+
+        booked = Reservation.objects.order_by("spot_id", "start_time")
+        self.assertEqual(sum(results), booked.count())
+        self.assertGreater(booked.count(), 0)
+
+        previous = {}
+        for reservation in booked:
+            last_end = previous.get(reservation.spot_id)
+            self.assertTrue(
+                last_end is None or reservation.start_time >= last_end,
+                f"Double booking on spot {reservation.spot_id}",
+            )
+            previous[reservation.spot_id] = reservation.end_time
+
+
+class QueryCountTests(TestCase):
+    """List endpoints must issue the same number of queries however many rows they return."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zones = [Zone.objects.create(name=f"Zone {n}", capacity=10) for n in range(3)]
+
+    def _populate(self, count):
+        start = now() + timedelta(days=1)
+        # Committing marks the zones changed, so cached zone/spot responses aren't reused.
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(count):
+                spot = ParkingSpot.objects.create(zone=self.zones[n % 3], spot_number=str(n))
+                Reservation.objects.create(
+                    user=self.admin,
+                    spot=spot,
+                    start_time=start,
+                    end_time=start + timedelta(hours=1),
+                )
+
+    def _assert_constant(self, url, queries):
+        self._populate(1)
+        with self.assertNumQueries(queries):
+            small = self.client.get(url)
+        self._populate(40)
+        with self.assertNumQueries(queries):
+            large = self.client.get(url)
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(large.status_code, 200)
+        return large.json()
+
+    def test_reservation_list(self):
+        self._assert_constant("/api/parking/reservations/", 1)
+
+    def test_admin_reservation_list(self):
+        self._assert_constant("/api/parking/reservations/all/", 1)
+
+    def test_spot_list(self):
+        self._assert_constant("/api/parking/spots/", 1)
+
+    def test_zone_list(self):
+        self._assert_constant("/api/parking/zones/", 1)
+
+    def test_compact_mode_serializes_each_zone_once(self):
+        data = self._assert_constant("/api/parking/reservations/all/?compact=1", 1)
+        self.assertEqual(len(data["zones"]), 3)
+        self.assertEqual(len(data["results"]), 41)
+        self.assertIn(data["results"][0]["spot"]["zone"], {zone["id"] for zone in data["zones"]})
+
+
+class AvailabilityIndexTests(TestCase):
+    """The in-memory index agrees with SQL, follows committed writes only, and isn't rebuilt for past windows."""
+
+    def setUp(self):
+        availability_index.clear()
+        self.addCleanup(availability_index.clear)
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.zone = Zone.objects.create(name="Center", capacity=4)
+        self.spots = [ParkingSpot.objects.create(zone=self.zone, spot_number=str(n)) for n in range(4)]
+        self.start = now().replace(microsecond=0) + timedelta(hours=1)
+
+    def _reserve(self, spot, start, hours=1):
+        return Reservation.objects.create(user=self.user, spot=spot, start_time=start, end_time=start + timedelta(hours=hours))
+
+    def _free(self, start, end):
+        return set(availability_index.free_spot_ids(self.zone.id, start, end))
+
+    def test_spot_intervals(self):
+        t, hour = self.start, timedelta(hours=1)
+        intervals = SpotIntervals()
+        intervals.add(1, t + 3 * hour, t + 4 * hour)
+        intervals.add(2, t, t + 2 * hour)
+        self.assertEqual(intervals.ids, [2, 1])
+        self.assertTrue(intervals.overlaps(t + hour, t + 90 * hour / 60))
+        self.assertFalse(intervals.overlaps(t + 2 * hour, t + 3 * hour))  # back to back is free
+        self.assertTrue(intervals.overlaps(t + 3.5 * hour, t + 5 * hour))
+
+        intervals.remove(2)
+        self.assertFalse(intervals.overlaps(t, t + 2 * hour))
+        intervals.prune(t + 4 * hour)
+        self.assertEqual(intervals.ids, [])
+
+    def test_answers_match_sql(self):
+        rng = random.Random(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(40):
+                self._reserve(rng.choice(self.spots), self.start + timedelta(minutes=rng.randrange(0, 48 * 60, 15)), rng.choice([1, 2, 3]))
+        availability_index.warm(self.zone.id)
+        for _ in range(100):
+            start = self.start + timedelta(minutes=rng.randrange(-60, 48 * 60, 10))
+            end = start + timedelta(minutes=rng.choice([30, 60, 180]))
+            expected = set(available_spots_queryset(self.zone.id, start, end).values_list("id", flat=True))
+            self.assertEqual(self._free(start, end), expected)
+
+    def test_only_committed_bookings_reach_the_index(self):
+        availability_index.warm(self.zone.id)
+        end = self.start + timedelta(hours=1)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self._reserve(self.spots[0], self.start)
+            raise RuntimeError("payment failed")
+        self.assertTrue(availability_index.is_fresh(self.zone.id))
+        self.assertEqual(self._free(self.start, end), {spot.id for spot in self.spots})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._reserve(self.spots[0], self.start)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._free(self.start, end), {spot.id for spot in self.spots[1:]})
+
+    def test_write_racing_another_process_makes_the_index_stale(self):
+        availability_index.warm(self.zone.id)
+        real_bump = versions.bump_version
+
+        def racing_bump(key):
+            real_bump(key)  # another process's booking bumps first
+            return real_bump(key)
+
+        with mock.patch("parking.utils.availability.bump_version", racing_bump), \
+                self.captureOnCommitCallbacks(execute=True):
+            self._reserve(self.spots[0], self.start)
+        self.assertFalse(availability_index.is_fresh(self.zone.id))
+        self.assertIsNone(availability_index.free_spot_ids(self.zone.id, self.start, self.start + timedelta(hours=1)))
+
+    def test_past_windows_do_not_rebuild_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._reserve(self.spots[0], now() - timedelta(hours=3), hours=4)
+        availability_index.warm(self.zone.id)
+        with mock.patch.object(availability_index, "warm") as warm:
+            # A client sending start=now from a clock running a little behind is answered from memory.
+            with self.assertNumQueries(0):
+                self.assertNotIn(self.spots[0].id, free_spot_ids(self.zone.id, now() - timedelta(minutes=2), self.start))
+            # Further back only the index's horizon is exceeded: SQL answers, the index is kept.
+            self.assertNotIn(self.spots[0].id, free_spot_ids(self.zone.id, now() - timedelta(hours=2), self.start))
+        warm.assert_not_called()
+
+    def test_expired_reservation_holds_its_spot_until_it_ends(self):
+        # No-show expiry can't tell whether the car arrived, so the spot stays taken everywhere.
+        with self.captureOnCommitCallbacks(execute=True):
+            self._reserve(self.spots[0], now() - timedelta(hours=1), hours=3)
+        ParkingSpot.objects.filter(pk=self.spots[0].pk).update(is_reserved=True)
+        availability_index.warm(self.zone.id)
+        start, end = now() + timedelta(minutes=5), now() + timedelta(minutes=65)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_started_before(now() - timedelta(minutes=30)), (1, 0))
+        self.assertTrue(ParkingSpot.objects.get(pk=self.spots[0].pk).is_reserved)
+        self.assertNotIn(self.spots[0].id, self._free(start, end))
+        self.assertNotIn(self.spots[0], available_spots_queryset(self.zone.id, start, end))
+        with self.assertRaises(SpotUnavailable):
+            book_spot(self.user, self.spots[0].id, start, end)
+        self.assertEqual(expire_ended(now() + timedelta(hours=3)).spots, 1)
+
+
+def gate_frame(text, seed=0):
+    """A gate camera frame: a white plate reading `text` on a grey scene with sensor noise, as JPEG bytes."""
+    rng = np.random.default_rng(seed)
+    image = np.clip(90 + rng.integers(-3, 4, (480, 640)), 0, 255).astype(np.uint8)
+    cv2.rectangle(image, (160, 300), (480, 370), 255, -1)
+    cv2.rectangle(image, (160, 300), (480, 370), 0, 3)
+    cv2.putText(image, text, (175, 350), cv2.FONT_HERSHEY_SIMPLEX, 1.3, 0, 3)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+class GateFrameCacheTests(TestCase):
+    """Repeated frames of a waiting car must not be OCRed or looked up again; another car must."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        spot = ParkingSpot.objects.create(zone=Zone.objects.create(name="Gate", capacity=1), spot_number="1")
+        Reservation.objects.create(
+            user=self.user, spot=spot, plate_number="34ENY487",
+            start_time=now(), end_time=now() + timedelta(hours=1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_gate_cache().clear()
+        self.addCleanup(get_gate_cache().clear)
+        active_plates.invalidate()
+        # The pool's work runs in-process, with only tesseract replaced.
+        self.engine = mock.Mock()
+        self.engine.recognize.side_effect = read_frame
+        self.ocr_text = self.enterContext(mock.patch("parking.utils.ocr.ocr_text"))
+        self.enterContext(mock.patch("parking.views.get_ocr_engine", return_value=self.engine))
+
+    def _post(self, image_bytes):
+        image = SimpleUploadedFile("frame.jpg", image_bytes, content_type="image/jpeg")
+        return self.client.post("/api/parking/plate-recognition/", {"image": image}, format="multipart")
+
+    def test_near_identical_frame_skips_ocr_and_lookup(self):
+        # The same scene with different sensor noise, as consecutive camera frames would be.
+        frames = [gate_frame("34 ENY 487", seed) for seed in (0, 1)]
+        self.assertLessEqual((dhash(frames[0]) ^ dhash(frames[1])).bit_count(), 4)
+        self.ocr_text.return_value = "34 ENY 487"
+        first = self._post(frames[0])
+        with self.assertNumQueries(0):
+            second = self._post(frames[1])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.ocr_text.call_count, 1)
+        self.assertEqual(get_gate_cache().metrics()["frames"]["hits"], 1)
+        # The request process only hashed the frame; the pool compared it with the earlier one's regions.
+        seen = self.engine.recognize.call_args.args[1]
+        self.assertEqual(len(seen), 1)
+        self.assertTrue(seen[0])
+
+    def test_different_plate_with_close_hash_is_read_again(self):
+        frames = [gate_frame("34 ENY 487"), gate_frame("34 ENY 407")]
+        self.assertLessEqual((dhash(frames[0]) ^ dhash(frames[1])).bit_count(), 4)
+        self.ocr_text.side_effect = ["34ENY487", "34ENY407"]
+        first, second = self._post(frames[0]), self._post(frames[1])
+
+        self.assertEqual((first.status_code, first.json()["access"]), (200, True))
+        self.assertEqual((second.status_code, second.json()["plate_number"]), (403, "34ENY407"))
+        self.assertEqual(self.ocr_text.call_count, 2)
+        self.assertEqual(get_gate_cache().metrics()["frames"]["hits"], 0)
+
+
+class OCREngineTests(TestCase):
+    """A saturated or slow OCR pool answers "busy" / "timed out" instead of queueing, and the pool warms at boot."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="gate", email="gate@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_gate_cache().clear()
+        self.addCleanup(get_gate_cache().clear)
+
+    def _post(self, engine):
+        image = SimpleUploadedFile("frame.jpg", gate_frame("34 ENY 487"), content_type="image/jpeg")
+        with mock.patch("parking.views.get_ocr_engine", return_value=engine):
+            return self.client.post("/api/parking/plate-recognition/", {"image": image}, format="multipart")
+
+    def test_busy_and_timeout_are_raised_without_waiting_for_workers(self):
+        engine = OCREngine(workers=1, queue_size=0, timeout=0.05)
+        engine._slots.acquire()  # another request holds the only slot
+        with self.assertRaises(OCRBusy):
+            engine.recognize(b"frame")
+        engine._slots.release()
+
+        with mock.patch.object(engine, "submit", return_value=Future()):
+            with self.assertRaises(OCRTimeout):
+                engine.recognize(b"frame")
+
+    def test_busy_and_timeout_responses(self):
+        busy = self._post(mock.Mock(recognize=mock.Mock(side_effect=OCRBusy("All OCR workers are busy."))))
+        self.assertEqual((busy.status_code, busy.json()["detail"], busy["Retry-After"]), (503, "ocr_busy", "1"))
+        slow = self._post(mock.Mock(recognize=mock.Mock(side_effect=OCRTimeout("Plate recognition timed out."))))
+        self.assertEqual((slow.status_code, slow.json()["detail"]), (504, "ocr_timeout"))
+
+        frames = [SimpleUploadedFile(f"cam{n}.jpg", gate_frame("34 ENY 487", n)) for n in range(2)]
+        engine = mock.Mock(recognize_many=mock.Mock(return_value=[OCRBusy("busy"), OCRTimeout("timed out")]))
+        with mock.patch("parking.views.get_ocr_engine", return_value=engine):
+            batch = self.client.post("/api/parking/plate-recognition/batch/", {"images": frames}, format="multipart")
+        self.assertEqual([r["status"] for r in batch.json()["results"]], [503, 504])
+
+    def test_pool_warms_only_in_web_processes(self):
+        cases = [
+            (["manage.py", "test"], {}, False),
+            (["manage.py", "migrate"], {}, False),
+            (["manage.py", "runserver"], {}, False),  # the autoreloader's watcher
+            (["manage.py", "runserver"], {"RUN_MAIN": "true"}, True),
+            (["/usr/bin/gunicorn", "easypark.wsgi"], {}, True),
+            (["/usr/bin/celery", "-A", "easypark", "worker"], {}, False),
+        ]
+        for argv, environ, expected in cases:
+            with self.subTest(argv=argv), override_settings(TESTING=False), \
+                    mock.patch("sys.argv", argv), mock.patch.dict("os.environ", environ):
+                self.assertIs(serving_requests(), expected)
+
+        engine = mock.Mock()
+        with mock.patch("parking.utils.ocr.get_ocr_engine", return_value=engine):
+            warm_ocr_pool()
+        engine.warm.assert_called_once_with()
+
+
+class GateLookupTests(TestCase):
+    """Gate checks match normalized plates, honour the reservation window, and answer from memory."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        zone = Zone.objects.create(name="Gate", capacity=2)
+        self.spots = [ParkingSpot.objects.create(zone=zone, spot_number=str(n)) for n in (1, 2)]
+        active_plates.invalidate()
+
+    def _reserve(self, plate, start, hours=1, spot=0):
+        return Reservation.objects.create(
+            user=self.user, spot=self.spots[spot], plate_number=plate,
+            start_time=start, end_time=start + timedelta(hours=hours),
+        )
+
+    def test_plate_is_normalized_on_save_and_bulk_create(self):
+        self.assertEqual(self._reserve("34 eny-487", now()).plate_normalized, "34ENY487")
+        start = now() + timedelta(days=1)
+        Reservation.objects.bulk_create([Reservation(
+            user=self.user, spot=self.spots[1], plate_number="06-abc 123",
+            start_time=start, end_time=start + timedelta(hours=1),
+        )])
+        self.assertTrue(Reservation.objects.filter(plate_normalized="06ABC123").exists())
+
+    def test_access_only_during_reservation_window(self):
+        later = now() + timedelta(hours=2)
+        self._reserve("34ENY487", later)
+        self.assertIsNone(find_gate_reservation("34ENY487"))
+        entry = find_gate_reservation("34 eny 487", at=later + timedelta(minutes=5))
+        self.assertEqual((entry.zone, entry.spot), ("Gate", "1"))
+
+    def test_hot_set_answers_without_queries_and_tracks_writes(self):
+        find_gate_reservation("34ENY487")  # cold: SQL, then loads the hot set
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self._reserve("34ENY487", now() - timedelta(minutes=5))
+        with self.assertNumQueries(0):
+            self.assertEqual(find_gate_reservation("34ENY487").reservation_id, reservation.id)
+
+        reservation.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+        with self.assertNumQueries(0):
+            self.assertIsNone(find_gate_reservation("34ENY487"))
+
+    def test_write_racing_another_process_makes_the_hot_set_stale(self):
+        find_gate_reservation("34ENY487")
+        real_bump = versions.bump_version
+
+        def racing_bump(key):
+            real_bump(key)  # another process deactivates a reservation first
+            return real_bump(key)
+
+        with mock.patch("parking.utils.gate.bump_version", racing_bump), \
+                self.captureOnCommitCallbacks(execute=True):
+            self._reserve("06ABC123", now())
+        self.assertIsNone(active_plates.lookup("34ENY487"))
+
+    @override_settings(GATE_RELOAD_IN_BACKGROUND=True)
+    def test_miss_is_answered_from_sql_and_reloaded_in_the_background(self):
+        reservation = self._reserve("34ENY487", now() - timedelta(minutes=5))
+        with mock.patch.object(active_plates, "warm") as warm:
+            with self.assertNumQueries(1):
+                self.assertEqual(find_gate_reservation("34ENY487").reservation_id, reservation.id)
+            active_plates._reloading.join()
+        warm.assert_called_once_with()
+
+
+class BatchPlateRecognitionTests(TestCase):
+    """A burst of frames is OCRed together and checked against reservations in one query."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="gate", email="gate@example.com")
+        spot = ParkingSpot.objects.create(zone=Zone.objects.create(name="Lane", capacity=1), spot_number="7")
+        Reservation.objects.create(
+            user=self.user, spot=spot, plate_number="34 ENY 487",
+            start_time=now() - timedelta(minutes=1), end_time=now() + timedelta(hours=1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_gate_cache().clear()
+        self.addCleanup(get_gate_cache().clear)
+        active_plates.invalidate()
+
+        rng = np.random.default_rng(1)
+        self.frames = [
+            cv2.imencode(".jpg", rng.integers(0, 256, (120, 160), dtype=np.uint8))[1].tobytes()
+            for _ in range(3)
+        ]
+        self.engine = mock.Mock()
+        self.engine.recognize_many.return_value = [FrameRead(plate, [], None) for plate in ("34ENY487", "06ABC123", "")]
+        patcher = mock.patch("parking.views.get_ocr_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _assert_results(self, response):
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [200, 403, 400, 400])
+        self.assertEqual((results[0]["zone"], results[0]["spot"]), ("Lane", "7"))
+        self.assertEqual(results[3]["error"], "Invalid image.")
+
+    def test_multipart_batch(self):
+        images = [SimpleUploadedFile(f"cam{n}.jpg", frame) for n, frame in enumerate(self.frames)]
+        images.append(SimpleUploadedFile("broken.jpg", b"not an image"))
+        # One query for all plates, one to load the hot set for the next burst.
+        with self.assertNumQueries(2):
+            response = self.client.post("/api/parking/plate-recognition/batch/", {"images": images}, format="multipart")
+        self._assert_results(response)
+        self.engine.recognize_many.assert_called_once_with(self.frames, [[], [], []], 0.005)
+
+    def test_zip_body(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for n, frame in enumerate(self.frames):
+                archive.writestr(f"cam{n}.jpg", frame)
+            archive.writestr("broken.jpg", b"not an image")
+        response = self.client.generic(
+            "POST", "/api/parking/plate-recognition/batch/", buffer.getvalue(), content_type="application/zip",
+        )
+        self._assert_results(response)
+        self.assertEqual([r["name"] for r in response.json()["results"]], ["cam0.jpg", "cam1.jpg", "cam2.jpg", "broken.jpg"])
+
+    def test_corrupt_archive_member_fails_only_that_frame(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for n, frame in enumerate(self.frames):
+                archive.writestr(f"cam{n}.jpg", frame)
+            archive.writestr("broken.jpg", bytes(range(256)) * 64)
+            member = archive.getinfo("broken.jpg")
+        body = bytearray(buffer.getvalue())
+        data = member.header_offset + 30 + len(member.filename) + len(member.extra)
+        body[data + 10:data + 40] = b"\xff" * 30
+        response = self.client.generic("POST", "/api/parking/plate-recognition/batch/", bytes(body), content_type="application/zip")
+        self._assert_results(response)
+
+    @override_settings(PLATE_BATCH_MAX_IMAGE_BYTES=32 * 1024)
+    def test_multipart_images_obey_the_size_limit(self):
+        images = [SimpleUploadedFile("cam.jpg", self.frames[0]), SimpleUploadedFile("huge.jpg", b"\0" * (32 * 1024 + 1))]
+        response = self.client.post("/api/parking/plate-recognition/batch/", {"images": images}, format="multipart")
+        self.assertEqual((response.status_code, response.json()), (400, {"error": "Image too large."}))
+        self.engine.recognize_many.assert_not_called()
+
+
+class ExpiryTests(TransactionTestCase):
+    """Bulk expiry counts every row exactly once, even with several runs at the same time."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.zone = Zone.objects.create(name="Harbour", capacity=20)
+        self.spots = [ParkingSpot.objects.create(zone=self.zone, spot_number=str(n), is_reserved=True) for n in range(20)]
+        ended = now() - timedelta(hours=3)
+        Reservation.objects.bulk_create(
+            Reservation(user=self.user, spot=self.spots[n % 20], start_time=ended, end_time=ended + timedelta(hours=1))
+            for n in range(2000)
+        )
+        # Spot 0 is booked again later, so it has to stay reserved.
+        upcoming = now() + timedelta(hours=1)
+        Reservation.objects.create(user=self.user, spot=self.spots[0], start_time=upcoming, end_time=upcoming + timedelta(hours=1))
+
+    def _run(self, _):
+        try:
+            return expire_ended(chunk_size=100)
+        finally:
+            connection.close()
+
+    def test_concurrent_runs_expire_each_row_once(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(self._run, range(4)))
+
+        self.assertEqual(sum(r.reservations for r in results), 2000)
+        self.assertEqual(sum(r.spots for r in results), 19)
+        self.assertEqual(Reservation.objects.filter(is_active=True).count(), 1)
+        self.assertEqual(list(ParkingSpot.objects.filter(is_reserved=True)), [self.spots[0]])
+        self.assertEqual(ZoneOccupancy.objects.get(zone=self.zone).available_spots, 19)
+        self.assertEqual(expire_ended(), (0, 0))
+
+
+@override_settings(SMS_BACKEND="parking.utils.sms.LocMemBackend")
+class ReminderTests(TestCase):
+    """Reminders load recipients in one query and go out once per reservation."""
+
+    def setUp(self):
+        zone = Zone.objects.create(name="Marina", capacity=30)
+        soon = now() + timedelta(minutes=5)
+        for n in range(30):
+            user = User.objects.create_user(
+                username=f"driver{n}", email=f"driver{n}@example.com", phone_number=f"+90555000{n:04d}",
+            )
+            spot = ParkingSpot.objects.create(zone=zone, spot_number=str(n))
+            Reservation.objects.create(user=user, spot=spot, start_time=soon - timedelta(hours=1), end_time=soon)
+        # Not due yet: ends well after the reminder window.
+        later = now() + timedelta(hours=2)
+        Reservation.objects.create(user=user, spot=spot, start_time=later, end_time=later + timedelta(hours=1))
+        sms.outbox.clear()
+
+    def test_each_reminder_is_sent_once(self):
+        # Select the batch, claim it (inside a savepoint), then look for more.
+        with self.assertNumQueries(5):
+            reminded = send_due_reminders()
+        self.assertEqual(len(reminded), 30)
+        self.assertEqual(len(sms.outbox), 30)
+        self.assertEqual(len(mail.outbox), 30)
+        self.assertIn("Zone Marina", sms.outbox[0][1])
+
+        self.assertEqual(send_due_reminders(), [])
+        self.assertEqual(len(sms.outbox), 30)
+        self.assertEqual(ReminderLog.objects.count(), 30)
+
+    def test_failed_sends_are_released_for_the_next_sweep(self):
+        with mock.patch("parking.utils.reminders.send_bulk_emails", side_effect=ConnectionRefusedError), \
+                self.assertLogs("parking.utils.reminders", "ERROR"):
+            self.assertEqual(send_due_reminders(batch_size=10), [])
+        self.assertFalse(ReminderLog.objects.exists())
+
+        # Texts that fail only count when there's no email to fall back on.
+        User.objects.filter(username="driver0").update(email="")
+        failing = lambda messages: [None if to.endswith("0000") else "SM1" for to, _ in messages]
+        with mock.patch("parking.utils.reminders.send_bulk_sms", side_effect=failing):
+            self.assertEqual(len(send_due_reminders()), 29)
+        self.assertEqual(send_due_reminders()[0].user.username, "driver0")
+        self.assertEqual(ReminderLog.objects.count(), 30)
+
+    def test_claim_conflicts_are_bounded(self):
+        with mock.patch("parking.utils.reminders._claim", return_value=[]) as claim, \
+                self.assertLogs("parking.utils.reminders", "WARNING"):
+            self.assertEqual(send_due_reminders(), [])
+        self.assertEqual(claim.call_count, MAX_CLAIM_CONFLICTS)
+
+
+class SMSBackendTests(TestCase):
+    """SMS backends keep batch order and are picked by SMS_BACKEND."""
+
+    def setUp(self):
+        self.messages = [(f"+90555000{n:04d}", f"Message {n}") for n in range(20)]
+        sms.outbox.clear()
+        self.addCleanup(sms.outbox.clear)
+
+    def test_backends_must_implement_send(self):
+        with self.assertRaises(TypeError):
+            sms.BaseSMSBackend()
+
+    @override_settings(SMS_BACKEND="parking.utils.sms.LocMemBackend")
+    def test_bulk_sms_through_locmem(self):
+        ids = sms.send_bulk_sms(self.messages)
+        self.assertEqual(len(set(ids)), 20)
+        self.assertTrue(all(sid.startswith("locmem-") for sid in ids))
+        self.assertEqual(sorted(sms.outbox), sorted(self.messages))
+        self.assertIs(sms.get_sms_backend(), sms.get_sms_backend("parking.utils.sms.LocMemBackend"))
+        self.assertTrue(sms.send_sms("+905550000000", "Hello").startswith("locmem-"))
+
+    def test_file_backend_appends_every_message(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(SMS_FILE_PATH=Path(directory)):
+            backend = sms.FileBackend(max_concurrency=4)
+            ids = backend.send_messages(self.messages)
+            log = (Path(directory) / "outbox.log").read_text(encoding="utf-8")
+        for sid, (to_number, message) in zip(ids, self.messages):
+            self.assertIn(f"--- {sid} to {to_number}\n{message}\n", log)
+
+    def test_failures_are_none_in_order(self):
+        class FlakyBackend(sms.LocMemBackend):
+            def send(self, to_number, message):
+                return None if to_number.endswith("7") else super().send(to_number, message)
+
+        ids = FlakyBackend(max_concurrency=8).send_messages(self.messages)
+        self.assertEqual([sid is None for sid in ids], [n % 10 == 7 for n in range(20)])
+
+
+class EmailTests(TestCase):
+    """Mail helpers open connections only when there is mail, and web requests don't keep them."""
+
+    def test_no_messages_opens_no_connection(self):
+        with mock.patch("parking.utils.email.get_connection") as get_connection:
+            self.assertEqual(send_bulk_emails([]), 0)
+        get_connection.assert_not_called()
+        self.assertEqual(send_bulk_emails([("Hi", "Body", "driver@example.com")]), 1)
+
+    def test_shared_connection_is_closed_when_the_request_ends(self):
+        connection = mock.Mock(send_messages=mock.Mock(return_value=1))
+        with mock.patch("parking.utils.email.get_connection", return_value=connection):
+            send_reservation_email("driver@example.com", "Hi", "Body")
+            send_reservation_email("driver@example.com", "Hi", "Body")
+            connection.close.assert_not_called()
+            request_finished.send(sender=self.__class__)
+        connection.close.assert_called_once_with()
+
+
+class DashboardSummaryTests(TestCase):
+    """The dashboard is one query when cold, none when cached, and fresh after writes."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.zones = [Zone.objects.create(name=f"Zone {n}", capacity=5) for n in range(3)]
+        self.spots = [ParkingSpot.objects.create(zone=zone, spot_number=str(n)) for zone in self.zones for n in range(5)]
+        book_spot(self.admin, self.spots[0].id, now(), now() + timedelta(hours=1))
+        yesterday = now() - timedelta(days=1)
+        Reservation.objects.create(user=self.admin, spot=self.spots[6], start_time=yesterday, end_time=yesterday + timedelta(hours=1))
+        invalidate_dashboard()
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/parking/dashboard/summary/").json()
+        self.assertEqual(
+            {k: data[k] for k in ("total_zones", "total_spots", "reserved_spots", "available_spots", "today_reservations")},
+            {"total_zones": 3, "total_spots": 15, "reserved_spots": 1, "available_spots": 14, "today_reservations": 1},
+        )
+        self.assertEqual([z["today_reservations"] for z in data["zones"]], [1, 0, 0])
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/parking/dashboard/summary/")
+
+        book_spot(self.admin, self.spots[5].id, now(), now() + timedelta(hours=1))
+        data = self.client.get("/api/parking/dashboard/summary/").json()
+        self.assertEqual((data["reserved_spots"], data["today_reservations"]), (2, 2))
+
+
+class OccupancyRollupTests(TestCase):
+    """Hourly rollups match a brute-force count and back the analytics endpoint on their own."""
+
+    def test_buckets_match_brute_force(self):
+        rng = np.random.default_rng(3)
+        zones, hours = 3, 48
+        zone_index = rng.integers(0, zones, 500)
+        starts = rng.integers(-5 * 3600, hours * 3600, 500)
+        ends = starts + rng.integers(60, 10 * 3600, 500)
+        seconds, started = hourly_buckets(zone_index, starts, ends, zones, hours)
+
+        expected = np.zeros((zones, hours), dtype=np.int64)
+        for z, s, e in zip(zone_index, starts, ends):
+            for h in range(hours):
+                expected[z, h] += max(0, min(e, (h + 1) * 3600) - max(s, h * 3600))
+        np.testing.assert_array_equal(seconds, expected)
+        self.assertEqual(started.sum(), np.count_nonzero(starts >= 0))
+
+    def test_endpoint_reads_only_rollups(self):
+        admin = User.objects.create_user(username="admin", email="admin@example.com", is_staff=True)
+        zone = Zone.objects.create(name="Dock", capacity=2)
+        spots = [ParkingSpot.objects.create(zone=zone, spot_number=str(n)) for n in range(2)]
+        day = now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        # One spot for 09:00-11:00 and the other for 09:30-10:00: 90 of 120 spot-minutes at 09:00.
+        Reservation.objects.create(user=admin, spot=spots[0], start_time=day + timedelta(hours=9), end_time=day + timedelta(hours=11))
+        Reservation.objects.create(user=admin, spot=spots[1], start_time=day + timedelta(hours=9, minutes=30), end_time=day + timedelta(hours=10))
+        rollup_range(day, day + timedelta(days=1))
+        self.assertEqual(ZoneHourlyOccupancy.objects.count(), 2)
+
+        client = APIClient()
+        client.force_authenticate(admin)
+        params = {"from": day.isoformat(), "to": (day + timedelta(days=1)).isoformat()}
+        with self.assertNumQueries(2):  # zones, rollup rows
+            series = client.get("/api/parking/analytics/occupancy/", params).json()
+        self.assertEqual(series["zones"][0]["occupancy"][9:12], [0.75, 0.5, 0.0])
+        self.assertEqual(series["overall"]["reservations_started"][9], 2)
+
+        heatmap = client.get("/api/parking/analytics/occupancy/", {**params, "view": "heatmap"}).json()
+        self.assertEqual(heatmap["occupancy"][day.weekday()][9], 0.75)
+
+
+class ReceiptTests(TestCase):
+    """Receipts render their HTML once per request, survive eviction races, and never print a missing price."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        spot = ParkingSpot.objects.create(zone=Zone.objects.create(name="Center", capacity=1), spot_number="1")
+        start = now() + timedelta(hours=1)
+        self.reservation = Reservation.objects.create(
+            user=self.user, spot=spot, start_time=start, end_time=start + timedelta(minutes=90),
+            stripe_session_id="cs_receipt", price=Decimal("400"),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(RECEIPT_CACHE_DIR=Path(cache_dir.name)))
+        # xhtml2pdf warns about the CSS it skips on every render.
+        self.enterContext(mock.patch.object(logging.getLogger("xhtml2pdf"), "level", logging.CRITICAL))
+
+    def _receipt(self):
+        return Reservation.objects.for_api().get(pk=self.reservation.pk)
+
+    def test_download_renders_html_once_and_revalidates(self):
+        url = f"/api/parking/reservations/{self.reservation.pk}/receipt/"
+        with mock.patch("parking.utils.pdf.render_to_string", wraps=render_to_string) as render:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+            self.assertEqual(render.call_count, 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_receipt_evicted_before_opening_is_rendered_again(self):
+        evicted = []
+
+        def evict_once(reservation, html=None):
+            path, etag = get_receipt_pdf(reservation, html)
+            if not evicted:
+                evicted.append(path)
+                path.unlink()
+            return path, etag
+
+        with mock.patch("parking.utils.pdf.get_receipt_pdf", side_effect=evict_once):
+            pdf, _ = open_receipt_pdf(self._receipt())
+        with pdf:
+            self.assertTrue(pdf.read(4) == b"%PDF" and Path(pdf.name).exists())
+        self.assertEqual(len(evicted), 1)
+
+    def test_price_is_backfilled_or_left_out(self):
+        Reservation.objects.filter(pk=self.reservation.pk).update(price=None)
+        self.assertNotIn("Price:", render_receipt_html(self._receipt()))
+
+        backfill = import_module("parking.migrations.0017_backfill_reservation_price").backfill_price
+        backfill(django_apps, None)
+        self.assertEqual(self._receipt().price, Decimal("400"))
+        self.assertIn("400.00 TRY", render_receipt_html(self._receipt()))
+
+
+class PricingTests(TestCase):
+    """Quotes come from the tariff table, in one lookup, and follow tariff edits."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.center, self.suburb = Zone.objects.create(name="Center", capacity=1), Zone.objects.create(name="Suburb", capacity=1)
+        self.spot = ParkingSpot.objects.create(zone=self.suburb, spot_number="1")
+        # Tariffs written here are rolled back, which no signal reports.
+        self.addCleanup(invalidate_prices)
+
+    def _quote(self, *items):
+        start = now()
+        payload = [
+            {**target, "start_time": start.isoformat(), "end_time": (start + timedelta(hours=hours)).isoformat()}
+            for target, hours in items
+        ]
+        response = self.client.post("/api/parking/pricing/quote/", {"items": payload}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [quote.get("price", quote.get("error")) for quote in response.json()["quotes"]]
+
+    def test_default_tiers_match_the_old_prices(self):
+        self.assertEqual(
+            self._quote(({"spot": self.spot.id}, 0.5), ({"spot": self.spot.id}, 1), ({"zone": self.center.id}, 1.5),
+                        ({"zone": self.center.id}, 3), ({"zone": self.center.id}, 12), ({"spot": 999999}, 1)),
+            ["250.00", "250.00", "400.00", "500.00", "600.00", "Spot or zone not found."],
+        )
+
+    def test_zone_tariff_overrides_default_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tariff.objects.create(zone=self.center, max_hours=2, price=100)
+        self.assertEqual(
+            self._quote(({"zone": self.center.id}, 2), ({"zone": self.center.id}, 3), ({"zone": self.suburb.id}, 2)),
+            ["100.00", "No tariff covers that stay.", "400.00"],
+        )
+
+
+    def test_naive_and_aware_times_mix(self):
+        start = now().replace(microsecond=0)
+        naive = localtime(start).replace(tzinfo=None)
+        response = self.client.post("/api/parking/pricing/quote/", {"items": [
+            {"spot": self.spot.id, "start_time": naive.isoformat(), "end_time": (start + timedelta(hours=2)).isoformat()},
+            {"spot": self.spot.id, "start_time": start.isoformat(), "end_time": (naive + timedelta(hours=3)).isoformat()},
+        ]}, format="json")
+        self.assertEqual([quote["price"] for quote in response.json()["quotes"]], ["400.00", "500.00"])
+
+    def test_tier_is_unique_even_without_zone_or_limit(self):
+        Tariff.objects.create(zone=self.center, max_hours=None, price=700)
+        for zone, max_hours in ((None, None), (None, 1), (self.center, None)):
+            with self.subTest(zone=zone, max_hours=max_hours):
+                with self.assertRaises(ValidationError):
+                    Tariff(zone=zone, max_hours=max_hours, price=1).full_clean()
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    Tariff.objects.create(zone=zone, max_hours=max_hours, price=1)
+        Tariff(zone=self.suburb, max_hours=None, price=1).full_clean()
+
+class ReserveAndPayTests(TestCase):
+    """The async checkout view authenticates by JWT and awaits the pooled Stripe client."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com", plate_number="34ABC123")
+        self.spot = ParkingSpot.objects.create(zone=Zone.objects.create(name="Center", capacity=1), spot_number="1")
+        self.auth = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.gateway = mock.Mock()
+        self.gateway.create_checkout_session = mock.AsyncMock(return_value=mock.Mock(url="https://checkout.test/cs_1"))
+        patcher = mock.patch("parking.views.get_stripe_gateway", return_value=self.gateway)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start = now() + timedelta(hours=1)
+
+    def _body(self, minutes=90):
+        return {
+            "spot": self.spot.id,
+            "start_time": self.start.isoformat(),
+            "end_time": (self.start + timedelta(minutes=minutes)).isoformat(),
+        }
+
+    async def test_checkout_under_asgi(self):
+        response = await self.async_client.post(
+            "/api/parking/reserve-and-pay/", self._body(), content_type="application/json", headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"session_url": "https://checkout.test/cs_1"})
+        params = self.gateway.create_checkout_session.await_args.args[0]
+        self.assertEqual(params["line_items"][0]["price_data"]["unit_amount"], 40000)
+        self.assertEqual(params["metadata"]["plate_number"], "34ABC123")
+
+    def test_rejects_bad_requests_before_calling_stripe(self):
+        post = lambda body, headers=self.auth: self.client.post(
+            "/api/parking/reserve-and-pay/", body, content_type="application/json", headers=headers,
+        )
+        self.assertEqual(post(self._body(), headers={}).status_code, 401)
+        self.assertEqual(post(self._body(), headers={"Authorization": "Bearer nope"}).status_code, 401)
+        self.assertEqual(post({**self._body(), "spot": 999999}).status_code, 404)
+        self.assertEqual(post(self._body(minutes=-30)).status_code, 400)
+
+        Reservation.objects.create(user=self.user, spot=self.spot, start_time=self.start, end_time=self.start + timedelta(hours=2))
+        self.assertEqual(post(self._body()).status_code, 409)
+        self.gateway.create_checkout_session.assert_not_called()
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test")
+class StripeWebhookTests(TestCase):
+    """Paid checkouts become reservations exactly once; failures are left for Stripe to retry."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.spot = ParkingSpot.objects.create(zone=Zone.objects.create(name="Center", capacity=1), spot_number="1")
+        self.start = now().replace(microsecond=0) + timedelta(hours=1)
+        patcher = mock.patch("parking.views.enqueue_reservation_notifications")
+        self.notify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _deliver(self, event_id="evt_1", session_id="cs_1"):
+        payload = json.dumps({
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": session_id, "amount_total": 40000, "payment_intent": "pi_1",
+                "metadata": {
+                    "user_id": str(self.user.id), "spot_id": str(self.spot.id), "plate_number": "34ABC123",
+                    "start_time": self.start.isoformat(), "end_time": (self.start + timedelta(hours=2)).isoformat(),
+                },
+            }},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(b"whsec_test", f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/parking/stripe/webhook/", payload, content_type="application/json",
+                headers={"Stripe-Signature": f"t={timestamp},v1={signature}"},
+            )
+
+    def test_replay_is_acknowledged_once(self):
+        self.assertEqual(self._deliver().status_code, 200)
+        self.assertEqual(self._deliver().status_code, 200)
+        self.assertEqual(Reservation.objects.filter(stripe_session_id="cs_1").count(), 1)
+        self.notify.assert_called_once()
+
+    def test_broker_failure_after_booking_still_notifies(self):
+        with mock.patch.object(send_expiry_reminder, "apply_async", side_effect=ConnectionRefusedError), \
+                self.assertLogs("parking.tasks", "ERROR"):
+            self.assertEqual(self._deliver().status_code, 200)
+        self.assertTrue(Reservation.objects.filter(stripe_session_id="cs_1").exists())
+        self.notify.assert_called_once()
+
+    def test_failure_rolls_back_the_claim_and_the_retry_books(self):
+        real_book_spot = book_spot
+        calls = []
+
+        def flaky_book_spot(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return real_book_spot(*args, **kwargs)
+
+        with mock.patch("parking.views.book_spot", flaky_book_spot):
+            with self.assertLogs("parking.views", "ERROR"):
+                self.assertEqual(self._deliver().status_code, 500)
+            self.assertFalse(StripeEvent.objects.filter(event_id="evt_1").exists())
+            self.assertEqual(self._deliver().status_code, 200)
+        self.assertTrue(Reservation.objects.filter(stripe_session_id="cs_1").exists())
+        self.assertTrue(StripeEvent.objects.filter(event_id="evt_1").exists())
+
+    def test_webhook_only_enqueues_notifications(self):
+        self.notify.side_effect = enqueue_reservation_notifications
+        # As in production: tasks go to the broker instead of running inline.
+        with override_settings(CELERY_TASK_ALWAYS_EAGER=False), \
+                mock.patch.object(celery_app, "send_task") as send_task, \
+                mock.patch("parking.utils.email.send_reservation_email") as email, \
+                mock.patch("parking.utils.sms.send_sms") as sms:
+            self.assertEqual(self._deliver().status_code, 200)
+
+        reservation = Reservation.objects.get(stripe_session_id="cs_1")
+        queued = {call.args[0]: call.args[1] for call in send_task.call_args_list}
+        self.assertEqual(queued["parking.tasks.send_reservation_confirmation_email"], (reservation.id,))
+        self.assertEqual(queued["parking.tasks.send_reservation_confirmation_sms"], (reservation.id,))
+        email.assert_not_called()
+        sms.assert_not_called()
+
+    def test_taken_spot_is_refunded_after_commit(self):
+        Reservation.objects.create(user=self.user, spot=self.spot, start_time=self.start, end_time=self.start + timedelta(hours=1))
+        with mock.patch("parking.views.refund_checkout_session") as refund, self.assertLogs("parking.views", "WARNING"):
+            self.assertEqual(self._deliver().status_code, 200)
+        refund.delay.assert_called_once_with("cs_1", "pi_1")
+        self.assertFalse(Reservation.objects.filter(stripe_session_id="cs_1").exists())
+
+        gateway = mock.Mock()
+        gateway.create_refund = mock.AsyncMock(return_value=mock.Mock(id="re_1"))
+        with mock.patch("parking.utils.payments.get_stripe_gateway", return_value=gateway):
+            self.assertEqual(refund_checkout_session("cs_1", "pi_1"), "re_1")
+        gateway.create_refund.assert_awaited_once_with({"payment_intent": "pi_1"}, idempotency_key="refund-cs_1")
+
+
+class ConditionalGetTests(TestCase):
+    """Zone and spot polls are versioned per zone: unchanged ones get a 304 without a query."""
+
+    def setUp(self):
+        cache.clear()  # user ids repeat across tests; so would their cached account status
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.center, self.suburb = Zone.objects.create(name="Center", capacity=2), Zone.objects.create(name="Suburb", capacity=1)
+            self.spot = ParkingSpot.objects.create(zone=self.center, spot_number="1")
+            ParkingSpot.objects.create(zone=self.suburb, spot_number="1")
+
+    def _poll(self, url, etag=None):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(url)
+
+    def test_unchanged_poll_is_304_without_queries(self):
+        for url in ("/api/parking/zones/", f"/api/parking/zones/{self.center.id}/", f"/api/parking/spots/?zone_id={self.center.id}"):
+            first = self._poll(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertNotIn("Last-Modified", first)
+            with self.assertNumQueries(0):
+                again = self._poll(url, first["ETag"])
+                cached = self._poll(url)
+            self.assertEqual((again.status_code, again["ETag"]), (304, first["ETag"]))
+            self.assertEqual(cached.json(), first.json())
+
+    def test_writes_change_only_their_zone(self):
+        center_url, suburb_url = (f"/api/parking/spots/?zone_id={zone.id}" for zone in (self.center, self.suburb))
+        center, suburb, zones = self._poll(center_url), self._poll(suburb_url), self._poll("/api/parking/zones/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spot.is_reserved = True
+            self.spot.save()
+
+        self.assertEqual(self._poll(suburb_url, suburb["ETag"]).status_code, 304)
+        fresh = self._poll(center_url, center["ETag"])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertTrue(fresh.json()[0]["is_reserved"])
+        listing = self._poll("/api/parking/zones/", zones["ETag"])
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual({zone["name"]: zone["available"] for zone in listing.json()}, {"Center": 0, "Suburb": 1})
+
+
+    def test_deactivated_or_deleted_user_loses_read_access(self):
+        url = f"/api/parking/zones/{self.center.id}/"
+        self.assertEqual(self._poll(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self._poll(url).status_code, 401)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self._poll(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self._poll(url).status_code, 401)
+
+class NearbyTests(TestCase):
+    """Nearest zones/spots come from the grid buckets, filtered by radius and availability."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="driver", email="driver@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.center = Zone.objects.create(name="Center", capacity=1, latitude=41.0, longitude=29.0)
+            self.near = Zone.objects.create(name="Near", capacity=2, latitude=41.005, longitude=29.0)
+            self.far = Zone.objects.create(name="Far", capacity=1, latitude=41.1, longitude=29.0)
+            self.full = ParkingSpot.objects.create(zone=self.center, spot_number="1")
+            self.spots = [
+                ParkingSpot.objects.create(zone=self.near, spot_number=str(n), latitude=41.005 - n * 0.001, longitude=29.0)
+                for n in (1, 2)
+            ]
+            ParkingSpot.objects.create(zone=self.far, spot_number="1")
+        self.start = now() + timedelta(hours=1)
+        Reservation.objects.create(user=self.user, spot=self.full, start_time=self.start, end_time=self.start + timedelta(hours=2))
+
+    def _nearby(self, **params):
+        params = {"lat": 41.0, "lon": 29.0, "radius": 2000, "start": self.start.isoformat(),
+                  "end": (self.start + timedelta(hours=1)).isoformat(), **params}
+        response = self.client.get("/api/parking/nearby/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_nearest_zones_and_spots_with_free_spots(self):
+        zones = self._nearby()
+        self.assertEqual([(zone["name"], zone["free_spots"]) for zone in zones], [("Near", 2)])
+        self.assertAlmostEqual(zones[0]["distance_m"], 556, delta=2)
+        # The full zone counts again outside its reservation.
+        later = self.start + timedelta(hours=3)
+        self.assertEqual([zone["name"] for zone in self._nearby(start=later.isoformat(), end="")], ["Center", "Near"])
+
+        spots = self._nearby(kind="spots", k=1)
+        self.assertEqual([spot["id"] for spot in spots], [self.spots[1].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spots[0].latitude = 41.0001
+            self.spots[0].save()
+        self.assertEqual([spot["id"] for spot in self._nearby(kind="spots")], [self.spots[0].id, self.spots[1].id])
+
+    def test_impossible_date_is_a_bad_request(self):
+        response = self.client.get("/api/parking/nearby/", {"lat": 41.0, "lon": 29.0, "start": "2024-02-30T10:00"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_buckets_match_brute_force(self):
+        rng = np.random.default_rng(7)
+        lats, lons = rng.uniform(40.9, 41.2, 5000), rng.uniform(28.8, 29.3, 5000)
+        points = PointSet(lats, lons)
+        for lat, lon, radius in [(41.0, 29.0, 500), (41.05, 29.1, 3000), (41.2, 29.3, 8000)]:
+            rows, distances = points.within(lat, lon, radius)
+            everything = haversine_m(lat, lon, lats, lons)
+            self.assertEqual(set(rows.tolist()), set(np.flatnonzero(everything <= radius).tolist()))
+            self.assertTrue(np.all(np.diff(distances) >= 0))
+
+
+class RequestTimingTests(TestCase):
+    """Every response carries a Server-Timing breakdown, and admins can scrape the histograms."""
+
+    def setUp(self):
+        # A zone list cached by an earlier test would be answered without queries.
+        cache.clear()
+        clear_histograms()
+        self.addCleanup(clear_histograms)
+        self.client = APIClient()
+        driver = User.objects.create_user(username="driver", email="driver@example.com")
+        admin = User.objects.create_user(username="admin", email="admin@example.com", is_staff=True)
+        self.driver_auth = f"Bearer {AccessToken.for_user(driver)}"
+        self.admin_auth = f"Bearer {AccessToken.for_user(admin)}"
+        Zone.objects.create(name="Center", capacity=2)
+
+    def _stages(self, response):
+        return {entry.split(";")[0]: entry for entry in response["Server-Timing"].split(", ")}
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get("/api/parking/zones/", HTTP_AUTHORIZATION=self.driver_auth)
+        self.assertEqual(response.status_code, 200)
+        stages = self._stages(response)
+        self.assertEqual(set(stages), {"db", "view", "render", "total"})
+        self.assertRegex(stages["db"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+        metrics = self.client.get("/api/parking/metrics/", HTTP_AUTHORIZATION=self.admin_auth)
+        self.assertEqual(metrics.status_code, 200)
+        self.assertTrue(metrics["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = metrics.content.decode()
+        self.assertIn('easypark_request_duration_seconds_count{view="zone-list",method="GET",status="200"} 1', text)
+        self.assertIn('easypark_request_duration_seconds_bucket{view="zone-list",method="GET",status="200",le="+Inf"} 1', text)
+        self.assertIn('easypark_request_stage_seconds_count{view="zone-list",stage="render"} 1', text)
+
+    async def test_server_timing_under_asgi(self):
+        response = await self.async_client.get("/api/parking/zones/", headers={"Authorization": self.driver_auth})
+        self.assertEqual(response.status_code, 200)
+        stages = self._stages(response)
+        self.assertEqual(set(stages), {"db", "view", "render", "total"})
+        # The queries ran in a sync_to_async thread and still count.
+        self.assertRegex(stages["db"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+        async def get_response(request):
+            return None
+        self.assertTrue(iscoroutinefunction(RequestTimingMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(RequestTimingMiddleware(lambda request: None)))
+
+    def test_external_calls_are_timed(self):
+        def summary():
+            with timed("twilio"):
+                time.sleep(0.01)
+            return {}
+
+        with mock.patch("parking.views.dashboard_summary", summary):
+            response = self.client.get("/api/parking/dashboard/summary/", HTTP_AUTHORIZATION=self.admin_auth)
+        self.assertEqual(response.status_code, 200)
+        twilio = self._stages(response)["twilio"]
+        self.assertRegex(twilio, r'^twilio;dur=[\d.]+;desc="1 calls"$')
+        self.assertGreaterEqual(float(twilio.split("dur=")[1].split(";")[0]), 10)
+
+    def test_calls_from_worker_threads_count_towards_the_request(self):
+        class TimedBackend(sms.LocMemBackend):
+            def send(self, to_number, message):
+                with timed("twilio"):
+                    return super().send(to_number, message)
+
+        timings, token = start_request()
+        try:
+            TimedBackend(max_concurrency=4).send_messages([(f"+90555000{n:04d}", "hi") for n in range(50)])
+            dispatch([mock.Mock(user=mock.Mock(phone_number="", email="driver@example.com"), end_time=now())])
+        finally:
+            end_request(token)
+            sms.outbox.clear()
+        self.assertEqual((timings.calls("twilio"), timings.calls("smtp")), (50, 1))
+
+    def test_metrics_are_admin_only(self):
+        response = self.client.get("/api/parking/metrics/", HTTP_AUTHORIZATION=self.driver_auth)
+        self.assertEqual(response.status_code, 403)
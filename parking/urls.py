@@ -2,15 +2,22 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     reservation_by_session,
+    reservation_receipt,
     ReservationCreateView,
     ReservationListView,
     ZoneViewSet,
     ParkingSpotViewSet,
     generate_spots,
     available_spots,
+    nearby,
     ReserveAndPayView,
+    PriceQuoteView,
     admin_dashboard_summary,
+    occupancy_analytics,
     LicensePlateRecognitionView,
+    BatchPlateRecognitionView,
+    plate_recognition_metrics,
+    request_metrics,
     StripeWebhookView,
     AdminReservationListView, 
     
@@ -19,18 +26,25 @@ from .views import (
 # Custom paths FIRST — to avoid router conflict
 urlpatterns = [
     path("spots/available/", available_spots, name="available-spots"),
+    path("nearby/", nearby, name="nearby"),
     path("reservations/create/", ReservationCreateView.as_view()),
     path("reservations/", ReservationListView.as_view()),
     path("spots/generate/", generate_spots),
     path("plate-recognition/", LicensePlateRecognitionView.as_view(), name="plate-recognition"),
+    path("plate-recognition/batch/", BatchPlateRecognitionView.as_view(), name="plate-recognition-batch"),
+    path("plate-recognition/metrics/", plate_recognition_metrics, name="plate-recognition-metrics"),
+    path("metrics/", request_metrics, name="request-metrics"),
     path("reserve-and-pay/", ReserveAndPayView.as_view()),
+    path("pricing/quote/", PriceQuoteView.as_view(), name="price-quote"),
     path("dashboard/summary/", admin_dashboard_summary),
+    path("analytics/occupancy/", occupancy_analytics, name="occupancy-analytics"),
     path("reservations/all/", AdminReservationListView.as_view(), name="admin-reservations"),
 
 
     # Stripe webhook URL for payment confirmation
     path("stripe/webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
     path("reservations/by-session/", reservation_by_session, name="reservation-by-session"),
+    path("reservations/<int:pk>/receipt/", reservation_receipt, name="reservation-receipt"),
 
 ]
 
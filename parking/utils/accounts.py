@@ -0,0 +1,30 @@
+"""
+Cached account status for stateless token checks.
+
+``StatelessReadJWTAuthentication`` doesn't load the user on reads, but a
+deactivated or deleted account must still lose access. Whether a user id
+belongs to an active account is cached per id, and dropped when the user is
+saved or deleted (signals). ``QuerySet.update()`` sends no signal: such
+changes show after ``ACTIVE_USER_CACHE_TTL`` seconds at the latest.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+ACTIVE_KEY = "auth:active:{}"
+
+
+def is_active_user(user_id):
+    """Whether `user_id` names an existing, active user; one query per id per TTL."""
+    key = ACTIVE_KEY.format(user_id)
+    active = cache.get(key)
+    if active is None:
+        active = get_user_model().objects.filter(pk=user_id, is_active=True).exists()
+        cache.set(key, active, getattr(settings, 'ACTIVE_USER_CACHE_TTL', 60))
+    return active
+
+
+def forget_user(user_id):
+    """Drops the cached status once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(ACTIVE_KEY.format(user_id)))
@@ -0,0 +1,259 @@
+"""
+In-memory availability index for parking zones.
+
+For every zone we keep, per spot, the reservations that have not ended yet as
+a list sorted by start time together with a running maximum of their end
+times. "Is this spot busy during [start, end)?" then becomes one bisect plus
+one array lookup, so answering a zone query costs O(spots * log reservations)
+no matter how much reservation history the table holds.
+
+The index mirrors the SQL query used by ``available_spots`` and the check in
+``book_spot``: a spot is busy if any reservation on it, active or not,
+overlaps the requested window. Each zone index carries
+a version that is also stored in Django's cache; committed writes bump it (the
+signals apply them in ``on_commit``), so other processes notice their copy is
+stale and fall back to SQL until they rebuild. A process applies its own write
+only if its bump lands exactly one past the version it holds (see
+``parking.utils.versions``). A build reads the version before the rows, so it
+can never pair a new version with rows from before it.
+"""
+import threading
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from .versions import bump_version, current_version
+
+STAMP_KEY = "availability:zone:{}"
+
+# How old the horizon may get before a query prunes ended reservations.
+PRUNE_AFTER = timedelta(minutes=15)
+# Reservations that ended this recently stay indexed, so windows starting a
+# little in the past (start=now, client clock skew) are still answered.
+LOOKBACK = timedelta(minutes=15)
+
+
+class SpotIntervals:
+    """Reservations of one spot, sorted by start time."""
+
+    __slots__ = ("starts", "ends", "ids", "max_ends")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_ends = []
+
+    def _rebuild_max(self, frm=0):
+        del self.max_ends[frm:]
+        running = self.max_ends[frm - 1] if frm else None
+        for end in self.ends[frm:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def add(self, reservation_id, start, end):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, reservation_id)
+        self._rebuild_max(i)
+
+    def remove(self, reservation_id):
+        try:
+            i = self.ids.index(reservation_id)
+        except ValueError:
+            return False
+        del self.starts[i], self.ends[i], self.ids[i]
+        self._rebuild_max(i)
+        return True
+
+    def prune(self, horizon):
+        keep = [k for k, end in enumerate(self.ends) if end > horizon]
+        if len(keep) == len(self.ends):
+            return
+        self.starts = [self.starts[k] for k in keep]
+        self.ends = [self.ends[k] for k in keep]
+        self.ids = [self.ids[k] for k in keep]
+        self._rebuild_max()
+
+    def overlaps(self, start, end):
+        # Reservations [0, i) start before `end`; the spot is busy if any of
+        # them is still running after `start`.
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.max_ends[i - 1] > start
+
+
+class ZoneIndex:
+    def __init__(self, zone_id, stamp, horizon):
+        self.zone_id = zone_id
+        self.stamp = stamp
+        # Reservations that ended at or before the horizon are not indexed,
+        # so only windows starting at or after it can be answered.
+        self.horizon = horizon
+        self.spots = {}
+        self.reservation_spot = {}
+
+    def add_reservation(self, reservation_id, spot_id, start, end):
+        intervals = self.spots.get(spot_id)
+        if intervals is None or end <= self.horizon:
+            return
+        intervals.add(reservation_id, start, end)
+        self.reservation_spot[reservation_id] = spot_id
+
+    def remove_reservation(self, reservation_id):
+        spot_id = self.reservation_spot.pop(reservation_id, None)
+        if spot_id is not None and spot_id in self.spots:
+            self.spots[spot_id].remove(reservation_id)
+
+    def prune(self, horizon):
+        if horizon <= self.horizon:
+            return
+        self.horizon = horizon
+        for intervals in self.spots.values():
+            intervals.prune(horizon)
+        self.reservation_spot = {
+            rid: spot_id
+            for spot_id, intervals in self.spots.items()
+            for rid in intervals.ids
+        }
+
+    def free_spot_ids(self, start, end):
+        return [
+            spot_id
+            for spot_id, intervals in self.spots.items()
+            if not intervals.overlaps(start, end)
+        ]
+
+
+class AvailabilityIndex:
+    """Process-wide registry of zone indexes."""
+
+    def __init__(self):
+        self._zones = {}
+        self._lock = threading.RLock()
+
+    # --- Stamps shared through the cache ---
+    def _current_stamp(self, zone_id):
+        return cache.get(STAMP_KEY.format(zone_id))
+
+    def _bump_stamp(self, zone_id):
+        return bump_version(STAMP_KEY.format(zone_id))
+
+    # --- Reads ---
+    def _fresh(self, zone_id):
+        index = self._zones.get(zone_id)
+        if index is None or index.stamp != self._current_stamp(zone_id):
+            return None
+        return index
+
+    def is_fresh(self, zone_id):
+        """Whether this process holds an up-to-date index for the zone."""
+        with self._lock:
+            return self._fresh(zone_id) is not None
+
+    def free_spot_ids(self, zone_id, start, end):
+        """
+        Returns the ids of spots in the zone with no reservation overlapping
+        [start, end), or None if the index cannot answer (cold, stale, or the
+        window starts before the indexed horizon). Only a cold or stale index
+        needs warm(); older windows just have to be answered from SQL.
+        """
+        with self._lock:
+            index = self._fresh(zone_id)
+            if index is None or start < index.horizon:
+                return None
+            horizon = now() - LOOKBACK
+            if horizon - index.horizon > PRUNE_AFTER and start >= horizon:
+                index.prune(horizon)
+            return index.free_spot_ids(start, end)
+
+    # --- Builds ---
+    def warm(self, zone_id):
+        """Builds (or rebuilds) the index for one zone from the database."""
+        from parking.models import ParkingSpot, Reservation
+
+        horizon = now() - LOOKBACK
+        stamp = current_version(STAMP_KEY.format(zone_id))
+        index = ZoneIndex(zone_id, stamp, horizon)
+        for spot_id in ParkingSpot.objects.filter(zone_id=zone_id).values_list("id", flat=True):
+            index.spots[spot_id] = SpotIntervals()
+
+        rows = Reservation.objects.filter(
+            spot__zone_id=zone_id,
+            end_time__gt=horizon,
+        ).order_by("start_time").values_list("id", "spot_id", "start_time", "end_time")
+        for reservation_id, spot_id, start, end in rows.iterator():
+            intervals = index.spots.get(spot_id)
+            if intervals is None:
+                continue
+            # Rows arrive sorted by start, so append and extend the max.
+            intervals.starts.append(start)
+            intervals.ends.append(end)
+            intervals.ids.append(reservation_id)
+            last = intervals.max_ends[-1] if intervals.max_ends else None
+            intervals.max_ends.append(end if last is None or end > last else last)
+            index.reservation_spot[reservation_id] = spot_id
+
+        with self._lock:
+            self._zones[zone_id] = index
+        return index
+
+    def invalidate(self, zone_id):
+        """Marks a zone stale everywhere, e.g. after bulk writes that skip signals."""
+        with self._lock:
+            self._bump_stamp(zone_id)
+            self._zones.pop(zone_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._zones.clear()
+
+    def prune(self, horizon=None):
+        """Drops reservations that ended before the lookback from every loaded zone."""
+        horizon = horizon or now() - LOOKBACK
+        with self._lock:
+            for index in self._zones.values():
+                index.prune(horizon)
+
+    # --- Incremental updates (called from signals) ---
+    def _apply(self, zone_id, change):
+        with self._lock:
+            index = self._zones.get(zone_id)
+            stamp = self._bump_stamp(zone_id)
+            if index is None or stamp != index.stamp + 1:
+                # Cold, or another process wrote since our version: reload on the next query.
+                self._zones.pop(zone_id, None)
+                return
+            change(index)
+            index.stamp = stamp
+
+    def reservation_saved(self, reservation, zone_id):
+        def change(index):
+            index.remove_reservation(reservation.pk)
+            index.add_reservation(reservation.pk, reservation.spot_id, reservation.start_time, reservation.end_time)
+
+        # The reservation may have moved from a spot in another zone.
+        with self._lock:
+            for other in list(self._zones.values()):
+                if other.zone_id != zone_id and reservation.pk in other.reservation_spot:
+                    self._apply(other.zone_id, lambda index: index.remove_reservation(reservation.pk))
+            self._apply(zone_id, change)
+
+    def reservation_deleted(self, reservation, zone_id):
+        self._apply(zone_id, lambda index: index.remove_reservation(reservation.pk))
+
+    def spot_added(self, spot_id, zone_id):
+        self._apply(zone_id, lambda index: index.spots.setdefault(spot_id, SpotIntervals()))
+
+    def spot_removed(self, spot_id, zone_id):
+        def change(index):
+            intervals = index.spots.pop(spot_id, None)
+            for reservation_id in intervals.ids if intervals else ():
+                index.reservation_spot.pop(reservation_id, None)
+
+        self._apply(zone_id, change)
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,57 @@
+from django.db import transaction
+
+from parking.models import ParkingSpot, Reservation
+from parking.tasks import schedule_expiry_reminder
+
+
+class SpotUnavailable(Exception):
+    """Raised when the requested window overlaps a reservation on the spot."""
+
+
+def overlapping_reservations(spot_id, start, end):
+    """
+    Reservations on the spot overlapping [start, end). A reservation holds its
+    spot for its whole window, even once no-show expiry has deactivated it:
+    nothing records whether the car actually arrived.
+    """
+    return Reservation.objects.filter(
+        spot_id=spot_id,
+        start_time__lt=end,
+        end_time__gt=start,
+    )
+
+
+def book_spot(user, spot_id, start, end, plate_number=None, stripe_session_id=None, price=None):
+    """
+    Creates a reservation if the spot is free for [start, end).
+
+    The spot row is locked for the duration of the overlap check and insert, so
+    two bookings for the same spot are serialized while bookings for other
+    spots go through in parallel. On SQLite, which has no row locks, the
+    IMMEDIATE transaction mode configured in settings serializes writers.
+
+    Raises ParkingSpot.DoesNotExist or SpotUnavailable.
+    """
+    with transaction.atomic():
+        spot = ParkingSpot.objects.select_for_update().select_related('zone').get(id=spot_id)
+
+        if overlapping_reservations(spot.id, start, end).exists():
+            raise SpotUnavailable(f"Spot #{spot.spot_number} is already reserved for that time.")
+
+        reservation = Reservation.objects.create(
+            user=user,
+            spot=spot,
+            start_time=start,
+            end_time=end,
+            plate_number=plate_number,
+            stripe_session_id=stripe_session_id,
+            price=price,
+        )
+
+        if not spot.is_reserved:
+            spot.is_reserved = True
+            spot.save(update_fields=['is_reserved'])
+
+        transaction.on_commit(lambda: schedule_expiry_reminder(reservation))
+
+    return reservation
@@ -0,0 +1,50 @@
+"""
+Version stamps for the zone and spot read endpoints.
+
+Every zone has a stamp in Django's cache, and one more covers the zone list. A
+stamp is a random token plus the time it was set. Writes to a zone, its spots,
+its reservations or its counters replace its stamp and the list's once the
+transaction commits (signals, and the ``parking.utils.occupancy`` helpers for
+bulk writes); a change to every zone replaces an epoch stamp that all zone
+stamps are read together with. ``ConditionalGetMixin`` derives ETags from
+these stamps, so an unchanged poll is answered from the cache alone.
+
+Tokens are random rather than counters so an evicted stamp never comes back
+with a value an older response already carried. With several worker processes
+the cache has to be shared (file, Redis, ...); see ``CACHES``.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+EPOCH = "catalog:epoch"
+ALL_ZONES = "catalog:zones"
+ZONE_KEY = "catalog:zone:{}"
+
+
+def _new_stamp():
+    return uuid.uuid4().hex, time.time()
+
+
+def catalog_stamp(zone_id=None):
+    """(token, unix time of the last change) for one zone, or for the zone list if None."""
+    keys = [ALL_ZONES] if zone_id is None else [EPOCH, ZONE_KEY.format(zone_id)]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, _new_stamp(), None)
+            stamps[key] = cache.get(key) or _new_stamp()
+    tokens, times = zip(*(stamps[key] for key in keys))
+    return "".join(tokens), max(times)
+
+
+def touch_zones(zone_ids=None):
+    """Marks the zones (every zone if None) and the zone list as changed once the current transaction commits."""
+    keys = [ALL_ZONES]
+    if zone_ids is None:
+        keys.append(EPOCH)
+    else:
+        keys += [ZONE_KEY.format(zone_id) for zone_id in set(zone_ids) if zone_id is not None]
+    transaction.on_commit(lambda: cache.set_many({key: _new_stamp() for key in keys}, None))
@@ -0,0 +1,75 @@
+"""
+Admin dashboard summary.
+
+One query returns a row per zone: its spot counters from ``ZoneOccupancy`` and
+a correlated count of reservations starting today. That count filters on a
+``start_time`` range, so each spot is one seek on ``reservation_spot_start_idx``.
+The totals are sums of those rows. The result is cached for
+``DASHBOARD_CACHE_TTL`` seconds and dropped on any reservation or spot write
+(signals, and ``rebuild_zone_occupancy`` for bulk writes).
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import localdate, make_aware
+
+from parking.models import Reservation, Zone
+
+CACHE_KEY = "dashboard:summary:{}"
+
+
+def today_range(day=None):
+    """[start, end) of the given local day (default today) as aware datetimes."""
+    day = day or localdate()
+    start = make_aware(datetime.combine(day, time.min))
+    return start, make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def build_summary(day=None):
+    start, end = today_range(day)
+    todays = Reservation.objects.filter(
+        spot__zone=OuterRef('pk'), start_time__gte=start, start_time__lt=end,
+    ).order_by().values('spot__zone').annotate(n=Count('id')).values('n')
+
+    rows = Zone.objects.order_by('name').values_list(
+        'id', 'name',
+        Coalesce('occupancy__total_spots', Value(0)),
+        Coalesce('occupancy__available_spots', Value(0)),
+        Coalesce(Subquery(todays, output_field=IntegerField()), Value(0)),
+    )
+
+    zones = [
+        {
+            "id": zone_id,
+            "name": name,
+            "total_spots": total,
+            "reserved_spots": total - available,
+            "available_spots": available,
+            "today_reservations": today,
+        }
+        for zone_id, name, total, available, today in rows
+    ]
+    return {
+        "total_zones": len(zones),
+        "total_spots": sum(z["total_spots"] for z in zones),
+        "reserved_spots": sum(z["reserved_spots"] for z in zones),
+        "available_spots": sum(z["available_spots"] for z in zones),
+        "today_reservations": sum(z["today_reservations"] for z in zones),
+        "zones": zones,
+    }
+
+
+def dashboard_summary():
+    key = CACHE_KEY.format(localdate().isoformat())
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary()
+        cache.set(key, summary, getattr(settings, 'DASHBOARD_CACHE_TTL', 30))
+    return summary
+
+
+def invalidate_dashboard():
+    cache.delete(CACHE_KEY.format(localdate().isoformat()))
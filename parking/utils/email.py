@@ -1,10 +1,66 @@
-from django.core.mail import send_mail
+import smtplib
+import threading
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import request_finished
+
+from .instrumentation import timed
+
+_shared = threading.local()
+
+
+def _shared_connection():
+    """A per-thread mail connection kept open between calls, so Celery workers reuse one SMTP/TLS session."""
+    if getattr(_shared, 'connection', None) is None:
+        _shared.connection = get_connection()
+    return _shared.connection
+
+
+def close_shared_connection(**kwargs):
+    """Closes this thread's kept-open connection, if any."""
+    connection = getattr(_shared, 'connection', None)
+    if connection is not None:
+        _shared.connection = None
+        connection.close()
+
+
+# Web workers only send here when Celery runs eagerly; don't leave their SMTP session open between requests.
+request_finished.connect(close_shared_connection)
+
+
+def send_bulk_emails(messages, connection=None, batch_size=100):
+    """
+    Sends (subject, body, recipient) tuples over a single mail connection.
+
+    Messages go out in batches of `batch_size` through send_messages(), and the
+    connection is opened once for all of them. Returns the number sent.
+    """
+    messages = list(messages)
+    if not messages:
+        return 0
+    connection = connection or get_connection()
+    emails = [
+        EmailMessage(subject, body, None, [recipient], connection=connection)
+        for subject, body, recipient in messages
+    ]
+
+    sent = 0
+    with timed("smtp"), connection:
+        for offset in range(0, len(emails), batch_size):
+            sent += connection.send_messages(emails[offset:offset + batch_size]) or 0
+    return sent
+
 
 def send_reservation_email(user_email, subject, message):
-    send_mail(
-        subject,
-        message,
-        None, 
-        [user_email],
-        fail_silently=False,
-    )
+    connection = _shared_connection()
+    email = EmailMessage(subject, message, None, [user_email], connection=connection)
+    with timed("smtp"):
+        try:
+            # Opening explicitly keeps the connection alive after send_messages() returns.
+            connection.open()
+            return connection.send_messages([email])
+        except smtplib.SMTPServerDisconnected:
+            # The server closed our idle connection; reconnect once and retry.
+            connection.close()
+            connection.open()
+            return connection.send_messages([email])
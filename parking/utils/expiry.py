@@ -0,0 +1,109 @@
+"""
+Set-based expiry of reservations.
+
+Reservations are deactivated and their spots released with chunked UPDATEs,
+one transaction per chunk, instead of save() per row. Each chunk claims its
+rows with SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+several workers can run at once on disjoint rows; on SQLite the IMMEDIATE
+transaction mode serializes them instead. The UPDATE re-checks is_active, so a
+row is only ever counted by the run that actually deactivated it.
+
+UPDATEs skip signals, so afterwards the zone counters are rebuilt and the gate
+hot set is invalidated for everything touched. The availability index needs
+nothing: a deactivated reservation still holds its spot until it ends.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from parking.models import ParkingSpot, Reservation
+from parking.utils.gate import active_plates
+from parking.utils.occupancy import rebuild_zone_occupancy
+
+ExpiryResult = namedtuple("ExpiryResult", "reservations spots")
+
+
+def _expire_chunk(queryset, cutoff, chunk_size):
+    """Deactivates up to chunk_size rows; returns (reservations, spots released, zone ids) or None when done."""
+    with transaction.atomic():
+        claim = queryset.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            claim = claim.select_for_update(skip_locked=True, of=('self',))
+        rows = list(claim.values_list('id', 'spot_id')[:chunk_size])
+        if not rows:
+            return None
+
+        ids = [reservation_id for reservation_id, _ in rows]
+        expired = Reservation.objects.filter(id__in=ids, is_active=True).update(is_active=False)
+
+        # A spot stays reserved while any of its reservations hasn't ended, these included:
+        # an expired no-show may still be parked there, as nothing records arrivals.
+        spot_ids = {spot_id for _, spot_id in rows}
+        still_booked = Reservation.objects.filter(spot_id__in=spot_ids, end_time__gt=cutoff).values('spot_id')
+        releasable = ParkingSpot.objects.filter(id__in=spot_ids, is_reserved=True).exclude(id__in=still_booked)
+        zone_ids = set(releasable.values_list('zone_id', flat=True))
+        released = releasable.update(is_reserved=False)
+    return expired, released, zone_ids
+
+
+def expire(queryset, cutoff=None, chunk_size=5000):
+    """
+    Deactivates every active reservation in `queryset` and releases spots left
+    with no unfinished reservation, active or not. Returns
+    ExpiryResult(reservations, spots).
+    """
+    cutoff = cutoff or now()
+    queryset = queryset.filter(is_active=True)
+    reservations = spots = 0
+    zone_ids = set()
+    while True:
+        chunk = _expire_chunk(queryset, cutoff, chunk_size)
+        if chunk is None:
+            break
+        expired, released, zones = chunk
+        reservations += expired
+        spots += released
+        zone_ids |= zones
+
+    if reservations:
+        active_plates.invalidate()
+    if zone_ids:
+        rebuild_zone_occupancy(zone_ids)
+    return ExpiryResult(reservations, spots)
+
+
+def release_idle_spots(cutoff=None):
+    """
+    Releases reserved spots whose reservations have all ended, including ones
+    deactivated before they ran out. Returns the number of spots released.
+    """
+    cutoff = cutoff or now()
+    with transaction.atomic():
+        idle = ParkingSpot.objects.filter(
+            is_reserved=True,
+            reservation__end_time__lt=cutoff,
+        ).exclude(
+            id__in=Reservation.objects.filter(end_time__gt=cutoff).values('spot_id'),
+        )
+        releasable = ParkingSpot.objects.filter(id__in=idle.values('id'))
+        zone_ids = set(releasable.values_list('zone_id', flat=True))
+        released = releasable.update(is_reserved=False)
+    if zone_ids:
+        rebuild_zone_occupancy(zone_ids)
+    return released
+
+
+def expire_ended(cutoff=None, chunk_size=5000):
+    """Reservations whose end time has passed, then any spot they leave idle."""
+    cutoff = cutoff or now()
+    result = expire(Reservation.objects.filter(end_time__lt=cutoff), cutoff, chunk_size)
+    return result._replace(spots=result.spots + release_idle_spots(cutoff))
+
+
+def expire_started_before(threshold, cutoff=None, chunk_size=5000):
+    """
+    Reservations that started before `threshold` (no-shows). They stop opening
+    the gate, but keep their spot reserved until they end.
+    """
+    return expire(Reservation.objects.filter(start_time__lt=threshold), cutoff, chunk_size)
@@ -0,0 +1,197 @@
+"""
+Gate access lookup: which reservation, if any, lets this plate in right now.
+
+``find_gate_reservation`` first asks ``active_plates``, an in-process dict of
+the plates whose reservations run within ``HOT_WINDOW`` of when it was
+loaded, keyed on the normalized plate. Signals keep it current for writes made
+in this process; other processes bump a version counter in Django's cache,
+which makes the copy here stale (see ``parking.utils.versions``). A stale or
+outgrown hot set is answered from SQL (the ``reservation_gate_idx`` index),
+and reloaded on a background thread so the gate request doesn't wait for it.
+"""
+import logging
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.timezone import now
+
+from .versions import bump_version, current_version
+
+logger = logging.getLogger(__name__)
+
+STAMP_KEY = "gate:plates"
+
+# Reservations starting up to this long after a load are kept in the hot set;
+# past that the set is reloaded.
+HOT_WINDOW = timedelta(hours=6)
+
+GateEntry = namedtuple("GateEntry", "reservation_id start end zone spot")
+
+
+class ActivePlates:
+    def __init__(self):
+        self._plates = {}
+        self._reservation_plate = {}
+        self._stamp = None
+        self._loaded_at = None
+        self._reloading = None
+        self._lock = threading.RLock()
+
+    def _current_stamp(self):
+        return cache.get(STAMP_KEY)
+
+    def _bump_stamp(self):
+        return bump_version(STAMP_KEY)
+
+    def _covers(self, at):
+        return (
+            self._loaded_at is not None
+            and self._loaded_at <= at < self._loaded_at + HOT_WINDOW
+            and self._stamp == self._current_stamp()
+        )
+
+    def _holds(self, start, end):
+        return end > self._loaded_at and start < self._loaded_at + HOT_WINDOW
+
+    # --- Reads ---
+    def lookup(self, plate_normalized, at=None):
+        """
+        Returns the entries for the plate whose window contains `at`, or None
+        if the hot set can't answer (cold, stale, or `at` outside its window).
+        """
+        at = at or now()
+        with self._lock:
+            if not self._covers(at):
+                return None
+            return [e for e in self._plates.get(plate_normalized, ()) if e.start <= at < e.end]
+
+    # --- Builds ---
+    def warm(self):
+        from parking.models import Reservation
+
+        loaded_at = now()
+        stamp = current_version(STAMP_KEY)
+        rows = Reservation.objects.filter(
+            is_active=True,
+            end_time__gt=loaded_at,
+            start_time__lt=loaded_at + HOT_WINDOW,
+        ).exclude(plate_normalized='').values_list(
+            'id', 'plate_normalized', 'start_time', 'end_time', 'spot__zone__name', 'spot__spot_number',
+        )
+        plates, reservation_plate = {}, {}
+        for reservation_id, plate, start, end, zone, spot in rows.iterator():
+            plates.setdefault(plate, []).append(GateEntry(reservation_id, start, end, zone, spot))
+            reservation_plate[reservation_id] = plate
+
+        with self._lock:
+            self._plates, self._reservation_plate = plates, reservation_plate
+            self._stamp, self._loaded_at = stamp, loaded_at
+
+    def reload_soon(self):
+        """Reloads the hot set off the request path: on one background thread at a time."""
+        if not getattr(settings, 'GATE_RELOAD_IN_BACKGROUND', True):
+            self.warm()
+            return
+        with self._lock:
+            if self._reloading is not None and self._reloading.is_alive():
+                return
+            self._reloading = threading.Thread(target=self._reload, name="gate-hot-set", daemon=True)
+            self._reloading.start()
+
+    def _reload(self):
+        try:
+            self.warm()
+        except Exception:
+            logger.exception("Reloading the gate hot set failed; lookups use SQL until the next try.")
+        finally:
+            connection.close()
+
+    def invalidate(self):
+        """Marks the hot set stale everywhere, e.g. after bulk updates that skip signals."""
+        with self._lock:
+            self._bump_stamp()
+            self._loaded_at = None
+
+    # --- Incremental updates (called from signals) ---
+    def _remove(self, reservation_id):
+        plate = self._reservation_plate.pop(reservation_id, None)
+        if plate is None:
+            return
+        remaining = [e for e in self._plates.get(plate, ()) if e.reservation_id != reservation_id]
+        if remaining:
+            self._plates[plate] = remaining
+        else:
+            self._plates.pop(plate, None)
+
+    def _apply(self, change):
+        with self._lock:
+            stamp = self._bump_stamp()
+            if self._loaded_at is None or stamp != self._stamp + 1:
+                # Cold, or another process wrote since our version: don't let the gate trust this copy.
+                self._loaded_at = None
+                return
+            change()
+            self._stamp = stamp
+
+    def reservation_saved(self, reservation):
+        def change():
+            self._remove(reservation.pk)
+            if not (reservation.is_active and reservation.plate_normalized):
+                return
+            if not self._holds(reservation.start_time, reservation.end_time):
+                return
+            spot = reservation.spot
+            entry = GateEntry(reservation.pk, reservation.start_time, reservation.end_time, spot.zone.name, spot.spot_number)
+            self._plates.setdefault(reservation.plate_normalized, []).append(entry)
+            self._reservation_plate[reservation.pk] = reservation.plate_normalized
+
+        self._apply(change)
+
+    def reservation_deleted(self, reservation):
+        self._apply(lambda: self._remove(reservation.pk))
+
+
+active_plates = ActivePlates()
+
+
+def find_gate_reservations(plate_numbers, at=None):
+    """
+    Maps each normalized plate to the GateEntry letting it in at `at` (default
+    now), or None. Plates the hot set can't answer are looked up in one query.
+    """
+    from parking.models import Reservation, normalize_plate
+
+    at = at or now()
+    found, missing = {}, set()
+    for plate in {normalize_plate(p) for p in plate_numbers} - {''}:
+        entries = active_plates.lookup(plate, at)
+        if entries is None:
+            missing.add(plate)
+        else:
+            found[plate] = min(entries, key=lambda e: e.start) if entries else None
+
+    if missing:
+        rows = Reservation.objects.filter(
+            plate_normalized__in=missing,
+            is_active=True,
+            start_time__lte=at,
+            end_time__gt=at,
+        ).order_by('-start_time').values_list(
+            'plate_normalized', 'id', 'start_time', 'end_time', 'spot__zone__name', 'spot__spot_number',
+        )
+        found.update(dict.fromkeys(missing))
+        # Ordered latest first, so the earliest start per plate is written last.
+        found.update((plate, GateEntry(*rest)) for plate, *rest in rows)
+        active_plates.reload_soon()
+    return found
+
+
+def find_gate_reservation(plate_number, at=None):
+    """Returns a GateEntry for a reservation letting the plate in at `at` (default now), or None."""
+    from parking.models import normalize_plate
+
+    return find_gate_reservations([plate_number], at).get(normalize_plate(plate_number))
@@ -0,0 +1,178 @@
+"""
+Spatial index for "nearest zones / free spots to me".
+
+Zone centres and spot positions are bucketed into a grid of CELL_DEGREES
+cells (about 1.1 km north-south). A radius query looks up only the cells its
+bounding box covers, then computes haversine distances for those candidates
+in one NumPy call and sorts them. Spots without coordinates sit at their zone
+centre, as ``provision_spots`` places them without a layout.
+
+Each process keeps one ``GeoIndex`` built from the database. Writes that move,
+add or remove zones and spots replace a stamp in Django's cache (signals, and
+``provision_spots`` for bulk inserts), and the index rebuilds on the next query
+after its stamp changed. Availability is not part of the index; callers
+combine the candidates with ``availability_index``.
+"""
+import threading
+import uuid
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+STAMP_KEY = "geo:stamp"
+EARTH_RADIUS_M = 6_371_000
+METRES_PER_DEGREE = 111_320
+CELL_DEGREES = 0.01
+# Cell keys are lat_cell * CELL_STRIDE + lon_cell; lon cells span -18000..18000.
+CELL_STRIDE = 100_000
+
+
+def haversine_m(lat, lon, lats, lons):
+    """Great-circle distances in metres from one point to arrays of points."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cells(lats, lons):
+    return np.floor(lats / CELL_DEGREES).astype(np.int64) * CELL_STRIDE + np.floor(lons / CELL_DEGREES).astype(np.int64)
+
+
+class PointSet:
+    """Points bucketed by grid cell: rows sorted by cell key, plus where each cell's rows start."""
+
+    def __init__(self, lats, lons):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        keys = _cells(lats, lons)
+        self.order = np.argsort(keys, kind='stable')
+        self.lats, self.lons = lats[self.order], lons[self.order]
+        self.keys, self.starts = np.unique(keys[self.order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(self.order)).astype(np.int64)
+
+    def within(self, lat, lon, radius_m):
+        """
+        Rows within radius_m of (lat, lon), nearest first: (row numbers into the
+        arrays the set was built from, distances in metres).
+        """
+        lat_span = radius_m / METRES_PER_DEGREE
+        lon_span = radius_m / (METRES_PER_DEGREE * max(np.cos(np.radians(lat)), 1e-6))
+        lat_cells = np.arange(np.floor((lat - lat_span) / CELL_DEGREES), np.floor((lat + lat_span) / CELL_DEGREES) + 1)
+        lon_cells = np.arange(np.floor((lon - lon_span) / CELL_DEGREES), np.floor((lon + lon_span) / CELL_DEGREES) + 1)
+        wanted = (lat_cells[:, None].astype(np.int64) * CELL_STRIDE + lon_cells.astype(np.int64)).ravel()
+
+        found = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        found = found[self.keys[found] == wanted] if len(self.keys) else found[:0]
+        if not len(found):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        sorted_rows = np.concatenate([np.arange(self.starts[i], self.ends[i]) for i in found])
+
+        distances = haversine_m(lat, lon, self.lats[sorted_rows], self.lons[sorted_rows])
+        near = distances <= radius_m
+        sorted_rows, distances = sorted_rows[near], distances[near]
+        nearest = np.argsort(distances, kind='stable')
+        return self.order[sorted_rows[nearest]], distances[nearest]
+
+
+class GeoIndex:
+    """Zones and spots with coordinates, as NumPy arrays and grid buckets."""
+
+    def __init__(self, zones, spots, stamp=None):
+        """zones: (id, name, district, lat, lon) rows; spots: (id, zone id, number, accessible, lat, lon) rows."""
+        self.stamp = stamp
+        self.zones = [row for row in zones if row[3] is not None and row[4] is not None]
+        self.zone_points = PointSet([row[3] for row in self.zones], [row[4] for row in self.zones])
+
+        centres = {row[0]: (row[3], row[4]) for row in self.zones}
+        self.spots = []
+        for spot_id, zone_id, number, accessible, lat, lon in spots:
+            if lat is None or lon is None:
+                lat, lon = centres.get(zone_id, (None, None))
+            if lat is not None and lon is not None:
+                self.spots.append((spot_id, zone_id, number, accessible, lat, lon))
+        self.spot_ids = np.array([row[0] for row in self.spots], dtype=np.int64)
+        self.spot_zone_ids = np.array([row[1] for row in self.spots], dtype=np.int64)
+        self.spot_points = PointSet([row[4] for row in self.spots], [row[5] for row in self.spots])
+
+    def zones_within(self, lat, lon, radius_m):
+        """(rows of self.zones, distances), nearest first."""
+        return self.zone_points.within(lat, lon, radius_m)
+
+    def spots_within(self, lat, lon, radius_m):
+        """(rows of self.spots, distances), nearest first."""
+        return self.spot_points.within(lat, lon, radius_m)
+
+    def nearest_zones(self, lat, lon, radius_m, k, free_spot_ids):
+        """The k nearest zones within radius_m where free_spot_ids(zone_id) is non-empty."""
+        results = []
+        rows, distances = self.zones_within(lat, lon, radius_m)
+        for row, distance in zip(rows.tolist(), distances.tolist()):
+            zone_id, name, district, zone_lat, zone_lon = self.zones[row]
+            free = len(free_spot_ids(zone_id))
+            if free:
+                results.append({
+                    "id": zone_id, "name": name, "district": district,
+                    "latitude": zone_lat, "longitude": zone_lon,
+                    "distance_m": round(distance, 1), "free_spots": free,
+                })
+                if len(results) == k:
+                    break
+        return results
+
+    def nearest_spots(self, lat, lon, radius_m, k, free_spot_ids):
+        """The k nearest spots within radius_m that are in free_spot_ids(their zone id)."""
+        rows, distances = self.spots_within(lat, lon, radius_m)
+        spot_ids, zone_ids = self.spot_ids[rows], self.spot_zone_ids[rows]
+        # Check zones in the order of their nearest candidate, until the k nearest free spots are settled.
+        zones, first = np.unique(zone_ids, return_index=True)
+        order = np.argsort(first)
+        zones, first = zones[order], np.append(first[order], len(rows))
+        free = np.zeros(len(rows), dtype=bool)
+        for n, zone_id in enumerate(zones.tolist()):
+            in_zone = zone_ids == zone_id
+            free[in_zone] = np.isin(spot_ids[in_zone], free_spot_ids(zone_id))
+            if np.count_nonzero(free[:first[n + 1]]) >= k:
+                break
+
+        results = []
+        for position in np.flatnonzero(free)[:k].tolist():
+            spot_id, zone_id, number, accessible, spot_lat, spot_lon = self.spots[rows[position]]
+            results.append({
+                "id": spot_id, "zone": zone_id, "spot_number": number, "is_accessible": accessible,
+                "latitude": spot_lat, "longitude": spot_lon,
+                "distance_m": round(float(distances[position]), 1),
+            })
+        return results
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_geo_index():
+    """Returns this process's index, rebuilding it if zones or spots moved since it was built."""
+    global _index
+    from parking.models import ParkingSpot, Zone
+
+    stamp = cache.get(STAMP_KEY)
+    if stamp is None:
+        cache.add(STAMP_KEY, uuid.uuid4().hex, None)
+        stamp = cache.get(STAMP_KEY)
+    index = _index
+    if index is not None and index.stamp == stamp:
+        return index
+    with _lock:
+        if _index is None or _index.stamp != stamp:
+            _index = GeoIndex(
+                Zone.objects.values_list('id', 'name', 'district', 'latitude', 'longitude'),
+                ParkingSpot.objects.values_list('id', 'zone_id', 'spot_number', 'is_accessible', 'latitude', 'longitude'),
+                stamp,
+            )
+        return _index
+
+
+def invalidate_geo():
+    """Makes every process rebuild its index once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(STAMP_KEY, uuid.uuid4().hex, None))
@@ -0,0 +1,161 @@
+"""
+Per-request timings and in-process latency histograms.
+
+``RequestTimingMiddleware`` (``parking.middleware``) starts a ``RequestTimings``
+for every request and keeps it in a context variable, so code anywhere below
+the view can add to it with ``timed("stripe")`` without being passed the
+request. Outside a request (Celery tasks, management commands) ``timed`` does
+nothing. Threads don't inherit context variables: code that hands work to a
+thread pool submits it with ``contextvars.copy_context().run`` so the calls it
+makes count towards the request. The middleware folds each finished request into the histograms here,
+which ``render_prometheus`` writes out in the Prometheus text format.
+
+Histograms are per process: with several workers each one reports its own
+counts, and a scrape sees whichever worker answered it.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+clock = time.perf_counter
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Seconds and call counts per stage ("db", "view", "render", "stripe", ...) of one request."""
+
+    __slots__ = ("started", "stages", "_lock")
+
+    def __init__(self):
+        self.started = clock()
+        self.stages = {}
+        # Worker threads of the request (see above) add to the same totals.
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, calls=1):
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                self.stages[stage] = [calls, seconds]
+            else:
+                totals[0] += calls
+                totals[1] += seconds
+
+    def seconds(self, stage):
+        return self.stages.get(stage, (0, 0.0))[1]
+
+    def calls(self, stage):
+        return self.stages.get(stage, (0, 0.0))[0]
+
+
+def start_request():
+    """Starts timing a request; returns (timings, token for end_request)."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_timings():
+    """The timings of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+@contextmanager
+def timed(stage):
+    """Adds the time spent in the block to `stage` of the current request, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = clock()
+    try:
+        yield
+    finally:
+        timings.add(stage, clock() - started)
+
+
+# --- Histograms ---
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    """A labelled histogram with fixed buckets, cheap enough to observe on every request."""
+
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """labels: a tuple of values in labelnames order."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float("inf"),), counts):
+                cumulative += hits
+                le = ",".join(pairs + [f'le="{_number(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+            label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return "\n".join(lines)
+
+
+request_seconds = Histogram(
+    "easypark_request_duration_seconds", "Time from the first middleware to the rendered response.",
+    ("view", "method", "status"), LATENCY_BUCKETS,
+)
+stage_seconds = Histogram(
+    "easypark_request_stage_seconds", "Time per request spent in one stage: db, view, render, or an external service.",
+    ("view", "stage"), LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "easypark_request_db_queries", "SQL queries per request.",
+    ("view",), QUERY_BUCKETS,
+)
+HISTOGRAMS = (request_seconds, stage_seconds, request_queries)
+
+
+def render_prometheus():
+    """Every histogram in the Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+def clear_histograms():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
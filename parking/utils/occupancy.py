@@ -0,0 +1,99 @@
+"""
+Helpers for the per-zone occupancy counters (``ZoneOccupancy``).
+
+Single-row changes come in through signals and adjust the counters with F()
+expressions. Bulk writes that bypass signals (``QuerySet.update``,
+``bulk_create``) must call ``rebuild_zone_occupancy`` for the zones they touch;
+that also drops the cached dashboard summary. Every counter write marks its
+zones changed for the conditional GETs on zones and spots.
+"""
+from django.db.models import Count, F, Q
+from django.utils.timezone import now
+
+from parking.models import Zone, ZoneOccupancy, Reservation
+from parking.utils.catalog import touch_zones
+from parking.utils.dashboard import invalidate_dashboard
+
+
+def rebuild_zone_occupancy(zone_ids=None):
+    """Recomputes every counter from scratch for the given zones (all zones if None)."""
+    current = now()
+    zones = Zone.objects.all()
+    if zone_ids is not None:
+        zones = zones.filter(id__in=zone_ids)
+
+    counts = zones.annotate(
+        total=Count('spots', distinct=True),
+        available=Count('spots', filter=Q(spots__is_reserved=False), distinct=True),
+    ).values_list('id', 'total', 'available')
+
+    reserved_now = dict(
+        Reservation.objects.filter(
+            spot__zone__in=zones,
+            is_active=True,
+            start_time__lte=current,
+            end_time__gt=current,
+        ).values_list('spot__zone_id').annotate(n=Count('spot_id', distinct=True))
+    )
+
+    rows = [
+        ZoneOccupancy(
+            zone_id=zone_id,
+            total_spots=total,
+            available_spots=available,
+            reserved_now=reserved_now.get(zone_id, 0),
+            updated_at=current,
+        )
+        for zone_id, total, available in counts
+    ]
+    ZoneOccupancy.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['zone'],
+        update_fields=['total_spots', 'available_spots', 'reserved_now', 'updated_at'],
+    )
+    invalidate_dashboard()
+    touch_zones(zone_ids)
+    return len(rows)
+
+
+def adjust_zone_occupancy(zone_id, total=0, available=0, rebuild_missing=True):
+    """Applies a delta to a zone's counters, rebuilding the row if it is missing."""
+    updated = ZoneOccupancy.objects.filter(zone_id=zone_id).update(
+        total_spots=F('total_spots') + total,
+        available_spots=F('available_spots') + available,
+        updated_at=now(),
+    )
+    if not updated and rebuild_missing:
+        rebuild_zone_occupancy([zone_id])
+    else:
+        touch_zones([zone_id])
+
+
+def refresh_reserved_now(zone_ids=None):
+    """Recounts only ``reserved_now``, which drifts as reservations start and end."""
+    current = now()
+    occupancies = ZoneOccupancy.objects.all()
+    if zone_ids is not None:
+        occupancies = occupancies.filter(zone_id__in=zone_ids)
+
+    reserved_now = dict(
+        Reservation.objects.filter(
+            spot__zone_id__in=occupancies.values('zone_id'),
+            is_active=True,
+            start_time__lte=current,
+            end_time__gt=current,
+        ).values_list('spot__zone_id').annotate(n=Count('spot_id', distinct=True))
+    )
+
+    changed = []
+    for occupancy in occupancies:
+        value = reserved_now.get(occupancy.zone_id, 0)
+        if occupancy.reserved_now != value:
+            occupancy.reserved_now = value
+            occupancy.updated_at = current
+            changed.append(occupancy)
+    ZoneOccupancy.objects.bulk_update(changed, ['reserved_now', 'updated_at'])
+    if changed:
+        touch_zones(occupancy.zone_id for occupancy in changed)
+    return len(changed)
@@ -0,0 +1,393 @@
+"""
+License plate OCR engine.
+
+OpenCV preprocessing and tesseract run in a pool of warm worker processes
+instead of inside the web worker. At most ``OCR_WORKERS + OCR_QUEUE_SIZE``
+images are in flight; beyond that ``submit`` raises ``OCRBusy`` straight away
+so the view can answer "busy" instead of queueing requests without limit.
+
+Gate frames are read with ``read_frame``, which also returns the plate regions
+it found, so the frame cache can tell a repeated frame from another car's
+without decoding anything in the web worker.
+"""
+import math
+import multiprocessing
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+import pytesseract
+
+from .instrumentation import timed
+
+PLATE_PATTERN = re.compile(r'\d{2}[A-Z]{3}\d{3}')
+TESSERACT_CONFIG = r'--oem 3 --psm 7 -l eng -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Plate localization. Turkish plates are 520x110 mm (about 4.7:1); allow for
+# perspective and for the frame around the plate.
+PLATE_ASPECT = 4.7
+MIN_ASPECT, MAX_ASPECT = 2.0, 7.0
+MIN_AREA_FRACTION, MAX_AREA_FRACTION = 0.002, 0.95
+MIN_PLATE_HEIGHT_PX = 12
+MAX_CANDIDATES = 5
+# Candidates are scaled to this height before OCR, which suits tesseract's glyph size.
+PLATE_HEIGHT = 64
+# Plate regions are compared at this fraction of the frame's size. A region pixel counts as
+# changed when it moved by more than CHANGED_LEVEL grey levels (after a 3x3 blur).
+REGION_SCALE = 2
+CHANGED_LEVEL = 40
+
+# plate is "" if none matched; regions are [(box, blurred crop)] to recognize the frame again by;
+# repeats is the index of the earlier frame it was found to repeat, in which case the others are None.
+FrameRead = namedtuple("FrameRead", "plate regions repeats")
+
+
+class OCRBusy(Exception):
+    """Raised when every OCR worker is busy and the wait queue is full."""
+
+
+class OCRTimeout(Exception):
+    """Raised when an image wasn't recognized within the timeout."""
+
+
+# --- Runs inside the worker processes ---
+def _init_worker(tesseract_cmd):
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    # Each process already is one unit of parallelism; don't let OpenCV fan out further.
+    cv2.setNumThreads(1)
+
+
+def _ping():
+    return True
+
+
+def decode_image(image_bytes):
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Invalid image.")
+    return image
+
+
+def ocr_text(image):
+    try:
+        return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+    except (pytesseract.TesseractError, pytesseract.TesseractNotFoundError) as e:
+        # pytesseract's exceptions can't be unpickled in the parent, which would break the pool.
+        raise RuntimeError(f"Tesseract failed: {e}") from None
+
+
+def match_plate(text):
+    cleaned = ''.join(filter(str.isalnum, text)).upper()
+    match = PLATE_PATTERN.search(cleaned)
+    return match.group(0) if match else ""
+
+
+def localize_plates(gray, max_candidates=MAX_CANDIDATES):
+    """
+    Finds rectangles shaped like a plate in a grayscale frame.
+
+    Edges -> contours -> bounding boxes, kept if their aspect ratio and size
+    fit a plate. Boxes are ranked by area, weighted by how close their aspect
+    ratio is to a real plate's, with a bonus for four-cornered contours.
+    Returns up to max_candidates (x, y, w, h) boxes, best first.
+    """
+    frame_height, frame_width = gray.shape[:2]
+    frame_area = frame_height * frame_width
+    smoothed = cv2.bilateralFilter(gray, 11, 17, 17)
+    edges = cv2.Canny(smoothed, 30, 200)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    scored = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < MIN_PLATE_HEIGHT_PX or not (MIN_ASPECT <= w / h <= MAX_ASPECT):
+            continue
+        if not (MIN_AREA_FRACTION * frame_area <= w * h <= MAX_AREA_FRACTION * frame_area):
+            continue
+        if w == frame_width and h < frame_height:
+            # Bands spanning the whole width are bumpers and shadows, not plates.
+            continue
+        corners = len(cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True))
+        aspect = w / h
+        closeness = min(aspect, PLATE_ASPECT) / max(aspect, PLATE_ASPECT)
+        score = w * h * closeness ** 2 * (1.5 if corners == 4 else 1.0)
+        scored.append((score, (x, y, w, h)))
+    scored.sort(reverse=True)
+
+    boxes = []
+    for _, box in scored:
+        if all(_overlap(box, kept) < 0.7 for kept in boxes):
+            boxes.append(box)
+            if len(boxes) == max_candidates:
+                break
+    return boxes
+
+
+def _overlap(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    intersection = w * h
+    return intersection / (aw * ah + bw * bh - intersection)
+
+
+def normalize_crop(gray, box):
+    """Crops a candidate, scales it to PLATE_HEIGHT keeping its aspect ratio, and binarizes it."""
+    x, y, w, h = box
+    crop = gray[y:y + h, x:x + w]
+    width = max(1, round(w * PLATE_HEIGHT / h))
+    crop = cv2.resize(crop, (width, PLATE_HEIGHT), interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Tesseract reads better with a quiet margin around the text.
+    return cv2.copyMakeBorder(binary, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+
+
+def whole_frame(gray):
+    """The old whole-frame preprocessing, but scaled to a fixed width without distorting the aspect ratio."""
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    height = max(1, round(gray.shape[0] * 800 / gray.shape[1]))
+    return cv2.resize(closed, (800, height), interpolation=cv2.INTER_AREA)
+
+
+def plate_regions(small, boxes):
+    """[(box, blurred crop)] of a frame scaled down by REGION_SCALE, for boxes found at full scale."""
+    regions = []
+    for x, y, w, h in boxes:
+        box = (x // REGION_SCALE, y // REGION_SCALE, max(1, w // REGION_SCALE), max(1, h // REGION_SCALE))
+        regions.append((box, _blurred_crop(small, box)))
+    return regions
+
+
+def regions_unchanged(small, regions, max_changed):
+    """Whether every region still looks the same in small: at most max_changed of its pixels differ."""
+    for box, crop in regions:
+        current = _blurred_crop(small, box)
+        if current.shape != crop.shape:
+            return False
+        if np.count_nonzero(cv2.absdiff(current, crop) > CHANGED_LEVEL) > max_changed * crop.size:
+            return False
+    return True
+
+
+def _blurred_crop(gray, box):
+    x, y, w, h = box
+    return cv2.GaussianBlur(gray[y:y + h, x:x + w], (3, 3), 0)
+
+
+def read_frame(image_bytes, seen=(), max_changed=0.0):
+    """
+    Reads one gate frame, unless it repeats one read before.
+
+    `seen` holds the plate regions of earlier frames with a similar hash. If
+    one's regions are unchanged here, returns FrameRead(None, None, its index)
+    without running OCR; otherwise FrameRead(plate, this frame's regions, None).
+    """
+    gray = cv2.cvtColor(decode_image(image_bytes), cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    small = cv2.resize(
+        gray, (max(1, width // REGION_SCALE), max(1, height // REGION_SCALE)), interpolation=cv2.INTER_AREA,
+    )
+    for index, regions in enumerate(seen):
+        if regions_unchanged(small, regions, max_changed):
+            return FrameRead(None, None, index)
+    boxes = localize_plates(gray)
+    return FrameRead(read_boxes(gray, boxes), plate_regions(small, boxes), None)
+
+
+def recognize_plate(image_bytes, timings=None):
+    """
+    Decodes and OCRs one image. Returns the plate number, or "" if none matched.
+
+    Pass a dict as `timings` to collect per-stage seconds.
+    """
+    timings = {} if timings is None else timings
+    clock = time.perf_counter
+
+    started = clock()
+    image = decode_image(image_bytes)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    timings['decode'] = clock() - started
+
+    started = clock()
+    boxes = localize_plates(gray)
+    timings['localize'] = clock() - started
+    return read_boxes(gray, boxes, timings)
+
+
+def read_boxes(gray, boxes, timings=None):
+    """
+    OCRs the candidate boxes of a grayscale frame. Returns the plate number, or "" if none matched.
+
+    Candidates are OCRed one at a time, best first, stopping at the first that
+    matches the plate pattern; the whole frame is only read if none do.
+    """
+    timings = {} if timings is None else timings
+    clock = time.perf_counter
+
+    timings['ocr'] = 0.0
+    timings['candidates'] = 0
+    for box in boxes:
+        started = clock()
+        plate = match_plate(ocr_text(normalize_crop(gray, box)))
+        timings['ocr'] += clock() - started
+        timings['candidates'] += 1
+        if plate:
+            return plate
+
+    started = clock()
+    plate = match_plate(ocr_text(whole_frame(gray)))
+    timings['fallback'] = clock() - started
+    return plate
+
+
+# --- Runs in the web process ---
+class OCREngine:
+    def __init__(self, workers, queue_size, timeout, tesseract_cmd=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.tesseract_cmd = tesseract_cmd
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a process that holds DB connections and threads isn't safe.
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.tesseract_cmd,),
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Starts every worker process now rather than on the first request."""
+        executor = self._get_executor()
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, fn, *args):
+        """Queues fn(*args) on the pool; raises OCRBusy if no slot is free."""
+        if not self._slots.acquire(blocking=False):
+            raise OCRBusy("All OCR workers are busy.")
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer); start a fresh pool.
+            self._reset(executor)
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def recognize(self, image_bytes, seen=(), max_changed=0.0, timeout=None):
+        """
+        Reads one gate frame in the pool and returns its FrameRead (see read_frame).
+        Raises OCRBusy, OCRTimeout, or ValueError for undecodable images.
+        """
+        future = self.submit(read_frame, image_bytes, seen, max_changed)
+        try:
+            with timed("ocr"):
+                return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            raise OCRTimeout("Plate recognition timed out.")
+
+    def recognize_many(self, images, seen=None, max_changed=0.0, timeout=None):
+        """
+        Reads several gate frames in parallel, as many at a time as the pool has room for.
+
+        `seen` optionally holds each image's `seen` argument for read_frame.
+        Returns one result per image, in order: its FrameRead, or the exception
+        it failed with (OCRBusy, OCRTimeout, ValueError, RuntimeError).
+        The whole batch gets `timeout` seconds, by default OCR_TIMEOUT per round of workers.
+        """
+        seen = seen or [()] * len(images)
+        timeout = timeout or self.timeout * max(1, math.ceil(len(images) / self.workers))
+        with timed("ocr"):
+            return self._recognize_many(images, seen, max_changed, timeout)
+
+    def _recognize_many(self, images, seen, max_changed, timeout):
+        deadline = time.monotonic() + timeout
+        results = [None] * len(images)
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                index = pending.pop(future)
+                results[index] = future.exception() or future.result()
+
+        for index, image in enumerate(images):
+            while True:
+                try:
+                    pending[self.submit(read_frame, image, seen[index], max_changed)] = index
+                    break
+                except OCRBusy as e:
+                    if not pending:
+                        # Other requests hold every slot.
+                        results[index] = e
+                        break
+                    # Wait for one of our own images to free a slot.
+                    done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                    if not done:
+                        results[index] = OCRTimeout("Plate recognition timed out.")
+                        break
+                    collect(done)
+
+        done, not_done = wait(pending, timeout=max(0, deadline - time.monotonic()))
+        collect(done)
+        for future in not_done:
+            future.cancel()
+            results[pending.pop(future)] = OCRTimeout("Plate recognition timed out.")
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    """Returns the process-wide engine configured from settings."""
+    global _engine
+    from django.conf import settings
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = OCREngine(
+                workers=settings.OCR_WORKERS,
+                queue_size=settings.OCR_QUEUE_SIZE,
+                timeout=settings.OCR_TIMEOUT,
+                tesseract_cmd=settings.TESSERACT_CMD,
+            )
+        return _engine
@@ -0,0 +1,21 @@
+from io import BytesIO
+from zipfile import BadZipFile, ZipFile
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class ZipParser(BaseParser):
+    """Parses a raw application/zip request body into a ZipFile."""
+    media_type = 'application/zip'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = settings.PLATE_BATCH_MAX_IMAGES * settings.PLATE_BATCH_MAX_IMAGE_BYTES
+        body = stream.read(limit + 1) if stream else b''
+        if len(body) > limit:
+            raise ParseError('Archive too large.')
+        try:
+            return ZipFile(BytesIO(body))
+        except BadZipFile:
+            raise ParseError('Body is not a zip file.')
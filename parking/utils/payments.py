@@ -0,0 +1,83 @@
+"""
+Stripe calls over a pooled async HTTP client.
+
+Each process has one ``StripeGateway``: a ``StripeClient`` on aiohttp with a
+keep-alive connection pool, running on an event loop thread of its own. Its
+methods are coroutines, so under ASGI a worker keeps many checkouts in flight
+while Stripe answers; under WSGI each request still holds its worker thread
+for the round trip. The pool lives on the gateway's loop rather than the
+caller's because WSGI runs every async view on a fresh loop.
+
+``STRIPE_API_BASE`` points the client at another server (``bench_checkout``
+uses a local fake Stripe).
+"""
+import asyncio
+import atexit
+import ssl
+import threading
+
+import stripe
+from django.conf import settings
+
+from .instrumentation import timed
+
+
+class StripeGateway:
+    def __init__(self, api_key, api_base=None, max_connections=100, timeout=30):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="stripe-gateway", daemon=True).start()
+        # aiohttp binds its connection pool to the loop it is created on.
+        self.client = asyncio.run_coroutine_threadsafe(
+            self._connect(api_key, api_base, max_connections, timeout), self.loop,
+        ).result()
+        atexit.register(self.close)
+
+    async def _connect(self, api_key, api_base, max_connections, timeout):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=max_connections,
+            ssl=ssl.create_default_context(cafile=stripe.ca_bundle_path),
+        )
+        self.http_client = stripe.AIOHTTPClient(timeout=timeout, connector=connector)
+        return stripe.StripeClient(
+            api_key or "",
+            base_addresses={"api": api_base} if api_base else None,
+            http_client=self.http_client,
+        )
+
+    def close(self):
+        """Closes the pooled connections and stops the loop."""
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.http_client.close_async(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def call(self, method, *args, **kwargs):
+        """Runs a client coroutine method on the gateway loop and awaits it from the caller's loop."""
+        future = asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self.loop)
+        with timed("stripe"):
+            return await asyncio.wrap_future(future)
+
+    async def create_checkout_session(self, params):
+        return await self.call(self.client.v1.checkout.sessions.create_async, params)
+
+    async def create_refund(self, params, idempotency_key=None):
+        options = {"idempotency_key": idempotency_key} if idempotency_key else None
+        return await self.call(self.client.v1.refunds.create_async, params, options)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_stripe_gateway():
+    """Returns the process-wide gateway for the configured key and API base."""
+    key = (settings.STRIPE_SECRET_KEY, getattr(settings, 'STRIPE_API_BASE', None))
+    with _gateways_lock:
+        if key not in _gateways:
+            _gateways[key] = StripeGateway(
+                *key,
+                max_connections=getattr(settings, 'STRIPE_MAX_CONNECTIONS', 100),
+                timeout=getattr(settings, 'STRIPE_TIMEOUT', 30),
+            )
+        return _gateways[key]
@@ -1,24 +1,109 @@
+"""
+On-demand PDF receipts.
+
+Receipts are rendered the first time someone downloads them and cached on
+disk under a content-addressed name (the SHA-256 of the rendered HTML), so a
+changed reservation gets a fresh file and an unchanged one is never rendered
+twice. The cache is trimmed back under ``RECEIPT_CACHE_MAX_BYTES`` by evicting
+the least recently served files.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
-import os
 
-def generate_pdf_receipt(reservation, user, price):
-    template = 'receipt.html'
-    context = {
+
+def receipt_cache_dir():
+    path = Path(getattr(settings, 'RECEIPT_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'receipts'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def render_receipt_html(reservation):
+    return render_to_string('receipt.html', {
         "reservation": reservation,
-        "user": user,
-        "price": price,
-    }
-    html = render_to_string(template, context)
+        "user": reservation.user,
+        "price": reservation.price,
+    })
+
+
+def receipt_etag(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def get_receipt_pdf(reservation, html=None):
+    """
+    Returns (path, etag) of the reservation's receipt, rendering it if it isn't
+    cached. Pass `html` if it's already rendered.
+    """
+    html = html or render_receipt_html(reservation)
+    etag = receipt_etag(html)
+    path = receipt_cache_dir() / f"receipt_{etag}.pdf"
+
+    try:
+        # Bump mtime so eviction treats the file as recently used.
+        os.utime(path)
+        return path, etag
+    except FileNotFoundError:
+        pass
+
+    # Render to a temp file and rename, so concurrent downloads never see a partial PDF.
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            result = pisa.CreatePDF(html, dest=f)
+        if result.err:
+            raise RuntimeError(f"Receipt rendering failed for reservation {reservation.pk}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    evict_receipts(keep=path)
+    return path, etag
+
+
+def open_receipt_pdf(reservation, html=None, attempts=3):
+    """
+    Returns (file, etag): get_receipt_pdf's receipt, opened for reading. Another
+    process may evict the file before we open it; then it is rendered again.
+    """
+    html = html or render_receipt_html(reservation)
+    for attempt in range(attempts):
+        path, etag = get_receipt_pdf(reservation, html)
+        try:
+            return open(path, 'rb'), etag
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
 
-    receipt_dir = 'media/receipts/'
-    os.makedirs(receipt_dir, exist_ok=True)
 
-    # ✅ Use stripe_session_id instead of reservation.id
-    filename = f"receipt_{reservation.stripe_session_id}.pdf"
-    file_path = os.path.join(receipt_dir, filename)
+def evict_receipts(max_bytes=None, keep=None):
+    """Deletes the least recently used receipts until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'RECEIPT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
 
-    with open(file_path, "wb") as f:
-        pisa.CreatePDF(html, dest=f)
+    files = []
+    for entry in os.scandir(receipt_cache_dir()):
+        if entry.is_file() and entry.name.endswith('.pdf'):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
 
-    return file_path
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.samefile(path, keep):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
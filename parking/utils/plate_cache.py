@@ -0,0 +1,220 @@
+"""
+Short-lived cache for gate camera frames.
+
+A car waiting at the barrier produces many near-identical frames. Each frame
+is reduced to a 64-bit difference hash (dHash); a frame within a few bits of a
+recently read one reuses its OCR text. A whole-frame hash barely moves when
+only the plate differs, so a candidate only counts if the plate-like regions
+of the earlier frame are also unchanged, pixel for pixel within
+``PLATE_CACHE_MAX_CHANGED``; another car at the same camera is read afresh.
+The web worker only computes the hash: the OCR pool finds the regions, compares
+them with the candidates' and runs OCR only if none match (see
+``ocr.read_frame``). The gate decision is never reused from a frame: it always comes from the
+plate, through a second cache keyed on the plate text. Both caches are
+per-process, bounded in size and expire after ``PLATE_CACHE_TTL`` seconds, so
+a reservation made while the car waits is seen within that time.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+# At most this many earlier frames are sent to the OCR pool to compare a new one with.
+MAX_SIMILAR = 3
+
+
+def _dhash(gray):
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash(image_bytes):
+    """
+    64-bit difference hash of an encoded image. Raises ValueError if it can't be decoded.
+
+    JPEGs are decoded at 1/8 scale, which is much cheaper than a full decode
+    and loses nothing a 9x8 thumbnail would keep.
+    """
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if image is None:
+        raise ValueError("Invalid image.")
+    return _dhash(image)
+
+
+class TTLCache:
+    """Thread-safe LRU of at most max_size entries, each living for ttl seconds."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        """Live (key, value) pairs, most recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (expires, v) in reversed(self._entries.items()) if expires >= now]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FrameCache(TTLCache):
+    """TTLCache keyed on dHash; a lookup matches any entry within max_distance bits."""
+
+    def __init__(self, max_size, ttl, max_distance):
+        super().__init__(max_size, ttl)
+        self.max_distance = max_distance
+
+    def similar(self, frame_hash):
+        """Live values within max_distance bits of frame_hash, an exact match first, then most recent first."""
+        exact = self.get(frame_hash)
+        # Caches hold a few hundred entries at most, so a linear scan is cheaper than an index.
+        nearby = [
+            value for key, value in self.items()
+            if key != frame_hash and (key ^ frame_hash).bit_count() <= self.max_distance
+        ]
+        return ([exact] if exact is not None else []) + nearby
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = self.misses = 0
+        self.saved_ms = 0.0
+
+    def hit(self, saved_ms):
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'saved_ms': round(self.saved_ms, 1),
+        }
+
+
+class GateCache:
+    """
+    Frame and plate caches for the plate recognition views.
+
+    Frames map to (plate, plate regions, cost_ms): the OCR text ("" if none
+    matched), the regions a later frame must match to reuse it, and how long
+    reading it took; a hit saves the difference. Plates map to (data, status, cost_ms):
+    the gate decision for that plate.
+    """
+
+    def __init__(self, max_size=256, ttl=5.0, max_distance=4, max_changed=0.005):
+        self.frames = FrameCache(max_size, ttl, max_distance)
+        self.plates = TTLCache(max_size, ttl)
+        self.max_changed = max_changed
+        self.frame_stats = CacheStats()
+        self.plate_stats = CacheStats()
+
+    def similar_frames(self, frame_hash):
+        """Up to MAX_SIMILAR earlier frames that a frame with this hash may repeat, as (plate, regions, cost_ms)."""
+        return self.frames.similar(frame_hash)[:MAX_SIMILAR]
+
+    def record_frame(self, frame_hash, similar, read, cost_ms):
+        """
+        Records what the OCR pool made of a frame and returns its plate.
+
+        `similar` is what similar_frames returned for it and `read` the FrameRead
+        from the pool; cost_ms is how long the pool took.
+        """
+        if read.repeats is not None:
+            plate, _, first_cost_ms = similar[read.repeats]
+            self.frame_stats.hit(max(0.0, first_cost_ms - cost_ms))
+            return plate
+        self.frame_stats.miss()
+        if read.plate and not read.regions:
+            # Nothing to tell this car's plate from the next one's by; only remember "no plate here".
+            return read.plate
+        self.frames.set(frame_hash, (read.plate, read.regions, cost_ms))
+        return read.plate
+
+    def get_plate(self, plate):
+        value = self.plates.get(plate)
+        if value is None:
+            self.plate_stats.miss()
+            return None
+        self.plate_stats.hit(value[2])
+        return value[0], value[1]
+
+    def set_plate(self, plate, data, status, cost_ms):
+        self.plates.set(plate, (data, status, cost_ms))
+
+    def clear(self):
+        self.frames.clear()
+        self.plates.clear()
+        self.frame_stats.reset()
+        self.plate_stats.reset()
+
+    def metrics(self):
+        return {
+            'frames': {**self.frame_stats.as_dict(), 'size': len(self.frames)},
+            'plates': {**self.plate_stats.as_dict(), 'size': len(self.plates)},
+            'ttl': self.frames.ttl,
+            'max_size': self.frames.max_size,
+            'max_distance': self.frames.max_distance,
+            'max_changed': self.max_changed,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_gate_cache():
+    """Returns the process-wide cache configured from settings."""
+    global _cache
+    from django.conf import settings
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = GateCache(
+                max_size=getattr(settings, 'PLATE_CACHE_SIZE', 256),
+                ttl=getattr(settings, 'PLATE_CACHE_TTL', 5.0),
+                max_distance=getattr(settings, 'PLATE_CACHE_MAX_DISTANCE', 4),
+                max_changed=getattr(settings, 'PLATE_CACHE_MAX_CHANGED', 0.005),
+            )
+        return _cache
@@ -0,0 +1,93 @@
+"""
+Pricing engine.
+
+The ``Tariff`` table is compiled into one ``PriceTable`` per process: for
+every zone with tiers of its own, and for the default tiers, a sorted array of
+tier limits (hours) and a matching array of prices in kuruş. Pricing a stay is
+a ``searchsorted`` for the first tier whose limit is at least its length, and
+``PriceTable.quote`` does that for a whole batch of stays at once.
+
+Tariff writes bump a version stamp in Django's cache (see signals); each
+process recompiles its table when the stamp it was built for has changed.
+"""
+import threading
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+
+VERSION_KEY = "pricing:version"
+UNPRICED = -1
+
+
+class PriceTable:
+    def __init__(self, tiers, version=None):
+        """tiers: (zone_id or None, max_hours or None, price) rows."""
+        self.version = version
+        grouped = {}
+        for zone_id, max_hours, price in tiers:
+            limit = np.inf if max_hours is None else float(max_hours)
+            grouped.setdefault(zone_id, []).append((limit, int(round(Decimal(price) * 100))))
+        self.tables = {}
+        for zone_id, rows in grouped.items():
+            rows.sort()
+            self.tables[zone_id] = (
+                np.array([limit for limit, _ in rows]),
+                np.array([cents for _, cents in rows], dtype=np.int64),
+            )
+
+    def quote(self, zone_ids, hours):
+        """
+        Prices in kuruş for each (zone, length in hours) pair, as an int64 array.
+        UNPRICED marks stays no tier covers (or of no positive length).
+        """
+        zone_ids = np.asarray(zone_ids)
+        hours = np.asarray(hours, dtype=float)
+        cents = np.full(len(hours), UNPRICED, dtype=np.int64)
+        if not len(hours):
+            return cents
+
+        zones, inverse = np.unique(zone_ids, return_inverse=True)
+        for k, zone_id in enumerate(zones.tolist()):
+            table = self.tables.get(zone_id) or self.tables.get(None)
+            if table is None:
+                continue
+            limits, prices = table
+            selected = np.flatnonzero((inverse == k) & (hours > 0))
+            tier = np.searchsorted(limits, hours[selected], side='left')
+            covered = tier < len(limits)
+            cents[selected[covered]] = prices[tier[covered]]
+        return cents
+
+    def price(self, zone_id, hours):
+        """The price of one stay as a Decimal, or None if no tier covers it."""
+        cents = int(self.quote([zone_id], [hours])[0])
+        return None if cents == UNPRICED else Decimal(cents) / 100
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def get_price_table():
+    """Returns this process's compiled table, rebuilding it if the tariffs changed."""
+    global _table
+    from parking.models import Tariff
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    table = _table
+    if table is not None and table.version == version:
+        return table
+    with _lock:
+        if _table is None or _table.version != version:
+            _table = PriceTable(Tariff.objects.values_list('zone_id', 'max_hours', 'price'), version)
+        return _table
+
+
+def invalidate_prices():
+    """Makes every process recompile its table on its next lookup."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
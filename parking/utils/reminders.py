@@ -0,0 +1,127 @@
+"""
+"Your reservation ends soon" reminders.
+
+Each booking schedules a Celery task for ``REMINDER_LEAD`` before its end
+(``schedule_expiry_reminder``); the ``send_expiration_reminders`` command is a
+periodic sweep that catches anything those tasks missed. Both go through
+``send_due_reminders``, which claims reservations by inserting their
+``ReminderLog`` rows before sending, so overlapping tasks and sweeps don't send
+a reminder twice. A claim whose messages all fail to send is dropped again, and
+the next sweep retries it.
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils.timezone import localtime, now
+
+from parking.models import Reservation, ReminderLog
+from parking.utils.email import send_bulk_emails
+from parking.utils.sms import send_bulk_sms
+
+logger = logging.getLogger(__name__)
+
+REMINDER_LEAD = timedelta(minutes=10)
+REMINDER_SUBJECT = "⏰ EasyPark Reminder"
+# Batches lost to concurrent runs before this run gives up; the next sweep sends whatever is left.
+MAX_CLAIM_CONFLICTS = 5
+
+
+def due_reminders(at=None, reservation_ids=None):
+    """Active reservations ending within REMINDER_LEAD of `at` that haven't been reminded, with their recipients."""
+    at = at or now()
+    reservations = Reservation.objects.filter(
+        is_active=True,
+        end_time__range=(at, at + REMINDER_LEAD),
+    ).exclude(reminders__kind=ReminderLog.EXPIRY)
+    if reservation_ids is not None:
+        reservations = reservations.filter(id__in=reservation_ids)
+    return reservations.select_related('user', 'spot__zone').order_by('end_time')
+
+
+def reminder_message(reservation):
+    return (
+        f"⏰ EasyPark Reminder:\n"
+        f"Your reservation for Spot #{reservation.spot.spot_number} in Zone {reservation.spot.zone.name} "
+        f"ends at {localtime(reservation.end_time).strftime('%H:%M')}.\n"
+        f"Please vacate the spot on time."
+    )
+
+
+def _claim(reservations):
+    """Records reminders as sent; returns [] if a concurrent run claimed any of them first."""
+    try:
+        with transaction.atomic():
+            ReminderLog.objects.bulk_create(
+                ReminderLog(reservation=reservation, kind=ReminderLog.EXPIRY) for reservation in reservations
+            )
+    except IntegrityError:
+        return []
+    return reservations
+
+
+def _release(reservations):
+    """Drops the claims of reminders that didn't go out, so the next run sends them."""
+    ReminderLog.objects.filter(reservation__in=reservations, kind=ReminderLog.EXPIRY).delete()
+
+
+def dispatch(reservations):
+    """Sends the SMS and email batches side by side; returns (SMS ids in order, emails sent)."""
+    sms, emails = [], []
+    for reservation in reservations:
+        user = reservation.user
+        message = reminder_message(reservation)
+        if user.phone_number:
+            sms.append((user.phone_number, message))
+        if user.email:
+            emails.append((REMINDER_SUBJECT, message, user.email))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        sms_future = pool.submit(contextvars.copy_context().run, send_bulk_sms, sms)
+        email_future = pool.submit(contextvars.copy_context().run, send_bulk_emails, emails)
+        return sms_future.result(), email_future.result()
+
+
+def send_due_reminders(at=None, reservation_ids=None, batch_size=200):
+    """
+    Sends every due reminder (optionally only for some reservations), in
+    batches. Returns the reservations reminded, with their users loaded.
+
+    A reminder counts as sent once any of its messages went out. The claims of
+    the others are released, so the next sweep tries them again.
+    """
+    reminded, failed, conflicts = [], [], 0
+    while True:
+        reservations = due_reminders(at, reservation_ids)
+        if failed:
+            reservations = reservations.exclude(id__in=failed)
+        batch = list(reservations[:batch_size])
+        if not batch:
+            return reminded
+        if not _claim(batch):
+            # Another run claimed some of these first; look again without them.
+            conflicts += 1
+            if conflicts >= MAX_CLAIM_CONFLICTS:
+                logger.warning("Gave up on %s reminder(s) claimed concurrently; the next sweep sends any left.", len(batch))
+                return reminded
+            continue
+        try:
+            sms_ids, _ = dispatch(batch)
+        except Exception:
+            logger.exception("Sending %s reminder(s) failed; releasing them for the next sweep.", len(batch))
+            _release(batch)
+            failed.extend(reservation.id for reservation in batch)
+            continue
+
+        # An email that failed raised above; an SMS that failed came back as None.
+        texted = iter(sms_ids)
+        unsent = [
+            reservation for reservation in batch
+            if reservation.user.phone_number and next(texted) is None and not reservation.user.email
+        ]
+        if unsent:
+            _release(unsent)
+            failed.extend(reservation.id for reservation in unsent)
+        reminded.extend(reservation for reservation in batch if reservation not in unsent)
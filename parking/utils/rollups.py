@@ -0,0 +1,210 @@
+"""
+Hourly occupancy rollups (``ZoneHourlyOccupancy``) and the analytics built on them.
+
+``rollup_range`` reads the reservations overlapping a window once and turns
+them into per-zone, per-hour reserved spot-minutes with NumPy. Every zone is
+shifted onto its own stretch of one time axis, and the reserved time before
+each hour edge is
+
+    F(t) = sum over starts s < t of (t - s)  -  sum over ends e < t of (t - e)
+
+which is two ``searchsorted`` calls over sorted starts and ends plus their
+prefix sums. An hour's value is the difference of F at its two edges. The
+``rollup_occupancy`` task advances a watermark hourly, and the
+``backfill_occupancy_rollups`` command covers history. ``occupancy_series`` and
+``occupancy_heatmap`` read only the rollup table.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+from django.utils.timezone import localtime, now
+
+from parking.models import Reservation, RollupWatermark, Zone, ZoneHourlyOccupancy, ZoneOccupancy
+
+HOUR = 3600
+WATERMARK = "zone_hourly_occupancy"
+# Hours already rolled up are rolled up again this far back, to catch late writes.
+LOOKBACK = timedelta(hours=2)
+# Backfills read reservations a window of this size at a time.
+CHUNK = timedelta(days=7)
+
+
+def floor_hour(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_buckets(zone_index, starts, ends, zones, hours):
+    """
+    Reserved seconds and reservation starts per (zone, hour).
+
+    zone_index, starts and ends describe one reservation each, with times in
+    integer seconds from the window start. Returns two (zones, hours) arrays.
+    """
+    span = hours * HOUR
+    zone_index = np.asarray(zone_index, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    started = np.zeros(zones * hours, dtype=np.int64)
+    in_window = (starts >= 0) & (starts < span)
+    np.add.at(started, zone_index[in_window] * hours + starts[in_window] // HOUR, 1)
+
+    # Clip to the window, then give every zone its own stretch of the time axis.
+    offset = zone_index * span
+    clipped_starts = np.clip(starts, 0, span) + offset
+    clipped_ends = np.clip(ends, 0, span) + offset
+    keep = clipped_ends > clipped_starts
+    sorted_starts = np.sort(clipped_starts[keep])
+    sorted_ends = np.sort(clipped_ends[keep])
+
+    edges = (np.arange(zones, dtype=np.int64)[:, None] * span + np.arange(hours + 1, dtype=np.int64) * HOUR).ravel()
+
+    def time_before(points, t):
+        # sum over points p < t of (t - p)
+        n = np.searchsorted(points, t, side='left')
+        prefix = np.concatenate(([0], np.cumsum(points)))
+        return n * t - prefix[n]
+
+    reserved_until = (time_before(sorted_starts, edges) - time_before(sorted_ends, edges)).reshape(zones, hours + 1)
+    return np.diff(reserved_until, axis=1), started.reshape(zones, hours)
+
+
+def rollup_range(start, end):
+    """Recomputes the rollup rows for [start, end), rounded out to whole hours. Returns rows written."""
+    start = floor_hour(start)
+    end = floor_hour(end + timedelta(hours=1) - timedelta(microseconds=1))
+    written = 0
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + CHUNK, end)
+        written += _rollup_chunk(chunk_start, chunk_end)
+        chunk_start = chunk_end
+    return written
+
+
+def _rollup_chunk(start, end):
+    hours = int((end - start).total_seconds()) // HOUR
+    rows = Reservation.objects.filter(
+        start_time__lt=end, end_time__gt=start,
+    ).values_list('spot__zone_id', 'start_time', 'end_time')
+
+    origin = start.timestamp()
+    zone_ids, starts, ends = [], [], []
+    for zone_id, start_time, end_time in rows.iterator(chunk_size=10000):
+        zone_ids.append(zone_id)
+        starts.append(int(start_time.timestamp() - origin))
+        ends.append(int(end_time.timestamp() - origin))
+
+    records = []
+    if zone_ids:
+        zones, zone_index = np.unique(np.array(zone_ids), return_inverse=True)
+        seconds, started = hourly_buckets(zone_index, starts, ends, len(zones), hours)
+        totals = dict(ZoneOccupancy.objects.filter(zone_id__in=zones.tolist()).values_list('zone_id', 'total_spots'))
+        for z, h in zip(*np.nonzero(seconds + started)):
+            zone_id = int(zones[z])
+            records.append(ZoneHourlyOccupancy(
+                zone_id=zone_id,
+                hour=start + timedelta(hours=int(h)),
+                reserved_spot_minutes=float(seconds[z, h]) / 60,
+                reservations_started=int(started[z, h]),
+                total_spots=totals.get(zone_id, 0),
+            ))
+
+    with transaction.atomic():
+        ZoneHourlyOccupancy.objects.filter(hour__gte=start, hour__lt=end).delete()
+        ZoneHourlyOccupancy.objects.bulk_create(records, batch_size=5000)
+    return len(records)
+
+
+def rollup_pending(until=None):
+    """
+    Rolls up every closed hour since the watermark and moves it forward.
+    The first run only covers the last LOOKBACK; use the backfill command for history.
+    Returns (start, end, rows written).
+    """
+    end = floor_hour(until or now())
+    with transaction.atomic():
+        # The row lock keeps overlapping runs from rolling up the same hours at once.
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK, defaults={'value': end},
+        )
+        start = min(watermark.value, end) - LOOKBACK
+        written = rollup_range(start, end)
+        watermark.value = max(watermark.value, end)
+        watermark.save(update_fields=['value'])
+    return start, end, written
+
+
+# --- Analytics (reads the rollups only) ---
+def _grid(start, end, zone_ids=None):
+    """Dense (zones, hours) arrays of reserved spot-minutes, starts and spot counts."""
+    start, end = floor_hour(start), floor_hour(end)
+    hours = max(0, int((end - start).total_seconds()) // HOUR)
+    zones = Zone.objects.order_by('name').values_list('id', 'name', 'occupancy__total_spots')
+    if zone_ids:
+        zones = zones.filter(id__in=zone_ids)
+    zones = list(zones)
+    position = {zone_id: i for i, (zone_id, _, _) in enumerate(zones)}
+
+    minutes = np.zeros((len(zones), hours))
+    started = np.zeros((len(zones), hours), dtype=np.int64)
+    # Hours without a row had nothing reserved; assume today's zone size for them.
+    capacity = np.repeat(np.array([total or 0 for _, _, total in zones], dtype=float)[:, None], hours, axis=1)
+
+    rows = ZoneHourlyOccupancy.objects.filter(
+        zone_id__in=list(position), hour__gte=start, hour__lt=end,
+    ).values_list('zone_id', 'hour', 'reserved_spot_minutes', 'reservations_started', 'total_spots')
+    rows = list(rows)
+    if rows:
+        z = np.array([position[row[0]] for row in rows])
+        h = np.array([int((row[1] - start).total_seconds()) // HOUR for row in rows])
+        minutes[z, h] = [row[2] for row in rows]
+        started[z, h] = [row[3] for row in rows]
+        capacity[z, h] = [row[4] for row in rows]
+    return start, zones, minutes, started, capacity
+
+
+def _ratio(minutes, capacity):
+    spot_minutes = capacity * 60
+    return np.round(np.divide(minutes, spot_minutes, out=np.zeros_like(minutes), where=spot_minutes > 0), 4)
+
+
+def occupancy_series(start, end, zone_ids=None):
+    """Hourly occupancy (reserved share of spot time) and reservation starts, per zone and overall."""
+    start, zones, minutes, started, capacity = _grid(start, end, zone_ids)
+    hours = minutes.shape[1]
+    return {
+        "hours": [(start + timedelta(hours=h)).isoformat() for h in range(hours)],
+        "overall": {
+            "occupancy": _ratio(minutes.sum(axis=0), capacity.sum(axis=0)).tolist(),
+            "reservations_started": started.sum(axis=0).tolist(),
+        },
+        "zones": [
+            {
+                "id": zone_id,
+                "name": name,
+                "occupancy": _ratio(minutes[i], capacity[i]).tolist(),
+                "reservations_started": started[i].tolist(),
+            }
+            for i, (zone_id, name, _) in enumerate(zones)
+        ],
+    }
+
+
+def occupancy_heatmap(start, end, zone_ids=None):
+    """Average occupancy by local weekday (0 = Monday) and hour of day: a 7x24 grid."""
+    start, zones, minutes, _, capacity = _grid(start, end, zone_ids)
+    hours = minutes.shape[1]
+    local = [localtime(start + timedelta(hours=h)) for h in range(hours)]
+    cell = np.array([t.weekday() * 24 + t.hour for t in local], dtype=np.int64)
+
+    reserved = np.zeros(7 * 24)
+    available = np.zeros(7 * 24)
+    np.add.at(reserved, cell, minutes.sum(axis=0))
+    np.add.at(available, cell, capacity.sum(axis=0))
+    return {
+        "weekdays": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+        "occupancy": _ratio(reserved, available).reshape(7, 24).tolist(),
+        "zones": [{"id": zone_id, "name": name} for zone_id, name, _ in zones],
+    }
@@ -1,30 +1,137 @@
-from twilio.rest import Client
+"""
+Pluggable SMS sending, modelled on Django's email backends.
+
+``settings.SMS_BACKEND`` names the backend class:
+
+- ``parking.utils.sms.TwilioBackend`` (default): one Twilio client per process
+  over a pooled HTTP session, batches sent concurrently.
+- ``parking.utils.sms.LocMemBackend``: keeps messages in ``outbox``, for tests
+  and benchmarks.
+- ``parking.utils.sms.FileBackend``: appends messages to a file under
+  ``settings.SMS_FILE_PATH``, for local development.
+"""
+import contextvars
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+# Messages "sent" by LocMemBackend, as (to_number, message) tuples.
+outbox = []
+
+
+class BaseSMSBackend(ABC):
+    """Backends implement send(); send_messages() fans a batch out over threads."""
+
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or getattr(settings, 'SMS_MAX_CONCURRENCY', 8)
+
+    @abstractmethod
+    def send(self, to_number, message):
+        """Sends one message; returns its id, or None if sending failed. Called from several threads at once."""
+
+    def send_messages(self, messages):
+        """
+        Sends (to_number, message) pairs, up to max_concurrency at a time.
+        Returns the message ids (None for failures) in input order.
+        """
+        messages = list(messages)
+        if len(messages) <= 1 or self.max_concurrency <= 1:
+            return [self.send(to, body) for to, body in messages]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(messages))) as pool:
+            # Each call runs in a copy of our context, so timed() still reports to the current request.
+            futures = [pool.submit(contextvars.copy_context().run, self.send, to, body) for to, body in messages]
+            return [future.result() for future in futures]
+
+
+class TwilioBackend(BaseSMSBackend):
+    def __init__(self, max_concurrency=None):
+        from requests.adapters import HTTPAdapter
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        super().__init__(max_concurrency)
+        # One keep-alive session for the whole process instead of a TLS handshake per message.
+        http_client = TwilioHttpClient(pool_connections=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        http_client.session.mount('https://', adapter)
+        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+        self.from_number = settings.TWILIO_PHONE_NUMBER
+
+    def send(self, to_number, message):
+        try:
+            with timed("twilio"):
+                sms = self.client.messages.create(
+                    body=message,
+                    from_=self.from_number,
+                    to=to_number
+                )
+            return sms.sid
+        except Exception as e:
+            logger.error("SMS sending failed: %s", e)
+            return None
+
+
+class LocMemBackend(BaseSMSBackend):
+    _lock = threading.Lock()
+
+    def send(self, to_number, message):
+        with self._lock:
+            outbox.append((to_number, message))
+        return f"locmem-{uuid.uuid4().hex}"
+
+
+class FileBackend(BaseSMSBackend):
+    _lock = threading.Lock()
+
+    def __init__(self, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self.path = Path(getattr(settings, 'SMS_FILE_PATH', Path(settings.BASE_DIR) / 'sms-messages'))
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def send(self, to_number, message):
+        sid = f"file-{uuid.uuid4().hex}"
+        with self._lock, open(self.path / 'outbox.log', 'a', encoding='utf-8') as f:
+            f.write(f"--- {sid} to {to_number}\n{message}\n")
+        return sid
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_sms_backend(path=None):
+    """Returns the process-wide instance of the configured backend."""
+    path = path or getattr(settings, 'SMS_BACKEND', 'parking.utils.sms.TwilioBackend')
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
 
 def send_sms(to_number, message):
     """
-    Sends an SMS using the Twilio API.
-    
+    Sends an SMS through the configured backend.
+
     Args:
         to_number (str): The recipient's phone number (e.g., +905xxxxxxxxx).
         message (str): The message body.
-        
+
     Returns:
         str | None: Message SID if successful, None if failed.
     """
-    account_sid = settings.TWILIO_ACCOUNT_SID
-    auth_token = settings.TWILIO_AUTH_TOKEN
-    from_number = settings.TWILIO_PHONE_NUMBER
-
-    client = Client(account_sid, auth_token)
-
-    try:
-        sms = client.messages.create(
-            body=message,
-            from_=from_number,
-            to=to_number
-        )
-        return sms.sid
-    except Exception as e:
-        print(f"❌ SMS sending failed: {e}")
-        return None
+    return get_sms_backend().send(to_number, message)
+
+
+def send_bulk_sms(messages):
+    """Sends (to_number, message) pairs concurrently; returns SIDs (None for failures) in order."""
+    return get_sms_backend().send_messages(messages)
@@ -0,0 +1,69 @@
+import math
+
+from django.db import transaction
+
+from parking.models import Zone, ParkingSpot
+from .availability import availability_index
+from .geo import invalidate_geo
+from .occupancy import rebuild_zone_occupancy
+
+METRES_PER_DEGREE = 111_320
+
+
+def _last_spot_number(zone):
+    numbers = ParkingSpot.objects.filter(zone=zone).values_list('spot_number', flat=True)
+    return max((int(n) for n in numbers if n.isdigit()), default=0)
+
+
+def grid_positions(latitude, longitude, count, spacing_m):
+    """Yields (lat, lon) for `count` spots on a square grid centred on the given point."""
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    lat_step = spacing_m / METRES_PER_DEGREE
+    lon_step = spacing_m / (METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    for i in range(count):
+        row, column = divmod(i, columns)
+        yield (
+            latitude + (row - (rows - 1) / 2) * lat_step,
+            longitude + (column - (columns - 1) / 2) * lon_step,
+        )
+
+
+def provision_spots(zone, count, layout=None, spacing_m=5.0, chunk_size=1000):
+    """
+    Creates `count` spots in the zone with chunked bulk inserts.
+
+    Spot numbers continue from the highest numeric spot number in the zone.
+    The zone row is locked while numbering and inserting, so concurrent calls
+    for the same zone can't hand out the same numbers.
+
+    layout=None puts every spot at the zone centre; layout="grid" spreads them
+    `spacing_m` metres apart around it. Returns the list of created spots.
+    """
+    with transaction.atomic():
+        zone = Zone.objects.select_for_update().get(pk=zone.pk)
+        first_number = _last_spot_number(zone) + 1
+
+        if layout == "grid" and zone.latitude is not None and zone.longitude is not None:
+            positions = grid_positions(zone.latitude, zone.longitude, count, spacing_m)
+        else:
+            positions = ((zone.latitude, zone.longitude) for _ in range(count))
+
+        spots = [
+            ParkingSpot(
+                zone=zone,
+                spot_number=str(first_number + i),
+                latitude=latitude,
+                longitude=longitude,
+            )
+            for i, (latitude, longitude) in enumerate(positions)
+        ]
+        for offset in range(0, len(spots), chunk_size):
+            ParkingSpot.objects.bulk_create(spots[offset:offset + chunk_size])
+
+        # bulk_create skips post_save, so refresh what the signals would have.
+        rebuild_zone_occupancy([zone.id])
+        invalidate_geo()
+        transaction.on_commit(lambda: availability_index.invalidate(zone.id))
+
+    return spots
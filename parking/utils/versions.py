@@ -0,0 +1,41 @@
+"""
+Version counters in Django's cache for in-process copies that apply their own writes.
+
+The availability index and the gate hot set keep a copy of some rows per
+process and update it from signals. Each copy remembers the counter value it
+matches. A process that bumps the counter and gets back exactly that value
++ 1 knows nobody else wrote in between, so it can apply its own change to its
+copy. Any other result means it missed a write and must reload. Checking and
+bumping in two steps would let another process's bump be overwritten.
+
+``cache.incr`` is atomic on Redis and Memcached (and on LocMem within one
+process); the file cache implements it as get-then-set, so several worker
+processes should share Redis or Memcached.
+"""
+import random
+
+from django.core.cache import cache
+
+
+def _start():
+    # A missing counter (never set, or evicted) restarts at a random value, so
+    # no copy built against an earlier value can match it by accident.
+    return random.getrandbits(48)
+
+
+def current_version(key):
+    """The counter's value, creating it if it is missing."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _start(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Atomically increments the counter and returns the new value."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _start(), None)
+        return cache.incr(key)
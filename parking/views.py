@@ -1,40 +1,65 @@
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, BasePermission, SAFE_METHODS
 from django.conf import settings
-from django.db.models import Count, Q
-from django.utils.dateparse import parse_datetime
-from django.core.exceptions import ObjectDoesNotExist
-from django.utils.timezone import now
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import now, is_naive, make_aware
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-import re 
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.views import View
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.core.cache import cache
+import hashlib
+import json
+import logging
+import os
+import time
+from decimal import Decimal
+import zlib
+from operator import attrgetter
+from zipfile import BadZipFile, ZipFile
 
 # Imports for custom utilities
-from .utils.email import send_reservation_email
-from .utils.pdf import generate_pdf_receipt
-from .utils.sms import send_sms
+from .utils.availability import availability_index
+from .utils.accounts import is_active_user
+from .utils.catalog import catalog_stamp
+from .utils.geo import get_geo_index
+from .utils.booking import book_spot, overlapping_reservations, SpotUnavailable
+from .utils.spots import provision_spots
+from .utils.pdf import open_receipt_pdf, receipt_etag, render_receipt_html
+from .utils.ocr import get_ocr_engine, OCRBusy, OCRTimeout
+from .utils.plate_cache import dhash, get_gate_cache
+from .utils.gate import find_gate_reservation, find_gate_reservations
+from .utils.parsers import ZipParser
+from .utils.dashboard import dashboard_summary
+from .utils.rollups import occupancy_heatmap, occupancy_series
+from .utils.pricing import get_price_table, UNPRICED
+from .utils.payments import get_stripe_gateway
+from .utils.instrumentation import render_prometheus
 
 # Third-party imports
 import stripe
-import cv2
-import pytesseract
-import numpy as np
-from datetime import date, datetime # Added datetime import for clarity in ReserveAndPayView
+from datetime import datetime, timedelta # Added datetime import for clarity in ReserveAndPayView
 
 # Local app imports (models and serializers)
-from .models import Reservation, Zone, ParkingSpot
-from .serializers import ReservationSerializer, ZoneSerializer, ParkingSpotSerializer
+from .models import Reservation, Zone, ParkingSpot, StripeEvent, normalize_plate
+from .serializers import (
+    ReservationSerializer, ZoneSerializer, ParkingSpotSerializer, with_zone_table, valid_receipt_token,
+)
+from .tasks import enqueue_reservation_notifications, refund_checkout_session
 
-# Stripe API key configuration
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-# Tesseract OCR executable path configuration
-# IMPORTANT: Ensure this path is correct for your system.
-# For Linux/macOS, it might just be 'tesseract' or its full path like '/usr/bin/tesseract'.
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+logger = logging.getLogger(__name__)
 
 
 # --- Custom Permissions ---
@@ -58,6 +83,75 @@ class IsAdminOrReadOnly(BasePermission):
         return request.user and request.user.is_authenticated and request.user.is_staff
 
 
+class StatelessReadJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that, for safe methods, checks the token against a
+    cached "account is active" flag instead of loading the user, so cached
+    reads usually need no query at all. Writes still load the user (and its
+    is_staff flag) from the database.
+    """
+    def authenticate(self, request):
+        self.stateless = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.stateless:
+            return super().get_user(validated_token)
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if not is_active_user(user_id):
+            raise AuthenticationFailed("User not found or inactive.", code="user_inactive")
+        return jwt_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class ConditionalGetMixin:
+    """
+    list/retrieve with strong ETags taken from the catalog stamp of the zone
+    the response shows (``catalog_zone``; None for all zones). A matching
+    If-None-Match gets a 304 and other hits are served from the cache, both
+    without touching the database. There's no Last-Modified: two writes in
+    the same second would share one, and If-Modified-Since would hide the second.
+    """
+    authentication_classes = [StatelessReadJWTAuthentication]
+
+    def catalog_zone(self):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, view, *args, **kwargs):
+        zone_id = self.catalog_zone()
+        try:
+            zone_id = None if zone_id is None else int(zone_id)
+        except (TypeError, ValueError):
+            zone_id = None
+        token, _ = catalog_stamp(zone_id)
+        variant = f"{token}|{request.accepted_renderer.format}|{request.get_full_path()}"
+        etag = f'"{hashlib.sha1(variant.encode()).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            for name, value in headers.items():
+                not_modified[name] = value
+            return not_modified
+
+        key = f"catalog:response:{etag}"
+        data = cache.get(key)
+        if data is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, getattr(settings, 'CATALOG_CACHE_TTL', 300))
+        return Response(data, headers=headers)
+
+
 # --- Reservation Views ---
 class ReservationCreateView(generics.CreateAPIView):
     serializer_class = ReservationSerializer
@@ -80,56 +174,80 @@ class ReservationCreateView(generics.CreateAPIView):
             return Response({"error": "Invalid start or end time."}, status=400)
 
         try:
-            spot = ParkingSpot.objects.get(id=spot_id)
+            reservation = book_spot(user, spot_id, start_dt, end_dt, plate_number=plate_number)
         except ParkingSpot.DoesNotExist:
             return Response({"error": "Selected spot does not exist."}, status=404)
-
-        reservation = Reservation.objects.create(
-            user=user,
-            spot=spot,
-            start_time=start_dt,
-            end_time=end_dt,
-            plate_number=plate_number,
-        )
-
-        spot.is_reserved = True
-        spot.save()
+        except SpotUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
         serializer = self.get_serializer(reservation)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class ReservationListView(generics.ListAPIView):
+def wants_compact(request):
+    return request.query_params.get("compact") in ("1", "true")
+
+
+class CompactZonesMixin:
+    """
+    List mixin for spot/reservation endpoints: with ?compact=1 every zone is
+    serialized once under "zones" and the results reference it by id.
+    """
+    zone_path = "zone"
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["compact_zones"] = wants_compact(self.request)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if not wants_compact(request):
+            return super().list(request, *args, **kwargs)
+
+        objects = list(self.filter_queryset(self.get_queryset()))
+        data = self.get_serializer(objects, many=True).data
+        zones = (attrgetter(self.zone_path)(obj) for obj in objects)
+        return Response(with_zone_table(data, zones, self.get_serializer_context()))
+
+
+class ReservationListView(CompactZonesMixin, generics.ListAPIView):
     serializer_class = ReservationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    zone_path = "spot.zone"
 
     def get_queryset(self):
-        return Reservation.objects.filter(user=self.request.user).order_by('-created_at')
+        return Reservation.objects.for_api().filter(user=self.request.user).order_by('-created_at')
 
-class AdminReservationListView(generics.ListAPIView):
+class AdminReservationListView(CompactZonesMixin, generics.ListAPIView):
     serializer_class = ReservationSerializer
     permission_classes = [IsAdminUser]
+    zone_path = "spot.zone"
 
     def get_queryset(self):
-        return Reservation.objects.all().order_by('-created_at')
+        return Reservation.objects.for_api().order_by('-created_at')
 
 
 # --- Zone Views ---
-class ZoneViewSet(viewsets.ModelViewSet):
-    queryset = Zone.objects.annotate(
-        spot_count=Count('spots'),
-        available=Count('spots', filter=Q(spots__is_reserved=False))
-    )
+class ZoneViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Zone.objects.select_related('occupancy')
     serializer_class = ZoneSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def catalog_zone(self):
+        return self.kwargs.get("pk")
+
 # --- Parking Spot Views ---
-class ParkingSpotViewSet(viewsets.ModelViewSet):
+class ParkingSpotViewSet(ConditionalGetMixin, CompactZonesMixin, viewsets.ModelViewSet):
     serializer_class = ParkingSpotSerializer
     permission_classes = [IsAuthenticated]
 
+    def catalog_zone(self):
+        # A single spot's zone isn't known without a query, so its detail follows every zone.
+        return None if "pk" in self.kwargs else self.request.query_params.get("zone_id")
+
     def get_queryset(self):
         zone_id = self.request.query_params.get("zone_id")
-        return ParkingSpot.objects.filter(zone_id=zone_id) if zone_id else ParkingSpot.objects.all()
+        spots = ParkingSpot.objects.for_api()
+        return spots.filter(zone_id=zone_id) if zone_id else spots.all()
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsAdminUser])
@@ -147,125 +265,340 @@ def generate_spots(request):
     except ValueError:
         return Response({"error": "Count must be a positive integer."}, status=400)
 
+    layout = request.data.get("layout")
+    if layout not in (None, "", "grid"):
+        return Response({"error": "Layout must be 'grid' or omitted."}, status=400)
+
+    try:
+        spacing = float(request.data.get("spacing", 5))
+        if spacing <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return Response({"error": "Spacing must be a positive number of metres."}, status=400)
+
     try:
         zone = Zone.objects.get(id=zone_id)
     except Zone.DoesNotExist:
         return Response({"error": "Zone not found."}, status=404)
 
-    last_number = ParkingSpot.objects.filter(zone=zone).count()
-    for i in range(1, count + 1):
-        ParkingSpot.objects.create(
-            zone=zone,
-            spot_number=str(last_number + i),
-            latitude=zone.latitude,
-            longitude=zone.longitude,
-        )
+    provision_spots(zone, count, layout=layout or None, spacing_m=spacing)
 
     return Response({"message": f"{count} spots created in zone '{zone.name}'"}, status=201)
 
+def available_spots_queryset(zone_id, start, end):
+    """
+    Spots in the zone with no reservation overlapping [start, end), straight
+    from SQL. The same rule as book_spot (see overlapping_reservations).
+    """
+    all_spots = ParkingSpot.objects.filter(zone_id=zone_id)
+    reserved_ids = Reservation.objects.filter(
+        spot__in=all_spots,
+        start_time__lt=end,
+        end_time__gt=start
+    ).values_list("spot_id", flat=True)
+
+    return all_spots.exclude(id__in=reserved_ids).order_by("id")
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def available_spots(request):
     zone_id = request.query_params.get("zone_id")
-    start = parse_datetime(request.query_params.get("start"))
-    end = parse_datetime(request.query_params.get("end"))
+    start = parse_datetime(request.query_params.get("start", ""))
+    end = parse_datetime(request.query_params.get("end", ""))
+
+    if start and is_naive(start):
+        start = make_aware(start)
+    if end and is_naive(end):
+        end = make_aware(end)
 
     if not zone_id or not start or not end or start >= end:
         return Response({"error": "Invalid or missing parameters."}, status=400)
 
-    all_spots = ParkingSpot.objects.filter(zone_id=zone_id)
-    reserved_ids = Reservation.objects.filter(
-        spot__in=all_spots,
-        start_time__lt=end,
-        end_time__gt=start
-    ).values_list("spot_id", flat=True)
+    try:
+        zone_id = int(zone_id)
+    except ValueError:
+        return Response({"error": "Invalid or missing parameters."}, status=400)
+
+    free_ids = availability_index.free_spot_ids(zone_id, start, end)
+    if free_ids is None:
+        # Answer from SQL; if the index was cold or stale (not just asked about the past), warm it for next time.
+        available = available_spots_queryset(zone_id, start, end)
+        if not availability_index.is_fresh(zone_id):
+            availability_index.warm(zone_id)
+    else:
+        available = ParkingSpot.objects.filter(id__in=free_ids).order_by("id")
+
+    available = list(available.for_api())
+    if wants_compact(request):
+        serializer = ParkingSpotSerializer(available, many=True, context={"compact_zones": True})
+        return Response(with_zone_table(serializer.data, (spot.zone for spot in available)))
 
-    available = all_spots.exclude(id__in=reserved_ids)
     serializer = ParkingSpotSerializer(available, many=True)
     return Response(serializer.data)
 
+def free_spot_ids(zone_id, start, end):
+    """Ids of the zone's spots free for [start, end): from the availability index, or SQL while it warms."""
+    free_ids = availability_index.free_spot_ids(zone_id, start, end)
+    if free_ids is None:
+        free_ids = list(available_spots_queryset(zone_id, start, end).values_list("id", flat=True))
+        if not availability_index.is_fresh(zone_id):
+            availability_index.warm(zone_id)
+    return free_ids
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def nearby(request):
+    """
+    The k nearest zones (?kind=zones, default) or spots (?kind=spots) within
+    `radius` metres of (lat, lon) that have a spot free for [start, end),
+    nearest first. The window defaults to the coming hour.
+    """
+    params = request.query_params
+    try:
+        lat, lon = float(params["lat"]), float(params["lon"])
+        radius = float(params.get("radius", 1000))
+        k = int(params.get("k", 10))
+    except (KeyError, ValueError):
+        return Response({"error": "lat and lon are required; radius and k must be numbers."}, status=400)
+    max_radius = getattr(settings, 'NEARBY_MAX_RADIUS_M', 20000)
+    max_results = getattr(settings, 'NEARBY_MAX_RESULTS', 100)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius <= max_radius and 1 <= k <= max_results):
+        return Response({"error": f"Need a valid position, 0 < radius <= {max_radius} and 1 <= k <= {max_results}."}, status=400)
+    kind = params.get("kind", "zones")
+    if kind not in ("zones", "spots"):
+        return Response({"error": "kind must be 'zones' or 'spots'."}, status=400)
+
+    try:
+        start = parse_datetime(params["start"]) if params.get("start") else now()
+        end = parse_datetime(params["end"]) if params.get("end") else start and start + timedelta(hours=1)
+    except ValueError:
+        # Well-formed but impossible, e.g. February 30th.
+        start = end = None
+    if start and is_naive(start):
+        start = make_aware(start)
+    if end and is_naive(end):
+        end = make_aware(end)
+    if not start or not end or start >= end:
+        return Response({"error": "Invalid start or end time."}, status=400)
+
+    index = get_geo_index()
+    search = index.nearest_zones if kind == "zones" else index.nearest_spots
+    results = search(lat, lon, radius, k, lambda zone_id: free_spot_ids(zone_id, start, end))
+    return Response({"kind": kind, "start": start, "end": end, "results": results})
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def reservation_by_session(request):
     session_id = request.GET.get("session_id")
-    print("🟢 SESSION ID RECEIVED:", session_id)
 
     try:
-        reservation = Reservation.objects.get(stripe_session_id=session_id)
-        print("✅ RESERVATION FOUND:", reservation)
+        reservation = Reservation.objects.for_api().get(stripe_session_id=session_id)
     except Exception as e:
-        print("❌ ERROR WHILE FETCHING RESERVATION:", e)
+        logger.warning("No reservation for checkout session %s: %s", session_id, e)
         return Response({"error": str(e)}, status=500)
 
     serializer = ReservationSerializer(reservation)
     return Response(serializer.data)
 
 
-class ReserveAndPayView(APIView):
-    permission_classes = [IsAuthenticated]
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def reservation_receipt(request, pk):
+    """
+    Streams the PDF receipt, rendering it on first request. Accessible to the
+    owner and admins, or to anyone holding the signed link from pdf_receipt.
+    """
+    try:
+        reservation = Reservation.objects.for_api().get(pk=pk, stripe_session_id__isnull=False)
+    except Reservation.DoesNotExist:
+        return Response({"error": "Receipt not found."}, status=404)
+
+    user = request.user
+    is_owner = user.is_authenticated and (user.is_staff or user.pk == reservation.user_id)
+    if not is_owner and not valid_receipt_token(request.query_params.get("token"), reservation.pk):
+        return Response({"error": "Receipt not found."}, status=404)
+
+    html = render_receipt_html(reservation)
+    etag = receipt_etag(html)
+    not_modified = get_conditional_response(request, etag=f'"{etag}"')
+    if not_modified is not None:
+        return not_modified
+
+    pdf, etag = open_receipt_pdf(reservation, html)
+    response = FileResponse(
+        pdf,
+        content_type="application/pdf",
+        filename=f"easypark_receipt_{reservation.pk}.pdf",
+    )
+    response["ETag"] = f'"{etag}"'
+    response["Last-Modified"] = http_date(os.fstat(pdf.fileno()).st_mtime)
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
 
-    def post(self, request):
-        user = request.user
-        spot_id = request.data.get("spot")
-        start_time = request.data.get("start_time")
-        end_time = request.data.get("end_time")
-        plate_number = user.plate_number # This line uses plate_number from user object as per your original code
 
-        if not all([spot_id, start_time, end_time, plate_number]):
-            return Response({"error": "Missing reservation data."}, status=400)
+def checkout_params(user, data):
+    """
+    Validates a reserve-and-pay request against the database. Returns
+    (Stripe Checkout session params, None) or (None, error response).
+    """
+    spot_id = data.get("spot")
+    start_time = data.get("start_time")
+    end_time = data.get("end_time")
+    plate_number = user.plate_number
 
+    if not all([spot_id, start_time, end_time, plate_number]):
+        return None, JsonResponse({"error": "Missing reservation data."}, status=400)
+
+    try:
+        start_dt = parse_datetime(str(start_time))
+        end_dt = parse_datetime(str(end_time))
+    except ValueError:
+        start_dt = end_dt = None
+    if not start_dt or not end_dt or start_dt >= end_dt:
+        return None, JsonResponse({"error": "Invalid start or end time."}, status=400)
+
+    try:
+        spot = ParkingSpot.objects.select_related('zone').get(id=spot_id)
+    except (ParkingSpot.DoesNotExist, ValueError, TypeError):
+        return None, JsonResponse({"error": "Spot not found."}, status=404)
+    zone = spot.zone
+
+    # Fail fast before taking payment; book_spot re-checks under lock.
+    if overlapping_reservations(spot.id, start_dt, end_dt).exists():
+        return None, JsonResponse({"error": "Spot is already reserved for that time."}, status=409)
+
+    duration_hours = (end_dt - start_dt).total_seconds() / 3600
+    price = get_price_table().price(zone.id, duration_hours)
+    if price is None:
+        return None, JsonResponse({"error": "No tariff covers that stay."}, status=400)
+
+    return {
+        'payment_method_types': ['card'],
+        'line_items': [{
+            'price_data': {
+                'currency': 'try',
+                'product_data': {
+                    'name': f'EasyPark Reservation - Zone: {zone.name} Spot: #{spot.spot_number}',
+                },
+                'unit_amount': int(price * 100),
+            },
+            'quantity': 1,
+        }],
+        'mode': 'payment',
+        'success_url': "http://localhost:5173/success?session_id={CHECKOUT_SESSION_ID}",
+        'cancel_url': "http://localhost:5173/cancel",
+        'metadata': {
+            "user_id": str(user.id),
+            "spot_id": str(spot.id),
+            "start_time": start_time,
+            "end_time": end_time,
+            "plate_number": plate_number,
+        },
+    }, None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ReserveAndPayView(View):
+    """
+    Creates the Stripe Checkout session for a booking.
+
+    An async Django view, since DRF views are sync only: the JWT check and the
+    database work run in a thread, then the Stripe call awaits the pooled
+    client, so under ASGI the worker serves other requests meanwhile.
+    """
+    async def post(self, request):
         try:
-            spot = ParkingSpot.objects.select_related('zone').get(id=spot_id)
-            zone = spot.zone
-
-            # from datetime import datetime # Already imported at the top
-            # from django.utils.dateparse import parse_datetime # Already imported at the top
-
-            start_dt = parse_datetime(start_time)
-            end_dt = parse_datetime(end_time)
-            duration_hours = (end_dt - start_dt).total_seconds() / 3600
-
-            if duration_hours <= 1:
-                price = 250
-            elif duration_hours <= 2:
-                price = 400
-            elif duration_hours <= 3:
-                price = 500
-            else:
-                price = 600
-
-            unit_amount = price * 100
-
-            session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=[{
-                    'price_data': {
-                        'currency': 'try',
-                        'product_data': {
-                            'name': f'EasyPark Reservation - Zone: {zone.name} Spot: #{spot.spot_number}',
-                        },
-                        'unit_amount': unit_amount,
-                    },
-                    'quantity': 1,
-                }],
-                mode='payment',
-                success_url=f"http://localhost:5173/success?session_id={{CHECKOUT_SESSION_ID}}",
-                cancel_url="http://localhost:5173/cancel",
-                metadata={
-                    "user_id": str(user.id),
-                    "spot_id": str(spot.id),
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "plate_number": plate_number
-                }
-            )
+            auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse(e.detail if isinstance(e.detail, dict) else {"detail": e.detail}, status=401)
+        if auth is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        user, _ = auth
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON body."}, status=400)
+
+        params, error = await sync_to_async(checkout_params)(user, data)
+        if error is not None:
+            return error
+
+        try:
+            session = await get_stripe_gateway().create_checkout_session(params)
+        except stripe.StripeError as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({'session_url': session.url})
 
-            return Response({'session_url': session.url})
 
-        except ObjectDoesNotExist:
-            return Response({"error": "Spot not found."}, status=404)
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+class PriceQuoteView(APIView):
+    """
+    Prices many stays at once, e.g. every spot of a zone for the chosen window.
+
+    POST {"items": [{"spot": 12, "start_time": ..., "end_time": ...}, ...]};
+    an item may name a "zone" instead of a spot. Returns {"quotes": [...]} in
+    item order, each with a "price" (TRY) or an "error".
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_ITEMS = 1000
+
+    def post(self, request):
+        items = request.data.get("items")
+        if not isinstance(items, list) or not items:
+            return Response({"error": "items must be a non-empty list."}, status=400)
+        if len(items) > self.MAX_ITEMS:
+            return Response({"error": f"At most {self.MAX_ITEMS} items per quote."}, status=400)
+        items = [item if isinstance(item, dict) else {} for item in items]
+
+        def as_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+
+        spot_ids = {as_int(item.get("spot")) for item in items} - {None}
+        zone_ids = {as_int(item.get("zone")) for item in items if "spot" not in item} - {None}
+        spot_zone = dict(ParkingSpot.objects.filter(id__in=spot_ids).values_list("id", "zone_id")) if spot_ids else {}
+        known_zones = set(Zone.objects.filter(id__in=zone_ids).values_list("id", flat=True)) if zone_ids else set()
+
+        quotes, priced, zones, hours = [], [], [], []
+        for index, item in enumerate(items):
+            if "spot" in item:
+                quote = {"spot": item["spot"], "zone": spot_zone.get(as_int(item["spot"]))}
+            else:
+                zone_id = as_int(item.get("zone"))
+                quote = {"spot": None, "zone": zone_id if zone_id in known_zones else None}
+            quotes.append(quote)
+
+            try:
+                start = parse_datetime(str(item.get("start_time") or ""))
+                end = parse_datetime(str(item.get("end_time") or ""))
+            except ValueError:
+                start = end = None
+            if start and is_naive(start):
+                start = make_aware(start)
+            if end and is_naive(end):
+                end = make_aware(end)
+            if quote["zone"] is None:
+                quote["error"] = "Spot or zone not found."
+            elif start is None or end is None or end <= start:
+                quote["error"] = "Give a start_time before end_time."
+            else:
+                priced.append(index)
+                zones.append(quote["zone"])
+                hours.append((end - start).total_seconds() / 3600)
+
+        # One vectorized lookup for every valid item.
+        for index, cents in zip(priced, get_price_table().quote(zones, hours).tolist()):
+            if cents == UNPRICED:
+                quotes[index]["error"] = "No tariff covers that stay."
+            else:
+                quotes[index].update(price=f"{Decimal(cents) / 100:.2f}", currency="TRY")
+        return Response({"quotes": quotes})
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -273,75 +606,135 @@ class StripeWebhookView(APIView):
     permission_classes = []
 
     def post(self, request, *args, **kwargs):
-        from users.models import User # Imported locally as in your original code
-
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
         endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
         try:
-            event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+            stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
         except (ValueError, stripe.error.SignatureVerificationError):
             return Response(status=400)
 
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            metadata = session.get('metadata', {})
+        # Work on the verified payload as plain dicts; newer stripe objects aren't dict subclasses.
+        event = json.loads(payload)
 
-            try:
-                user_id = metadata.get('user_id')
-                spot_id = metadata.get('spot_id')
-                start_time = metadata.get('start_time')
-                end_time = metadata.get('end_time')
-                plate_number = metadata.get('plate_number')
-
-                if not user_id or not spot_id:
-                    print("⚠️ Missing critical metadata. Skipping reservation creation.")
+        # Stripe redelivers events; a replay is acknowledged after one primary-key lookup.
+        if StripeEvent.objects.filter(event_id=event['id']).exists():
+            return Response(status=200)
+
+        # The claim commits only together with the handler's work. Anything the
+        # handler raises rolls both back and answers 500, so Stripe retries.
+        try:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        StripeEvent.objects.create(event_id=event['id'], type=event['type'])
+                except IntegrityError:
+                    # A concurrent delivery of the same event claimed it first.
                     return Response(status=200)
+                if event['type'] == 'checkout.session.completed':
+                    self.handle_checkout_completed(event['data']['object'])
+        except Exception:
+            logger.exception("Stripe event %s failed; leaving it for Stripe to retry.", event['id'])
+            return Response(status=500)
+
+        return Response(status=200)
 
-                user = User.objects.get(id=user_id)
-                spot = ParkingSpot.objects.get(id=spot_id)
+    def handle_checkout_completed(self, session):
+        from users.models import User # Imported locally as in your original code
 
-                reservation = Reservation.objects.create(
-                    user=user,
-                    spot=spot,
-                    start_time=parse_datetime(start_time),
-                    end_time=parse_datetime(end_time),
-                    plate_number=plate_number,
-                    stripe_session_id=session['id']
-                )
-                spot.is_reserved = True
-                spot.save()
+        metadata = session.get('metadata', {})
 
-                try:
-                    price = int(session['amount_total']) / 100
-                    receipt_path = generate_pdf_receipt(reservation, user, price)
-                    receipt_url = request.build_absolute_uri("/" + receipt_path)
-                except Exception as e:
-                    print("PDF generation failed:", e)
-
-                if user.email:
-                    send_reservation_email(
-                        user.email,
-                        "✅ EasyPark Reservation Confirmed",
-                        f"Zone: {reservation.spot.zone.name}\nSpot: #{reservation.spot.spot_number}\n"
-                        f"Plate: {reservation.plate_number}\n"
-                        f"From: {reservation.start_time.strftime('%Y-%m-%d %H:%M')}\n"
-                        f"To: {reservation.end_time.strftime('%Y-%m-%d %H:%M')}\n"
-                        f"Price: {price} TRY"
-                    )
-
-                if user.phone_number:
-                    send_sms(
-                        user.phone_number,
-                        f"✅ EasyPark: Reservation confirmed\nZone: {reservation.spot.zone.name}\nSpot: #{reservation.spot.spot_number}\n"
-                        f"{reservation.start_time.strftime('%H:%M')} → {reservation.end_time.strftime('%H:%M')}"
-                    )
-
-            except Exception as e:
-                print("❌ Reservation webhook error:", e)
+        user_id = metadata.get('user_id')
+        spot_id = metadata.get('spot_id')
+        start_time = metadata.get('start_time')
+        end_time = metadata.get('end_time')
+        plate_number = metadata.get('plate_number')
 
-        return Response(status=200)
+        if not user_id or not spot_id:
+            logger.warning("Checkout session %s is missing metadata; no reservation created.", session.get('id'))
+            return
+
+        if Reservation.objects.filter(stripe_session_id=session['id']).exists():
+            return
+
+        user = User.objects.get(id=user_id)
+
+        price = Decimal(session['amount_total']) / 100
+
+        try:
+            reservation = book_spot(
+                user,
+                spot_id,
+                parse_datetime(start_time),
+                parse_datetime(end_time),
+                plate_number=plate_number,
+                stripe_session_id=session['id'],
+                price=price,
+            )
+        except SpotUnavailable:
+            # Someone else got the spot while this driver was paying. The refund
+            # is a network call: make it after commit, on Celery, not under the write lock.
+            logger.warning("Spot taken during checkout, refunding session %s.", session['id'])
+            transaction.on_commit(lambda: refund_checkout_session.delay(session['id'], session['payment_intent']))
+            return
+
+        # Email and SMS run on Celery so slow providers can't make Stripe time out.
+        transaction.on_commit(lambda: enqueue_reservation_notifications(reservation.id))
+
+
+def ocr_failure(exc):
+    """Maps an OCR engine exception to (data, status)."""
+    if isinstance(exc, OCRBusy):
+        return {
+            'detail': 'ocr_busy',
+            'message': 'Plate recognition is busy, please retry shortly.'
+        }, status.HTTP_503_SERVICE_UNAVAILABLE
+    if isinstance(exc, OCRTimeout):
+        return {
+            'detail': 'ocr_timeout',
+            'message': 'Plate recognition timed out.'
+        }, status.HTTP_504_GATEWAY_TIMEOUT
+    if isinstance(exc, ValueError):
+        return {'error': 'Invalid image.'}, status.HTTP_400_BAD_REQUEST
+    return {
+        'detail': 'ocr_failed',
+        'message': 'Plate recognition failed.'
+    }, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+NO_PLATE = {
+    'detail': 'invalid_plate_image',
+    'message': 'No valid license plate pattern detected.'
+}, status.HTTP_400_BAD_REQUEST
+
+
+def gate_decision(plate_number, reservation):
+    """(data, status) telling the gate whether to open for a recognized plate."""
+    if reservation:
+        return {
+            'plate_number': plate_number,
+            'access': True,
+            'message': 'Access granted.',
+            'zone': reservation.zone,
+            'spot': reservation.spot,
+        }, status.HTTP_200_OK
+    return {
+        'plate_number': plate_number,
+        'access': False,
+        'message': 'Access denied. No active reservation.',
+        'zone': None,
+        'spot': None,
+    }, status.HTTP_403_FORBIDDEN
+
+
+LOOKUP_FAILED = {
+    'plate_number': None,
+    'access': False,
+    'message': 'Internal server error during reservation lookup.',
+    'zone': None,
+    'spot': None,
+}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
 
 class LicensePlateRecognitionView(APIView):
@@ -349,86 +742,211 @@ class LicensePlateRecognitionView(APIView):
         if 'image' not in request.FILES:
             return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        image_file = request.FILES['image']
+        image_bytes = request.FILES['image'].read()
         try:
-            image = cv2.imdecode(np.frombuffer(image_file.read(), np.uint8), cv2.IMREAD_COLOR)
-        except Exception as e:
-            return Response({'error': 'Image decoding failed.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if image is None:
+            frame_hash = dhash(image_bytes)
+        except ValueError:
             return Response({'error': 'Invalid image.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Preprocess
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
-        resized = cv2.resize(closed, (800, 800), interpolation=cv2.INTER_AREA)
+        # A car waiting at the barrier sends the same picture over and over; read its plate once.
+        cache = get_gate_cache()
+        similar = cache.similar_frames(frame_hash)
+        started = time.perf_counter()
+        try:
+            read = get_ocr_engine().recognize(
+                image_bytes, [regions for _, regions, _ in similar], cache.max_changed,
+            )
+        except (OCRBusy, OCRTimeout, ValueError, RuntimeError) as e:
+            data, status_code = ocr_failure(e)
+            response = Response(data, status=status_code)
+            if isinstance(e, OCRBusy):
+                response['Retry-After'] = '1'
+            return response
+        cleaned_plate_number = cache.record_frame(frame_hash, similar, read, (time.perf_counter() - started) * 1000)
 
-        custom_config = r'--oem 3 --psm 7 -l eng -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-        text = pytesseract.image_to_string(resized, config=custom_config)
-        cleaned = ''.join(filter(str.isalnum, text)).upper()
+        if not cleaned_plate_number:
+            data, status_code = NO_PLATE
+        else:
+            try:
+                data, status_code = self.check_access(cleaned_plate_number)
+            except Exception:
+                return Response(*LOOKUP_FAILED)
+        return Response(data, status=status_code)
+
+    @staticmethod
+    def check_access(plate_number):
+        """Returns (data, status) for a recognized plate, reusing a recent answer for the same plate."""
+        cache = get_gate_cache()
+        cached = cache.get_plate(plate_number)
+        if cached:
+            return cached
+
+        started = time.perf_counter()
+        data, status_code = gate_decision(plate_number, find_gate_reservation(plate_number))
+        cache.set_plate(plate_number, data, status_code, (time.perf_counter() - started) * 1000)
+        return data, status_code
+
+
+class BatchPlateRecognitionView(APIView):
+    """
+    Recognizes a burst of frames from several gate cameras in one request.
 
-        plate_pattern = r'\d{2}[A-Z]{3}\d{3}'
-        match = re.search(plate_pattern, cleaned)
-        cleaned_plate_number = match.group(0) if match else ""
+    Send the frames as repeated `images` multipart files, as one zip file in
+    `archive`, or as a raw application/zip body. Frames are OCRed in parallel
+    and every recognized plate is checked in a single lookup; results come back
+    in upload (or archive) order.
+    """
+    parser_classes = [MultiPartParser, ZipParser]
+
+    def read_images(self, request):
+        """
+        Returns [(name, bytes, or the ValueError of a member that can't be read)],
+        or raises ValueError with a message for the client.
+        """
+        if isinstance(request.data, ZipFile):
+            archive = request.data
+        elif 'archive' in request.FILES:
+            try:
+                archive = ZipFile(request.FILES['archive'])
+            except BadZipFile:
+                raise ValueError('archive is not a zip file.')
+        else:
+            files = request.FILES.getlist('images')
+            self.check_limits([f.size for f in files])
+            return [(f.name, f.read()) for f in files]
+
+        members = [m for m in archive.infolist() if not m.is_dir() and not m.filename.startswith('__MACOSX/')]
+        self.check_limits([m.file_size for m in members])
+        images = []
+        for member in members:
+            try:
+                images.append((member.filename, archive.read(member)))
+            except (BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError) as e:
+                # Corrupt, truncated, encrypted or oddly compressed: fail this frame, not the batch.
+                images.append((member.filename, ValueError(f'Unreadable archive member: {e}')))
+        return images
+
+    def check_limits(self, sizes):
+        if len(sizes) > settings.PLATE_BATCH_MAX_IMAGES:
+            raise ValueError(f'At most {settings.PLATE_BATCH_MAX_IMAGES} images per batch.')
+        if any(size > settings.PLATE_BATCH_MAX_IMAGE_BYTES for size in sizes):
+            raise ValueError('Image too large.')
 
-        if not cleaned_plate_number:
-            return Response({
-                'detail': 'invalid_plate_image',
-                'message': 'No valid license plate pattern detected.'
-            }, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request, *args, **kwargs):
+        try:
+            images = self.read_images(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not images:
+            return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache = get_gate_cache()
+        results = [None] * len(images)
+        hashes, similar = {}, {}
+        for index, (_, image_bytes) in enumerate(images):
+            if isinstance(image_bytes, ValueError):
+                results[index] = ocr_failure(image_bytes)
+                continue
+            try:
+                hashes[index] = dhash(image_bytes)
+            except ValueError as e:
+                results[index] = ocr_failure(e)
+                continue
+            similar[index] = cache.similar_frames(hashes[index])
+
+        started = time.perf_counter()
+        reads = get_ocr_engine().recognize_many(
+            [images[i][1] for i in hashes],
+            [[regions for _, regions, _ in similar[i]] for i in hashes],
+            cache.max_changed,
+        )
+        cost_ms = (time.perf_counter() - started) * 1000 / max(1, len(hashes))
+        plates = {}
+        for index, read in zip(hashes, reads):
+            plates[index] = read if isinstance(read, Exception) else cache.record_frame(hashes[index], similar[index], read, cost_ms)
 
+        # Frames only ever reuse OCR text; access is checked for every plate, cached or not.
         try:
-            reservation = Reservation.objects.filter(
-                plate_number__iexact=cleaned_plate_number,
-                is_active=True
-            ).select_related('spot__zone').first()
-
-            if reservation:
-                return Response({
-                    'plate_number': cleaned_plate_number,
-                    'access': True,
-                    'message': 'Access granted.',
-                    'zone': reservation.spot.zone.name,
-                    'spot': reservation.spot.spot_number,
-                })
-
-            return Response({
-                'plate_number': cleaned_plate_number,
-                'access': False,
-                'message': 'Access denied. No active reservation.',
-                'zone': None,
-                'spot': None,
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        except Exception as e:
-            return Response({
-                'plate_number': None,
-                'access': False,
-                'message': 'Internal server error during reservation lookup.',
-                'zone': None,
-                'spot': None,
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            reservations = find_gate_reservations([p for p in plates.values() if isinstance(p, str) and p])
+        except Exception:
+            reservations = None
+
+        for index, plate in plates.items():
+            if isinstance(plate, Exception):
+                results[index] = ocr_failure(plate)
+            elif not plate:
+                results[index] = NO_PLATE
+            elif reservations is None:
+                results[index] = LOOKUP_FAILED
+            else:
+                results[index] = gate_decision(plate, reservations.get(normalize_plate(plate)))
+
+        return Response({'results': [
+            {'index': index, 'name': name, 'status': status_code, **data}
+            for index, ((name, _), (data, status_code)) in enumerate(zip(images, results))
+        ]})
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def plate_recognition_metrics(request):
+    """Hit rates and time saved by the gate frame and plate caches in this process."""
+    return Response(get_gate_cache().metrics())
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def request_metrics(request):
+    """Request latency, per-stage time and query count histograms of this process, for Prometheus."""
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 # --- Admin Dashboard Summary ---
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def admin_dashboard_summary(request):
-    total_zones = Zone.objects.count()
-    total_spots = ParkingSpot.objects.count()
-    reserved_spots = ParkingSpot.objects.filter(is_reserved=True).count()
-    available_spots = total_spots - reserved_spots
-    
-    today = date.today()
-    today_reservations = Reservation.objects.filter(start_time__date=today).count()
-
-    return Response({
-        "total_zones": total_zones,
-        "total_spots": total_spots,
-        "reserved_spots": reserved_spots,
-        "available_spots": available_spots,
-        "today_reservations": today_reservations,
-    })
\ No newline at end of file
+    """Spot and booking totals, with a per-zone breakdown under "zones"."""
+    return Response(dashboard_summary())
+
+
+# --- Occupancy analytics (served from the hourly rollups) ---
+ANALYTICS_MAX_RANGE = timedelta(days=366)
+
+
+def parse_bound(value):
+    """A date or datetime query parameter as an aware datetime (None if absent or invalid)."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        parsed = datetime.combine(day, datetime.min.time()) if day else None
+    if parsed is not None and is_naive(parsed):
+        parsed = make_aware(parsed)
+    return parsed
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def occupancy_analytics(request):
+    """
+    Hourly occupancy per zone between `from` and `to` (default: the last 7 days).
+    `view=series` (default) returns time series; `view=heatmap` a weekday x hour grid.
+    Narrow to zones with `zone_id` (repeatable).
+    """
+    end = parse_bound(request.query_params.get("to")) or now()
+    start = parse_bound(request.query_params.get("from")) or end - timedelta(days=7)
+    if not start < end or end - start > ANALYTICS_MAX_RANGE:
+        return Response({"error": "Give a from/to range of at most 366 days."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        zone_ids = [int(z) for z in request.query_params.getlist("zone_id")]
+    except ValueError:
+        return Response({"error": "zone_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+    view = request.query_params.get("view", "series")
+    if view == "heatmap":
+        return Response(occupancy_heatmap(start, end, zone_ids))
+    if view == "series":
+        return Response(occupancy_series(start, end, zone_ids))
+    return Response({"error": "view must be series or heatmap."}, status=status.HTTP_400_BAD_REQUEST)
@@ -6,7 +6,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import RegisterSerializer, UserProfileSerializer
 import random
 import re
-from .utils.sms import send_sms
+from parking.utils.sms import send_sms
 from rest_framework.permissions import IsAuthenticated
 
 User = get_user_model()